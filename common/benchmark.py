@@ -0,0 +1,265 @@
+'''
+A benchmark harness shared by all Python implementations
+
+Every implementation is timed the same way: warm up, then time each iteration
+separately with `time.perf_counter_ns`, synchronizing the device after every
+iteration. The number of timed iterations grows adaptively until the 95%
+confidence interval of the mean is narrow enough, or a limit is reached
+'''
+
+import math
+import time
+import numpy as np
+
+from . import results, flops, perf, nvprof
+from .cpu import parse_cores, pin
+from .memory import PhaseMemory, format_bytes
+
+
+def add_benchmark_args(parser):
+    '''
+    Add the command line options of `Benchmark` to an `argparse` parser
+    '''
+
+    parser.add_argument('--warmup-repeat',
+                        type=int,
+                        default=10,
+                        dest='warmup_num')
+    parser.add_argument('--timing-repeat',
+                        type=int,
+                        default=100,
+                        dest='test_num',
+                        help='Minimum number of timed iterations')
+    parser.add_argument('--max-repeat',
+                        type=int,
+                        default=None,
+                        dest='max_num',
+                        help='Maximum number of timed iterations when '
+                        '--target-ci is set. Defaults to 10x --timing-repeat')
+    parser.add_argument('--target-ci',
+                        type=float,
+                        default=0.,
+                        dest='target_ci',
+                        help='Keep timing until the half width of the 95%% '
+                        'confidence interval of the mean is within this '
+                        'fraction of the mean, e.g. 0.01. 0 disables it')
+    parser.add_argument('--cores',
+                        type=parse_cores,
+                        default=None,
+                        help='Pin to these cores, e.g. 0-7, with one thread '
+                        'per core in every framework')
+    parser.add_argument('--threads',
+                        type=int,
+                        default=None,
+                        help='Number of CPU threads of every framework. '
+                        'Defaults to the number of cores with --cores')
+    parser.add_argument('--profile-gpu',
+                        action='store_true',
+                        dest='profile_gpu')
+    parser.add_argument('--profile-cpu',
+                        action='store_true',
+                        dest='profile_cpu',
+                        help='Count cycles, instructions, LLC misses and '
+                        'memory traffic of the timed iterations with '
+                        'perf_event_open (see common/perf.py)')
+    parser.add_argument('--results',
+                        default=None,
+                        dest='results',
+                        help='JSON Lines file to append the results to. '
+                        f'Defaults to ${results.RESULTS_ENV} or '
+                        'results.jsonl in the repository root. An empty '
+                        'string disables it')
+
+
+def parse_benchmark_args(parser):
+    '''
+    Parse the command line, and pin the process with --cores and --threads (see
+    `common.cpu.pin`)
+
+    Call it before loading inputs and compiling, since pinning may re-execute
+    the script
+    '''
+
+    cmd_args = parser.parse_args()
+    if cmd_args.cores is not None or cmd_args.threads is not None:
+        pin(cmd_args.cores, cmd_args.threads)
+    return cmd_args
+
+
+def summarize(samples_ns):
+    '''
+    Statistics of per-iteration latencies, in milliseconds
+    '''
+
+    t = np.asarray(samples_ns, dtype=np.float64) / 1e6
+    mean = float(np.mean(t))
+    std = float(np.std(t, ddof=1)) if t.shape[0] > 1 else 0.
+    p5, p50, p95, p99 = map(float, np.percentile(t, [5, 50, 95, 99]))
+    return {
+        'n': int(t.shape[0]),
+        'mean': mean,
+        'median': p50,
+        'p5': p5,
+        'p95': p95,
+        'p99': p99,
+        'std': std,
+        'cv': std / mean if mean > 0 else 0.,
+        'ci95': 1.96 * std / math.sqrt(t.shape[0]),
+    }
+
+
+def record_samples(name: str, samples_ns, target: str = None):
+    '''
+    Record per-iteration latencies timed outside `Benchmark` (e.g. by TVM's
+    `time_evaluator`) to the results file, as `Benchmark.run` does, and return
+    their statistics (see `summarize`)
+    '''
+
+    samples_ns = [int(t) for t in samples_ns]
+    stats = summarize(samples_ns)
+    results.record(name, samples_ns, stats, target=target)
+    return stats
+
+
+class Benchmark:
+    '''
+    Time callables with warmup and adaptive repeats, and record the results
+    (see `common.results`)
+
+
+    Parameters
+    ----------
+    cmd_args: argparse.Namespace
+        Parsed options added by `add_benchmark_args`
+    sync: callable
+        Called with the return value of the timed callable, and blocks until the
+        device has finished the work (e.g. `lambda _: ir_dev.sync()`, or
+        `jax.block_until_ready`)
+    inference_flops: int, optional
+        FLOPs of one inference, for the bytes per FLOP of --profile-cpu.
+        Defaults to the count of `common.flops` for `main.py`, whose inputs it
+        describes, and to unknown for other scripts (e.g. a batched or
+        multi-layer variant)
+    '''
+
+    def __init__(self, cmd_args, sync=lambda _: None, inference_flops=None):
+        self.warmup_num = cmd_args.warmup_num
+        self.test_num = cmd_args.test_num
+        self.max_num = cmd_args.max_num if cmd_args.max_num is not None \
+                else 10 * cmd_args.test_num
+        self.max_num = max(self.max_num, self.test_num, 1)
+        self.target_ci = cmd_args.target_ci
+        self.sync = sync
+        # Hooks called right before and after the timed iterations, e.g. to
+        # start and stop a profiler
+        self.on_start = []
+        self.on_stop = []
+        if cmd_args.profile_gpu:
+            from .gpu import profile_start, profile_stop
+            self.on_start.append(profile_start)
+            self.on_stop.append(profile_stop)
+        self.perf = None
+        if getattr(cmd_args, 'profile_cpu', False):
+            self.perf = perf.PerfCounters()
+            self.on_start.append(self.perf.start)
+            self.on_stop.append(self.perf.stop)
+            self.flops = inference_flops
+            context = results.script_context()
+            if self.flops is None and '/' not in context['impl']:
+                work = flops.work(context['workload'],
+                                  config=results.config_args())
+                self.flops = work[1] if work is not None else None
+        # Register arrays with `self.memory.track` to count them in every phase
+        self.memory = PhaseMemory()
+        self.results = {}
+        self.target = getattr(cmd_args, 'target', None)
+        # Profiled runs are slowed down and not recorded
+        self.results_path = None if cmd_args.profile_gpu else \
+                (cmd_args.results if cmd_args.results is not None else
+                 results.results_path())
+        print(f"{self.warmup_num} warmup, {self.test_num} repeats for evalution"
+              + (f" (up to {self.max_num} until CI <= {self.target_ci:%})"
+                 if self.target_ci > 0 else ""))
+
+    def _converged(self, samples):
+        if len(samples) < max(self.test_num, 1):
+            return False
+        if self.target_ci <= 0 or len(samples) >= self.max_num:
+            return True
+        stats = summarize(samples)
+        return stats['ci95'] <= self.target_ci * stats['mean']
+
+    def run(self, name: str, func, on_first=None):
+        '''
+        Time `func()` and print "<name> Time = <mean> ms" followed by the
+        statistics and the memory usage (see `common.memory`), and with
+        --profile-cpu the CPU counters (see `common.perf`). `name` may be empty
+
+        `on_first` is called with the return value of the first warmup
+        iteration, e.g. to store outputs for checking. Without warmup, it is
+        called with that of the first timed iteration after all the timing
+
+        Returns the statistics as a dict (see `summarize`), with the memory
+        usage under "memory" and the CPU counters under "perf"
+        '''
+
+        ret = None
+        self.memory.start()
+        for i in range(self.warmup_num):
+            ret = func()
+            if i == 0 and on_first is not None:
+                on_first(ret)
+        self.sync(ret)
+
+        first = None
+        samples = []
+        for hook in self.on_start:
+            hook()
+        while not self._converged(samples):
+            # Check convergence in batches, so computing the statistics is not
+            # on the timed path of every iteration
+            batch = max(self.test_num - len(samples), len(samples) // 4, 1)
+            for i in range(min(batch, self.max_num - len(samples))):
+                t0 = time.perf_counter_ns()
+                ret = func()
+                self.sync(ret)
+                samples.append(time.perf_counter_ns() - t0)
+                if len(samples) == 1:
+                    first = ret
+        for hook in self.on_stop:
+            hook()
+        if self.warmup_num <= 0 and on_first is not None:
+            # Outside the timed and profiled iterations
+            on_first(first)
+        memory = self.memory.stop(ret)
+
+        stats = summarize(samples)
+        stats['memory'] = memory
+        if self.perf is not None:
+            phase_flops = flops.phase_flops(name, self.flops) \
+                    if self.flops is not None else None
+            stats['perf'] = perf.summarize(self.perf.counts, len(samples),
+                                           phase_flops)
+        self.results[name] = stats
+        if self.results_path:
+            results.record(name,
+                           samples,
+                           stats,
+                           target=self.target,
+                           path=self.results_path)
+        prefix = name + ' ' if name else ''
+        print(f"{prefix}Time = {stats['mean']} ms")
+        print(f"{prefix}Stats: n={stats['n']}, median={stats['median']:.4f}, "
+              f"p5={stats['p5']:.4f}, p95={stats['p95']:.4f}, "
+              f"p99={stats['p99']:.4f}, std={stats['std']:.4f} ms, "
+              f"cv={stats['cv']:.2%}")
+        print(f"{prefix}Memory: peak RSS={format_bytes(memory['peak_rss'])} "
+              f"(+{format_bytes(memory['rss_growth'])}), returned="
+              f"{format_bytes(memory['returned_bytes'])}, arrays="
+              f"{format_bytes(memory['array_bytes'])}")
+        if self.perf is not None:
+            print(f"{prefix}Perf: {perf.format_counts(stats['perf'])}")
+            print(nvprof.format_table(
+                nvprof.table({name: perf.as_kernel(name or 'run',
+                                                   stats['perf'])})))
+        return stats
@@ -0,0 +1,176 @@
+'''
+Convert `store_txt` text tensors to the binary format, in parallel
+
+Usage (from the repository root):
+
+    python3 -m common.convert [-j <processes>] [--dtype <file>=<dtype>] [--force] <dir-or-file>...
+
+Each `<name>.in` text file is converted to `<name>.in.npy`, with a checksum
+sidecar `<name>.in.npy.sum`. `load_txt` picks up the binary copy automatically
+as long as the sidecar matches the text file. Files whose copy is up to date are
+skipped, so the command can be re-run after regenerating part of the inputs.
+'''
+
+import os
+import glob
+import argparse
+import multiprocessing
+import numpy as np
+
+from .numpy.generate import is_spec
+from .numpy.io import (is_binary, is_converted, converted_path, parse_txt,
+                       write_sidecar, file_sha256, _WHITESPACES)
+
+# Upper bound of the length of one number in the text
+_MAX_TOKEN_LEN = 256
+
+
+def _is_whitespace(byte: bytes):
+    return byte in _WHITESPACES
+
+
+def parse_range(filename: str, data_start: int, start: int, end: int,
+                dtype: str):
+    '''
+    Parse the numbers starting in the byte range [start, end) of a text tensor
+
+    A number belongs to the range holding its first byte, so concatenating the
+    results of consecutive ranges gives the whole tensor
+    '''
+
+    with open(filename, 'rb') as f:
+        skip_first = False
+        if start > data_start:
+            f.seek(start - 1)
+            skip_first = not _is_whitespace(f.read(1))
+        else:
+            f.seek(start)
+        buf = f.read(end - start + _MAX_TOKEN_LEN)
+    body, ext = buf[:end - start], buf[end - start:]
+    if skip_first:
+        # The number started in the previous range
+        cut = min((i for i in map(body.find, _WHITESPACES) if i != -1),
+                  default=len(body))
+        body = body[cut:]
+    if body and not _is_whitespace(body[-1:]):
+        # Complete the last number, which continues past the range
+        cut = min((i for i in map(ext.find, _WHITESPACES) if i != -1),
+                  default=len(ext))
+        body += ext[:cut]
+    return parse_txt(body, dtype)
+
+
+def _parse_range_task(args):
+    return parse_range(*args)
+
+
+def guess_dtype(filename: str):
+    '''
+    Guess the data type of a text tensor from its first MiB of data: float32 if
+    any number is written as a float, int32 otherwise
+    '''
+
+    with open(filename, 'rb') as f:
+        f.readline()
+        sample = f.read(1 << 20)
+    return 'float32' if any(c in sample for c in b'.eEnN') else 'int32'
+
+
+def convert(filename: str,
+            dtype: str,
+            pool: multiprocessing.Pool,
+            range_size: int = 1 << 24):
+    '''
+    Convert one text tensor to its binary copy, splitting the parsing into byte
+    ranges processed by `pool`
+    '''
+
+    with open(filename, 'rb') as f:
+        shape = tuple(map(int, f.readline().split()))
+        data_start = f.tell()
+    size = os.path.getsize(filename)
+    n_ranges = max(1, (size - data_start + range_size - 1) // range_size)
+    bounds = np.linspace(data_start, size, n_ranges + 1).astype(int)
+    tasks = [(filename, data_start, int(start), int(end), dtype)
+             for start, end in zip(bounds[:-1], bounds[1:])]
+
+    # A per-process name, so concurrent converters never share a memmap
+    tmp = f"{converted_path(filename)}.{os.getpid()}.tmp"
+    out = np.lib.format.open_memmap(tmp, mode='w+', dtype=dtype, shape=shape)
+    try:
+        flat = out.reshape(-1)
+        pos = 0
+        results = pool.imap(_parse_range_task, tasks)
+        # Hash the source while the workers are parsing
+        sha256 = file_sha256(filename)
+        for vals in results:
+            if pos + vals.shape[0] > flat.shape[0]:
+                raise ValueError(
+                    f"{filename}: more numbers than its shape {shape}")
+            flat[pos:pos + vals.shape[0]] = vals
+            pos += vals.shape[0]
+        if pos != flat.shape[0]:
+            raise ValueError(
+                f"{filename}: expected {flat.shape[0]} numbers, got {pos}")
+        out.flush()
+        del flat, out
+        os.replace(tmp, converted_path(filename))
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    write_sidecar(filename, dtype, sha256)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        prog='python3 -m common.convert',
+        description='Convert store_txt text tensors to the binary format')
+    parser.add_argument('paths',
+                        nargs='+',
+                        metavar='dir-or-file',
+                        help='Text tensors, or directories of *.in files')
+    parser.add_argument('-j',
+                        type=int,
+                        default=os.cpu_count(),
+                        dest='processes',
+                        help='Number of parsing processes')
+    parser.add_argument('--dtype',
+                        action='append',
+                        default=[],
+                        metavar='FILE=DTYPE',
+                        help='Data type of a file, guessed if not given')
+    parser.add_argument('--force',
+                        action='store_true',
+                        help='Convert even if the binary copy is up to date')
+    cmd_args = parser.parse_args()
+
+    dtypes = {}
+    for item in cmd_args.dtype:
+        name, dtype = item.split('=')
+        dtypes[os.path.basename(name)] = dtype
+
+    files = []
+    for path in cmd_args.paths:
+        if os.path.isdir(path):
+            files += sorted(glob.glob(os.path.join(path, '*.in')))
+        else:
+            files.append(path)
+
+    with multiprocessing.Pool(cmd_args.processes) as pool:
+        for filename in files:
+            if is_binary(filename):
+                print(f"{filename}: already binary, skipped")
+                continue
+            if is_spec(filename):
+                print(f"{filename}: synthesized, skipped")
+                continue
+            dtype = dtypes.get(os.path.basename(filename))
+            if dtype is None:
+                dtype = guess_dtype(filename)
+            if not cmd_args.force and is_converted(filename, dtype):
+                print(f"{filename}: up to date")
+                continue
+            convert(filename, dtype, pool)
+            print(f"{filename}: converted to {converted_path(filename)} "
+                  f"({dtype})")
@@ -0,0 +1,101 @@
+'''
+Pin benchmarks to a set of cores with consistent thread counts
+
+FreeTensor (OpenMP), PyTorch, JAX (XLA), TVM and Julia each choose their own
+number of threads, usually one per core of the machine regardless of the CPU
+affinity. `thread_env` gives the environment variables that make all of them use
+the same number of threads, and `pin` applies it to the running process
+'''
+
+import os
+import sys
+
+# Set by `pin` before re-executing, so the new process does not do it again
+_PINNED_ENV = 'BENCHMARK_PINNED'
+
+
+def parse_cores(cores: str):
+    '''
+    Parse a core list like "0-3,8,10-11" (as taskset -c) into a sorted list
+    '''
+
+    ret = set()
+    for part in cores.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        lo, _, hi = part.partition('-')
+        ret.update(range(int(lo), int(hi or lo) + 1))
+    if not ret:
+        raise ValueError(f"Empty core list: {cores}")
+    return sorted(ret)
+
+
+def available_cores():
+    return sorted(os.sched_getaffinity(0))
+
+
+def thread_env(num_threads: int):
+    '''
+    Environment variables setting the number of threads of every framework
+    '''
+
+    n = str(num_threads)
+    env = {
+        'OMP_NUM_THREADS': n,
+        'MKL_NUM_THREADS': n,
+        'OPENBLAS_NUM_THREADS': n,
+        'TVM_NUM_THREADS': n,
+        'JULIA_NUM_THREADS': n,
+        # Keep OpenMP threads on their cores, so runs are comparable
+        'OMP_PROC_BIND': 'close',
+        'OMP_PLACES': 'cores',
+    }
+    # XLA sizes its thread pool by the CPU affinity, which `pin` sets. A single
+    # thread additionally needs Eigen's multi-threading to be disabled
+    xla_flags = os.environ.get('XLA_FLAGS', '')
+    if num_threads == 1 and 'xla_cpu_multi_thread_eigen' not in xla_flags:
+        xla_flags = (xla_flags +
+                     ' --xla_cpu_multi_thread_eigen=false').strip()
+    if xla_flags:
+        env['XLA_FLAGS'] = xla_flags
+    return env
+
+
+def pin(cores=None, num_threads: int = None):
+    '''
+    Restrict this process to `cores` and set the numbers of threads to
+    `num_threads` (by default one per core)
+
+    Thread pools of OpenMP, XLA and BLAS read their settings when they are
+    loaded, which has usually happened by the time the command line is parsed.
+    So if the environment has to change, the process re-executes itself with the
+    new environment and affinity, and this function does not return
+    '''
+
+    if cores is not None:
+        os.sched_setaffinity(0, cores)
+    if num_threads is None:
+        num_threads = len(os.sched_getaffinity(0))
+    env = thread_env(num_threads)
+    if not os.environ.get(_PINNED_ENV) and any(
+            os.environ.get(k) != v for k, v in env.items()):
+        os.environ.update(env)
+        os.environ[_PINNED_ENV] = '1'
+        spec = getattr(sys.modules['__main__'], '__spec__', None)
+        argv = ['-m', spec.name] if spec is not None else [sys.argv[0]]
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os.execv(sys.executable, [sys.executable] + argv + sys.argv[1:])
+
+    if 'torch' in sys.modules:
+        sys.modules['torch'].set_num_threads(num_threads)
+
+
+def current_threads():
+    '''
+    The number of threads set by `pin` or `thread_env`, or None if not set
+    '''
+
+    n = os.environ.get('OMP_NUM_THREADS')
+    return int(n) if n and n.isdigit() else None
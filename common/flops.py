@@ -0,0 +1,136 @@
+'''
+Amount of work of each workload, for throughput numbers
+
+`work` reads the shapes of the inputs written by a workload's `gen_data.py`, and
+returns the number of elements (the natural unit of each workload, e.g. faces or
+edges) and an analytic count of floating-point operations of the inference pass.
+Counts follow the FreeTensor implementations: an add, multiply, compare or
+division is 1 FLOP, and exp, sqrt, sigmoid are 1 FLOP each. The forward pass
+does the same work as inference, and a backward pass is conventionally counted
+as twice the forward pass
+'''
+
+import os
+import argparse
+
+from .numpy.io import tensor_shape
+from .results import phase_of
+
+# Backward FLOPs per forward FLOP
+BACKWARD_FACTOR = 2
+
+
+def _shape(directory: str, name: str):
+    return tensor_shape(os.path.join(directory, name + '.in'))
+
+
+def subdivnet(directory: str):
+    n_faces, in_feats = _shape(directory, 'x')
+    _, out_feats = _shape(directory, 'w0')
+    # Per face: 3 neighbor sums (1 + 3 + 3 FLOPs per neighbor and feature), 4
+    # matrix-vector products and 3 additions of the results
+    flops = n_faces * (21 * in_feats + 8 * in_feats * out_feats + 3 * out_feats)
+    return n_faces, flops
+
+
+def gat(directory: str):
+    num_v, feat_len = _shape(directory, 'x')
+    num_e, = _shape(directory, 'idx')
+    # Dense: feat @ weight and the two attention projections. Per edge: the
+    # score, leaky ReLU, max, exp and sum, then the weighted aggregation (a
+    # multiply, a division and an add per feature)
+    flops = (2 * num_v * feat_len * feat_len + 4 * num_v * feat_len + num_e *
+             (6 + 3 * feat_len))
+    return num_e, flops
+
+
+def longformer(directory: str, w: int = 32):
+    n_heads, seq_len, feat_len = _shape(directory, 'q')
+    # Per query: 2w + 1 dot products with keys, softmax, and 2w + 1 weighted
+    # value accumulations
+    flops = n_heads * seq_len * (2 * w + 1) * (4 * feat_len + 4)
+    return n_heads * seq_len, flops
+
+
+def _savetxt_shape(directory: str, name: str):
+    # lstm/gen_data.py writes with np.savetxt, which has no shape header
+    with open(os.path.join(directory, name + '.in')) as f:
+        first = f.readline()
+        return 1 + sum(1 for _ in f), len(first.split())
+
+
+def lstm(directory: str):
+    length, in_feats = _savetxt_shape(directory, 'x')
+    hidden_feats, _ = _savetxt_shape(directory, 'bf')
+    # Per step: 4 gates of W x + U h + b with an activation, then the cell and
+    # hidden state updates
+    flops = length * (4 * hidden_feats *
+                      (2 * in_feats + 2 * hidden_feats + 2) + 5 * hidden_feats)
+    return length * hidden_feats, flops
+
+
+def softrast(directory: str):
+    n_faces, h, w = _shape(directory, 'd_y')
+    # Per face and pixel: ~25 FLOPs of cross products, dot products and norms
+    # for each of the 3 edges, then the min, the scaling and the sigmoid
+    flops = n_faces * h * w * (3 * 25 + 10)
+    return n_faces * h * w, flops
+
+
+WORKLOADS = {
+    'subdivnet': subdivnet,
+    'gat': gat,
+    'longformer': longformer,
+    'lstm': lstm,
+    'softrast': softrast,
+}
+
+# Command line options of main.py that change the work but not the inputs
+OPTIONS = {
+    'longformer': ['--w'],
+}
+
+
+def _options(workload: str, config):
+    '''
+    Keyword arguments of a workload's count from its command line options, e.g.
+    ["--w", "64"] -> {"w": 64}
+    '''
+
+    parser = argparse.ArgumentParser(add_help=False)
+    for opt in OPTIONS.get(workload, []):
+        parser.add_argument(opt, type=int)
+    args, _ = parser.parse_known_args(config)
+    return {k: v for k, v in vars(args).items() if v is not None}
+
+
+def work(workload: str, directory: str = None, config=None, **params):
+    '''
+    (elements, inference FLOPs) of a workload, from the inputs in `directory`
+    (default: the workload's directory) and the options of main.py in `config`
+    (e.g. `results.config_args()`). Returns None for an unknown workload or
+    missing inputs
+    '''
+
+    if workload not in WORKLOADS:
+        return None
+    if directory is None:
+        directory = os.path.join(os.path.dirname(os.path.dirname(
+            os.path.abspath(__file__))), workload)
+    params = {**_options(workload, config or []), **params}
+    try:
+        return WORKLOADS[workload](directory, **params)
+    except (OSError, ValueError):
+        return None
+
+
+def phase_flops(phase: str, flops: int):
+    '''
+    FLOPs of a phase, from its name (e.g. "Inference", "Impl1 Backward" or
+    "Forward+Backward")
+    '''
+
+    phase = phase_of(phase)
+    if phase == 'forward+backward':
+        return flops * (1 + BACKWARD_FACTOR)
+    return flops * BACKWARD_FACTOR if phase == 'backward' else flops
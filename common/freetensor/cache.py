@@ -0,0 +1,183 @@
+'''
+On-disk cache of generated kernel code
+
+`optimize` is a drop-in for `ft.optimize` with `auto_schedule`. The code
+generated for a function is stored under a key hashing the function's AST (which
+includes its shapes), the target, the schedule and the versions of FreeTensor
+and the native compiler. A warm start skips scheduling and code generation. It
+still lowers the function, which is cheap, so that `ft.Driver` binds parameters
+from a lowered function on both warm and cold starts
+
+Entries are single files written atomically, so parallel runs can share a cache.
+The cache lives in `$FT_KERNEL_CACHE_DIR` (default
+`~/.cache/freetensor_experiments/kernels`) and is evicted in least-recently-used
+order to fit in `$FT_KERNEL_CACHE_SIZE` (default 2G, 0 disables it)
+'''
+
+import os
+import re
+import sys
+import json
+import glob
+import hashlib
+import functools
+import subprocess
+import freetensor as ft
+from freetensor import debug
+
+from .. import lru
+
+CACHE_DIR_ENV = 'FT_KERNEL_CACHE_DIR'
+CACHE_SIZE_ENV = 'FT_KERNEL_CACHE_SIZE'
+DEFAULT_CACHE_DIR = '~/.cache/freetensor_experiments/kernels'
+DEFAULT_CACHE_SIZE = '2G'
+
+
+def cache_dir():
+    return os.path.expanduser(
+        os.environ.get(CACHE_DIR_ENV, DEFAULT_CACHE_DIR))
+
+
+def cache_budget():
+    return lru.parse_size(os.environ.get(CACHE_SIZE_ENV, DEFAULT_CACHE_SIZE))
+
+
+@functools.lru_cache(maxsize=None)
+def _command_version(*cmd):
+    try:
+        return subprocess.run(cmd,
+                              stdout=subprocess.PIPE,
+                              stderr=subprocess.STDOUT,
+                              timeout=30).stdout.decode()
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def toolchain_version(device):
+    '''
+    Identify the FreeTensor build and the native compilers, so a rebuild or a
+    compiler upgrade invalidates the cache
+    '''
+
+    ret = [getattr(ft, '__version__', None)]
+    for name in ('freetensor', 'freetensor_ffi'):
+        path = getattr(sys.modules.get(name), '__file__', None)
+        if path is not None:
+            ret.append((path, os.path.getmtime(path)))
+    ret.append(_command_version(os.environ.get('CXX', 'c++'), '--version'))
+    if device.target().type() == ft.TargetType.GPU:
+        ret.append(_command_version('nvcc', '--version'))
+    return ret
+
+
+def _target_id(target):
+    ret = str(target)
+    # Bindings without a __str__ print the address, which differs per process
+    return re.sub(r' at 0x[0-9a-f]+', '', ret)
+
+
+def cache_key(func, device, schedule: str):
+    h = hashlib.sha256()
+    for part in (str(func), _target_id(device.target()),
+                 str(device.target().type()), schedule,
+                 toolchain_version(device)):
+        h.update(repr(part).encode())
+        h.update(b'\0')
+    return h.hexdigest()
+
+
+def load_code(key: str):
+    path = os.path.join(cache_dir(), key + '.json')
+    try:
+        with open(path) as f:
+            entry = json.load(f)
+    except (OSError, ValueError):
+        return None
+    lru.touch(path)
+    return entry['code']
+
+
+def store_code(key: str, code: str):
+    '''
+    Store an entry and evict old ones. Failing to write (e.g. a read-only home)
+    only disables caching
+    '''
+
+    budget = cache_budget()
+    directory = cache_dir()
+    path = os.path.join(directory, key + '.json')
+    tmp = f"{path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(directory, exist_ok=True)
+        with open(tmp, 'w') as f:
+            json.dump({'code': code}, f)
+        os.replace(tmp, path)
+        with lru.locked(os.path.join(directory, '.lock')):
+            entries = []
+            for entry in glob.glob(os.path.join(directory, '*.json')):
+                try:
+                    st = os.stat(entry)
+                    entries.append((entry, st.st_size, st.st_mtime))
+                except OSError:
+                    pass  # Removed by another process
+            for victim in lru.evict(entries, budget):
+                os.remove(victim)
+    except OSError as e:
+        print(f"Kernel cache not written: {e}", file=sys.stderr)
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def optimize(func,
+             device,
+             schedule_callback=None,
+             schedule: str = 'auto_schedule',
+             verbose: int = 0):
+    '''
+    Schedule, lower and generate code for `func`, or reuse code cached on disk,
+    and build an executable for `device`
+
+    The returned `ft.Driver` is still compiled natively on every process start:
+    the driver does not accept a prebuilt shared object
+
+
+    Parameters
+    ----------
+    func: ft.Func
+        The transformed function
+    device: ft.Device
+        Device to run on
+    schedule_callback: callable, optional
+        Schedules to apply on an `ft.Schedule`. Defaults to `auto_schedule` on
+        the device's target
+    schedule: str
+        A name identifying `schedule_callback` in the cache key. Different
+        callbacks must have different names
+    verbose: int
+        Print the lowered AST and the code if > 0
+    '''
+
+    target = device.target()
+    if schedule_callback is None:
+        schedule_callback = lambda s: s.auto_schedule(target)
+
+    key = cache_key(func, device, schedule) if cache_budget() > 0 else None
+    code = load_code(key) if key is not None else None
+    if code is not None:
+        if verbose > 0:
+            print(f"Code loaded from the kernel cache ({key[:16]})")
+            print(debug.with_line_no(code))
+        # Scheduling does not change the parameters and returns, so the lowered
+        # unscheduled function has the signature of the cached code
+        return ft.Driver(ft.lower(func, target), code, device)
+
+    s = ft.Schedule(func)
+    schedule_callback(s)
+    f = ft.lower(s.func(), target)
+    code = ft.codegen(f, target)
+    if verbose > 0:
+        print(f)
+        print(debug.with_line_no(code))
+    if key is not None:
+        store_code(key, code)
+    return ft.Driver(f, code, device)
@@ -0,0 +1,88 @@
+import time
+import collections
+
+
+class ExecutableCache:
+    '''
+    Compiled executables specialized by shape, with LRU eviction
+
+    Arguments are bound on every call, so one executable serves any arrays of
+    its shapes. Binding is skipped when the arrays are the same objects as in
+    the previous call to the same executable
+
+
+    Parameters
+    ----------
+    capacity: int
+        Maximum number of executables kept. The least recently used one is
+        dropped when exceeded
+    '''
+
+    def __init__(self, capacity: int = 16):
+        assert capacity > 0
+        self.capacity = capacity
+        self.entries = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.compile_time = 0.
+
+    @staticmethod
+    def key(shapes, device):
+        '''
+        Shapes alone are not enough: the same shapes compile to different code
+        for different targets or memory types
+        '''
+
+        return (tuple(shapes), str(device.target().type()),
+                str(device.main_mem_type()))
+
+    def get(self, shapes, device, build):
+        '''
+        Get the executable for `shapes` on `device`, calling `build()` to compile
+        it on a miss
+        '''
+
+        key = self.key(shapes, device)
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return self.entries[key][0]
+        self.misses += 1
+        t0 = time.time()
+        exe = build()
+        self.compile_time += time.time() - t0
+        # The second element holds the arguments bound last
+        self.entries[key] = [exe, None]
+        if len(self.entries) > self.capacity:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+        return exe
+
+    def run(self, shapes, device, build, *args):
+        '''
+        Get the executable, bind `args`, and run it to completion
+        '''
+
+        exe = self.get(shapes, device, build)
+        entry = self.entries[self.key(shapes, device)]
+        if entry[1] is None or len(entry[1]) != len(args) or any(
+                a is not b for a, b in zip(entry[1], args)):
+            exe.set_params(*args)
+            entry[1] = args
+        exe.run()
+        exe.sync()
+
+    def stats(self):
+        return {
+            'size': len(self.entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'compile_time': self.compile_time,
+        }
+
+    def __str__(self):
+        return (f"{len(self.entries)} executables, {self.hits} hits, "
+                f"{self.misses} misses, {self.evictions} evictions, "
+                f"{self.compile_time:.3f}s compiling")
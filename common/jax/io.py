@@ -1,17 +1,11 @@
 import jax
 import jax.numpy as jnp
 
+from ..numpy import io as np_io
+
 
 def load_txt(filename: str, dtype: str):
-    with open(filename) as f:
-        shape = list(map(int, f.readline().split()))
-        if dtype.startswith('int'):
-            data = list(map(int, f.readline().split()))
-        elif dtype.startswith('float'):
-            data = list(map(float, f.readline().split()))
-        else:
-            assert False
-        return jnp.array(data, dtype=dtype).reshape(shape)
+    return jnp.array(np_io.load_txt(filename, dtype))
 
 
 def store_txt(filename: str, tensor: jnp.array):
@@ -0,0 +1,72 @@
+import os
+import re
+import fcntl
+import contextlib
+
+
+def parse_size(size: str):
+    '''
+    Parse a size like "512M" or "16G" (powers of 1024) into bytes
+    '''
+
+    m = re.fullmatch(r'\s*(\d+)\s*([KMGT]?)i?B?\s*', size, re.I)
+    if m is None:
+        raise ValueError(f"Invalid size: {size}")
+    unit = ' KMGT'.index(m.group(2).upper() or ' ')
+    return int(m.group(1)) * 1024**unit
+
+
+def touch(path: str):
+    '''
+    Mark an entry as recently used
+    '''
+
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+
+
+@contextlib.contextmanager
+def locked(lock_path: str):
+    '''
+    Hold an exclusive advisory lock on `lock_path` (created if missing), so
+    eviction is not run by several processes at once
+    '''
+
+    with open(lock_path, 'a') as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def evict(entries, budget: int):
+    '''
+    Choose least-recently-used entries to remove so the total size fits in the
+    budget
+
+
+    Parameters
+    ----------
+    entries: list of (key, size, last_used)
+        Size in bytes, and last use time (e.g. an mtime) of each entry
+    budget: int
+        Maximum total size in bytes
+
+
+    Returns
+    -------
+    list
+        Keys of the entries to remove, least recently used first
+    '''
+
+    total = sum(size for _, size, _ in entries)
+    ret = []
+    for key, size, _ in sorted(entries, key=lambda e: e[2]):
+        if total <= budget:
+            break
+        ret.append(key)
+        total -= size
+    return ret
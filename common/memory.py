@@ -0,0 +1,207 @@
+'''
+Memory usage of benchmark phases
+
+For every phase, `common.benchmark.Benchmark` records:
+
+- peak_rss: the peak resident set size of the process during the phase (the
+  high water mark is reset before the phase through /proc/self/clear_refs)
+- rss_growth: how much the peak exceeds the resident set size before the phase
+- returned_bytes: the size of the arrays returned by the timed callable, e.g. the
+  tapes a forward pass of the FreeTensor implementations returns for the backward
+  pass
+- array_bytes: the size of the arrays registered with `PhaseMemory.track`, e.g.
+  all `ft.Array`s of a program
+
+Only host memory is covered by the RSS numbers, but returned_bytes and
+array_bytes count arrays on any device
+
+To choose a configuration (e.g. with or without --ad-save-all) within a memory
+budget (from the repository root):
+
+    python3 -m common.memory --budget <size> [--workload <name>] [--results <file>]
+'''
+
+import math
+import argparse
+import numpy as np
+
+from . import results
+from .lru import parse_size
+
+
+def _status(field: str):
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith(field + ':'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def current_rss():
+    return _status('VmRSS')
+
+
+def peak_rss():
+    return _status('VmHWM')
+
+
+def reset_peak_rss():
+    '''
+    Reset the peak RSS to the current RSS. Returns False if not supported
+    '''
+
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def nbytes(obj):
+    '''
+    Total size of the arrays in `obj`, which may be an array of FreeTensor,
+    NumPy, PyTorch or JAX, or a tuple, list or dict of them
+    '''
+
+    if obj is None:
+        return 0
+    if isinstance(obj, (tuple, list)):
+        return sum(nbytes(x) for x in obj)
+    if isinstance(obj, dict):
+        return sum(nbytes(x) for x in obj.values())
+    if hasattr(obj, 'element_size') and hasattr(obj, 'numel'):  # PyTorch
+        return obj.element_size() * obj.numel()
+    if hasattr(obj, 'nbytes'):
+        return int(obj.nbytes)
+    if hasattr(obj, 'shape') and hasattr(obj, 'dtype'):  # ft.Array
+        # From the shape, without copying a device array to the host
+        return math.prod(obj.shape) * np.dtype(str(obj.dtype)).itemsize
+    return 0
+
+
+class PhaseMemory:
+    '''
+    Measure the memory usage of one phase at a time
+    '''
+
+    def __init__(self):
+        self.arrays = []
+        self.rss_before = None
+        self.peak_supported = False
+
+    def track(self, *arrays):
+        '''
+        Count these arrays in array_bytes of every phase
+        '''
+
+        self.arrays += arrays
+
+    def start(self):
+        self.peak_supported = reset_peak_rss()
+        self.rss_before = current_rss()
+
+    def stop(self, ret):
+        peak = peak_rss()
+        if not self.peak_supported and peak is not None:
+            # The high water mark covers the whole process, not only the phase
+            peak = None
+        return {
+            'peak_rss': peak,
+            'rss_growth': peak - self.rss_before
+                          if peak is not None and self.rss_before is not None
+                          else None,
+            'returned_bytes': nbytes(ret),
+            'array_bytes': nbytes(self.arrays),
+        }
+
+
+def format_bytes(n):
+    if n is None:
+        return '-'
+    for unit in ['B', 'K', 'M', 'G']:
+        if abs(n) < 1024 or unit == 'G':
+            return f"{n:.1f}{unit}" if unit != 'B' else f"{n}B"
+        n /= 1024
+
+
+def footprint(memory: dict, target: str):
+    '''
+    Memory a phase needs: its peak RSS on CPU, or the arrays it uses on GPU (or
+    if the RSS is not known)
+    '''
+
+    if target != 'gpu' and memory.get('peak_rss') is not None:
+        return memory['peak_rss']
+    return memory.get('array_bytes', 0) + memory.get('returned_bytes', 0)
+
+
+def choose(records, budget: int, workload: str = None):
+    '''
+    For each workload, implementation, target, input shapes and number of
+    threads, list the configurations (the command line options other than the
+    benchmark ones) with their largest footprint over all phases and their total
+    latency, fastest first, and whether they fit in `budget` bytes
+    '''
+
+    configs = {}
+    shapes = {}
+    for rec in records:
+        memory = rec.get('stats', {}).get('memory')
+        if memory is None or (workload and rec['workload'] != workload):
+            continue
+        # Runs at other sizes or thread counts (e.g. of sweeps) are kept apart
+        key = (rec['workload'], rec['impl'], rec['target'],
+               rec.get('fingerprint') or '', rec.get('threads') or 0,
+               ' '.join(rec.get('config', [])))
+        shapes[key[:5]] = rec.get('shapes') or {}
+        phases = configs.setdefault(key, {})
+        # Keep the latest run of each phase
+        phases[rec['phase']] = (footprint(memory, rec['target']),
+                                 rec['stats']['mean'])
+    ret = {}
+    for key, phases in sorted(configs.items()):
+        config = key[5]
+        peak = max(m for m, _ in phases.values())
+        total = sum(t for _, t in phases.values())
+        ret.setdefault(key[:5], []).append({
+            'config': config,
+            'peak': peak,
+            'time': total,
+            'fits': peak <= budget,
+        })
+    for key, rows in ret.items():
+        rows.sort(key=lambda row: (not row['fits'], row['time']))
+        for row in rows:
+            row['shapes'] = shapes[key]
+    return ret
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        prog='python3 -m common.memory',
+        description='Pick the fastest configuration within a memory budget')
+    parser.add_argument('--budget', type=parse_size, required=True)
+    parser.add_argument('--workload', default=None)
+    parser.add_argument('--results', default=None)
+    cmd_args = parser.parse_args()
+
+    choices = choose(results.load(cmd_args.results), cmd_args.budget,
+                     cmd_args.workload)
+    if not choices:
+        print("No results with memory usage found")
+        exit(0)
+    for (workload, impl, target, _, threads), rows in choices.items():
+        inputs = ', '.join(f"{name}={tuple(shape)}"
+                           for name, shape in rows[0]['shapes'].items())
+        threads = f", {threads} threads" if threads else ''
+        print(f"{workload}/{impl} ({target}{threads}): {inputs}")
+        for i, row in enumerate(rows):
+            mark = '*' if i == 0 and row['fits'] else ' '
+            fits = '' if row['fits'] else '  over budget'
+            print(f" {mark} {row['config'] or '(default)':<30}"
+                  f"{format_bytes(row['peak']):>10}{row['time']:>12.4f} ms"
+                  f"{fits}")
@@ -0,0 +1,301 @@
+'''
+Compare outputs of two implementations in bounded memory
+
+Both files are streamed in aligned chunks of `chunk_size` elements: binary files
+(and the binary copies of text files) are memory-mapped and sliced, and text
+files are parsed a byte chunk at a time with `iter_txt`. Each pair of chunks is
+checked with the tolerance of `np.isclose(data2, data1, rtol, atol)` (so `data1`
+is the reference), and the comparison accumulates the max absolute and relative
+errors, a histogram of ULP distances and the first mismatching indices. Unless
+`full` is set, it stops after the first chunk with a mismatch
+
+From the repository root:
+
+    python3 -m common.numpy.compare <file1> <file2> [--rtol 1e-4] [--atol 1e-4]
+'''
+
+import sys
+import argparse
+import itertools
+import numpy as np
+
+from .io import is_binary, is_converted, converted_path, load, iter_txt
+from .generate import is_spec, synthesize
+
+DEFAULT_CHUNK_SIZE = 1 << 20
+
+# Bytes of text to parse at a time
+TXT_CHUNK_SIZE = 1 << 22
+
+
+def _slices(data: np.array, chunk_size: int):
+    flat = data.reshape(-1)
+    for start in range(0, flat.shape[0], chunk_size):
+        yield flat[start:start + chunk_size]
+
+
+def _rechunk(chunks, chunk_size: int):
+    buf, count = [], 0
+    for chunk in chunks:
+        while chunk.shape[0] > 0:
+            n = min(chunk_size - count, chunk.shape[0])
+            buf.append(chunk[:n])
+            chunk = chunk[n:]
+            count += n
+            if count == chunk_size:
+                yield buf[0] if len(buf) == 1 else np.concatenate(buf)
+                buf, count = [], 0
+    if count > 0:
+        yield buf[0] if len(buf) == 1 else np.concatenate(buf)
+
+
+def stream(filename: str,
+           dtype: str = 'float32',
+           chunk_size: int = DEFAULT_CHUNK_SIZE,
+           header: bool = True):
+    '''
+    Open a tensor for streaming
+
+    Parameters
+    ----------
+    filename: str
+        A tensor written by `store`, `store_txt`, as a spec file, or (with
+        `header=False`) by `np.savetxt`
+    dtype: str
+    chunk_size: int
+        Number of elements per chunk
+    header: bool
+        Whether a text file starts with a shape line
+
+    Returns
+    -------
+    (shape, chunks)
+        The shape (None if the file has no header), and an iterator of 1-D
+        chunks of `chunk_size` elements (the last one may be shorter)
+    '''
+
+    if is_binary(filename):
+        data = load(filename)
+        return list(data.shape), _slices(data, chunk_size)
+    if is_spec(filename):
+        data = synthesize(filename, dtype)
+        return list(data.shape), _slices(data, chunk_size)
+    if header and is_converted(filename, dtype):
+        data = load(converted_path(filename))
+        return list(data.shape), _slices(data, chunk_size)
+
+    f = open(filename, 'rb')
+    shape = list(map(int, f.readline().split())) if header else None
+
+    def chunks():
+        with f:
+            yield from _rechunk(iter_txt(f, dtype, TXT_CHUNK_SIZE), chunk_size)
+
+    return shape, chunks()
+
+
+def _ordered(data: np.array):
+    # Map the bits of IEEE floats to integers in the same order as the values,
+    # so the difference of two mapped values is their distance in ULPs
+    bits = np.ascontiguousarray(data).view(f"i{data.dtype.itemsize}")
+    bits = bits.astype(np.int64)
+    sign = np.int64(-1) << np.int64(8 * data.dtype.itemsize - 1)
+    return np.where(bits < 0, sign - bits, bits).astype(np.float64)
+
+
+def ulp_bucket_name(bucket: int):
+    if bucket <= 1:
+        return str(bucket)
+    return f"{1 << (bucket - 1)}-{(1 << bucket) - 1}"
+
+
+class Comparison:
+    '''
+    Result of `compare`. True if the files match
+    '''
+
+    def __init__(self, shape):
+        self.shape = shape
+        self.size_mismatch = None
+        self.compared = 0
+        self.mismatches = 0
+        self.nans = 0
+        self.max_abs = 0.
+        self.max_abs_index = None
+        self.max_rel = 0.
+        self.max_rel_index = None
+        # Bucket 0 counts equal values, and bucket k > 0 distances in
+        # [2^(k-1), 2^k)
+        self.ulp_hist = np.zeros((66,), dtype=np.int64)
+        self.first = []
+        self.stopped_early = False
+
+    def __bool__(self):
+        return self.size_mismatch is None and self.mismatches == 0
+
+    def index(self, flat: int):
+        if self.shape is None:
+            return flat
+        return tuple(map(int, np.unravel_index(flat, self.shape)))
+
+    def report(self):
+        lines = []
+        if self.size_mismatch is not None:
+            lines.append(f"Size mismatch: {self.size_mismatch}")
+        scope = (f"in the first {self.compared} elements"
+                 if self.stopped_early else f"in {self.compared} elements")
+        lines.append(f"{self.mismatches} mismatches {scope}, "
+                     f"max abs error {self.max_abs:.3g} at "
+                     f"{self.index(self.max_abs_index or 0)}, "
+                     f"max rel error {self.max_rel:.3g} at "
+                     f"{self.index(self.max_rel_index or 0)}")
+        if self.nans:
+            lines.append(f"{self.nans} positions are NaN in either output")
+        buckets = np.nonzero(self.ulp_hist)[0]
+        if buckets.shape[0] > 0:
+            lines.append("ULP distances: " + ", ".join(
+                f"{ulp_bucket_name(b)}: {self.ulp_hist[b]}" for b in buckets))
+        if self.first:
+            lines.append("First mismatches:")
+            for i, v1, v2 in self.first:
+                lines.append(f"  {self.index(i)}: {v1} vs {v2}")
+        return '\n'.join(lines)
+
+    def update(self, offset: int, data1: np.array, data2: np.array, rtol: float,
+               atol: float, max_mismatches: int):
+        a = data1.astype(np.float64)
+        b = data2.astype(np.float64)
+        diff = np.abs(b - a)
+        nan = np.isnan(diff)
+        self.nans += int(np.count_nonzero(nan))
+        diff[nan] = 0
+        ok = diff <= atol + rtol * np.abs(a)
+        ok &= ~nan
+        self.compared += a.shape[0]
+
+        i = int(np.argmax(diff))
+        if diff[i] > self.max_abs:
+            self.max_abs, self.max_abs_index = float(diff[i]), offset + i
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rel = np.where(a != 0, diff / np.abs(a), 0.)
+        i = int(np.argmax(rel))
+        if rel[i] > self.max_rel:
+            self.max_rel, self.max_rel_index = float(rel[i]), offset + i
+
+        if data1.dtype.kind == 'f' and data1.dtype == data2.dtype:
+            ulp = np.abs(_ordered(data1) - _ordered(data2))[~nan]
+            _, exp = np.frexp(ulp)
+            self.ulp_hist += np.bincount(exp, minlength=66)[:66]
+
+        bad = np.nonzero(~ok)[0]
+        self.mismatches += bad.shape[0]
+        for j in bad[:max(max_mismatches - len(self.first), 0)]:
+            self.first.append((offset + int(j), data1[j].item(),
+                               data2[j].item()))
+
+
+def compare(file1: str,
+            file2: str,
+            rtol: float = 1e-4,
+            atol: float = 1e-4,
+            dtype: str = 'float32',
+            header: bool = True,
+            chunk_size: int = DEFAULT_CHUNK_SIZE,
+            max_mismatches: int = 10,
+            full: bool = False):
+    '''
+    Compare two tensors chunk by chunk
+
+    Parameters
+    ----------
+    file1, file2: str
+        The reference and the tensor to check (see `stream`)
+    rtol, atol: float
+        Tolerances, as in `np.isclose`. NaNs never match
+    dtype: str
+    header: bool
+        False for text files written by `np.savetxt`
+    chunk_size: int
+        Number of elements compared at a time
+    max_mismatches: int
+        Number of mismatching indices to record
+    full: bool
+        Compare all elements instead of stopping after the first chunk with a
+        mismatch
+
+    Returns
+    -------
+    Comparison
+    '''
+
+    shape1, chunks1 = stream(file1, dtype, chunk_size, header)
+    shape2, chunks2 = stream(file2, dtype, chunk_size, header)
+    ret = Comparison(shape1)
+    if shape1 != shape2:
+        ret.size_mismatch = f"shape {shape1} vs {shape2}"
+        return ret
+    offset = 0
+    for data1, data2 in itertools.zip_longest(chunks1, chunks2):
+        if data1 is None or data2 is None or data1.shape != data2.shape:
+            ends = offset + min(x.shape[0] for x in (data1, data2)
+                                if x is not None)
+            ret.size_mismatch = f"one of the outputs ends after {ends} elements"
+            break
+        ret.update(offset, data1, data2, rtol, atol, max_mismatches)
+        offset += data1.shape[0]
+        if ret.mismatches and not full:
+            ret.stopped_early = True
+            break
+    for chunks in (chunks1, chunks2):
+        if hasattr(chunks, 'close'):
+            chunks.close()
+    return ret
+
+
+def compare_outputs(dir1: str, dir2: str, names, rtol: float = 1e-4,
+                    atol: float = 1e-4, **kvs):
+    '''
+    Compare `<name>.out` of each name in two output directories, as the
+    compare.py of each workload does. Exits with -1 on the first mismatch
+    '''
+
+    for name in names:
+        print(f"Comparing {name}")
+        result = compare(f"{dir1}/{name}.out", f"{dir2}/{name}.out", rtol, atol,
+                         **kvs)
+        if not result:
+            print(result.report())
+            print(f"{name} differs")
+            exit(-1)
+    print("All output matches")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(prog='python3 -m common.numpy.compare',
+                                     description='Compare two output tensors')
+    parser.add_argument('file1')
+    parser.add_argument('file2')
+    parser.add_argument('--rtol', type=float, default=1e-4)
+    parser.add_argument('--atol', type=float, default=1e-4)
+    parser.add_argument('--dtype', default='float32')
+    parser.add_argument('--no-header',
+                        action='store_true',
+                        help='The files are written by np.savetxt')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument('--max-mismatches', type=int, default=10)
+    parser.add_argument('--full',
+                        action='store_true',
+                        help='Do not stop at the first mismatching chunk')
+    cmd_args = parser.parse_args()
+
+    result = compare(cmd_args.file1,
+                     cmd_args.file2,
+                     cmd_args.rtol,
+                     cmd_args.atol,
+                     cmd_args.dtype,
+                     not cmd_args.no_header,
+                     cmd_args.chunk_size,
+                     cmd_args.max_mismatches,
+                     cmd_args.full)
+    print(result.report())
+    sys.exit(0 if result else 1)
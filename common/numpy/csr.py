@@ -0,0 +1,135 @@
+import numpy as np
+
+
+def degrees(ptr: np.array):
+    '''
+    Number of entries of each row of a CSR matrix
+    '''
+
+    return np.diff(ptr)
+
+
+def validate_csr(ptr: np.array, idx: np.array, num_cols: int = None):
+    '''
+    Check that (ptr, idx) is a well-formed CSR matrix, raising ValueError if not
+
+    `ptr` must start from 0, be non-decreasing and end at the number of entries,
+    and each column index must be in [0, num_cols) (num_cols defaults to the
+    number of rows, as in an adjacency matrix)
+    '''
+
+    if ptr.ndim != 1 or idx.ndim != 1 or ptr.shape[0] == 0:
+        raise ValueError("ptr and idx must be non-empty 1-D arrays")
+    if ptr[0] != 0 or ptr[-1] != idx.shape[0]:
+        raise ValueError(f"ptr must range from 0 to {idx.shape[0]}, got "
+                         f"{ptr[0]} to {ptr[-1]}")
+    if np.any(np.diff(ptr) < 0):
+        raise ValueError("ptr must be non-decreasing")
+    if num_cols is None:
+        num_cols = ptr.shape[0] - 1
+    if idx.shape[0] > 0 and (idx.min() < 0 or idx.max() >= num_cols):
+        raise ValueError(f"idx must be in [0, {num_cols})")
+
+
+def csr_to_coo(ptr: np.array, idx: np.array):
+    '''
+    Expand a CSR matrix to the coordinate format
+
+
+    Returns
+    -------
+    (np.array, np.array)
+        Row and column of each entry, in the CSR order. The row array has the
+        dtype of `ptr`
+    '''
+
+    num_rows = ptr.shape[0] - 1
+    row = np.repeat(np.arange(num_rows, dtype=ptr.dtype), degrees(ptr))
+    return row, idx
+
+
+def sample_neighbors(ptr: np.array,
+                     idx: np.array,
+                     targets: np.array,
+                     fanout: int,
+                     rng: np.random.Generator = None,
+                     num_cols: int = None):
+    '''
+    Sample up to `fanout` neighbors of each target vertex, without replacement
+
+    Only the rows of the targets are read, so `ptr` and `idx` may be
+    memory-mapped graphs larger than memory. Sampled neighbors of each target
+    keep their CSR order. `fanout <= 0` keeps all neighbors
+
+    The rows read are checked as in `validate_csr`, raising ValueError if they
+    are malformed. Sampled neighbors must be in [0, num_cols) (num_cols defaults
+    to the number of rows)
+
+
+    Returns
+    -------
+    (np.array, np.array)
+        The number of sampled neighbors of each target, and the sampled
+        neighbors of all targets concatenated
+    '''
+
+    targets = np.asarray(targets, dtype=np.int64)
+    begin = ptr[targets].astype(np.int64)
+    deg = ptr[targets + 1].astype(np.int64) - begin
+    if targets.shape[0] > 0 and (np.any(deg < 0) or begin.min() < 0 or
+                                 (begin + deg).max() > idx.shape[0]):
+        raise ValueError(f"ptr of the targets must be non-decreasing and in "
+                         f"[0, {idx.shape[0]}]")
+    row = np.repeat(np.arange(targets.shape[0]), deg)
+    first = np.cumsum(deg) - deg
+    rank = np.arange(row.shape[0]) - first[row]
+    pos = begin[row] + rank
+    if fanout > 0 and np.any(deg > fanout):
+        rng = np.random.default_rng() if rng is None else rng
+        # Shuffle each row and keep its first `fanout` entries. Sorting by
+        # row first keeps every row at its original positions
+        shuffled = np.lexsort((rng.random(row.shape[0]), row))
+        pos = pos[np.sort(shuffled[rank < fanout])]
+        deg = np.minimum(deg, fanout)
+    nbrs = np.asarray(idx[pos])
+    if num_cols is None:
+        num_cols = ptr.shape[0] - 1
+    if nbrs.shape[0] > 0 and (nbrs.min() < 0 or nbrs.max() >= num_cols):
+        raise ValueError(f"idx must be in [0, {num_cols})")
+    return deg, nbrs
+
+
+def sample_subgraph(ptr: np.array,
+                    idx: np.array,
+                    targets: np.array,
+                    fanout: int,
+                    rng: np.random.Generator = None):
+    '''
+    The subgraph of a mini-batch: the targets and up to `fanout` sampled
+    neighbors of each (see `sample_neighbors`), renumbered to local IDs
+
+    `targets` must be distinct. They get local IDs 0, 1, ..., in order, and
+    the other sampled vertices follow in order of first appearance
+
+
+    Returns
+    -------
+    (np.array, np.array, np.array)
+        ret[0] maps local IDs to the original vertex IDs. ret[1] and ret[2] are
+        the ptr and idx of a CSR matrix with a row per target and local column
+        IDs
+    '''
+
+    targets = np.asarray(targets, dtype=np.int64)
+    counts, nbrs = sample_neighbors(ptr, idx, targets, fanout, rng)
+    both = np.concatenate([targets, nbrs.astype(np.int64)])
+    vertices, first, inv = np.unique(both,
+                                     return_index=True,
+                                     return_inverse=True)
+    # Number vertices by first appearance
+    order = np.argsort(first, kind='stable')
+    local = np.empty_like(order)
+    local[order] = np.arange(order.shape[0])
+    sub_ptr = np.zeros((targets.shape[0] + 1, ), dtype=np.int64)
+    np.cumsum(counts, out=sub_ptr[1:])
+    return vertices[order], sub_ptr, local[inv[targets.shape[0]:]]
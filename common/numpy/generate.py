@@ -0,0 +1,183 @@
+'''
+Deterministic, seeded generation of random inputs
+
+Every tensor is drawn from its own stream, derived from a global seed and the
+tensor's name with `np.random.SeedSequence`, so adding or reordering tensors
+does not change the others. A tensor is generated in fixed-size chunks, each
+from a child stream of its own, so the chunks can be filled in parallel and the
+result does not depend on the number of threads
+
+Instead of the data, `gen_data.py --synthesize` writes a small spec file for
+each random input (the seed, name, shape, data type and distribution). `load_txt`
+recognizes it and synthesizes the tensor in memory (`synthesize`), which skips
+writing and reading large inputs. Julia implementations cannot read spec files
+'''
+
+import os
+import json
+import zlib
+import numpy as np
+import concurrent.futures
+
+# The default seed, overridden by `--seed` of gen_data.py
+SEED_ENV = 'DATA_SEED'
+
+MAGIC = b'#synthesize\n'
+
+DEFAULT_CHUNK_SIZE = 1 << 22
+
+
+def default_seed():
+    return int(os.environ.get(SEED_ENV, 0))
+
+
+def _fill(rng: np.random.Generator, out: np.array, dist: str, params: dict):
+    if dist == 'uniform':
+        low, high = params.get('low', 0.), params.get('high', 1.)
+        if out.dtype in (np.float32, np.float64):
+            rng.random(out=out, dtype=out.dtype)
+            if (low, high) != (0., 1.):
+                out *= high - low
+                out += low
+        else:
+            out[:] = rng.uniform(low, high, out.shape)
+    elif dist == 'normal':
+        loc, scale = params.get('loc', 0.), params.get('scale', 1.)
+        if out.dtype in (np.float32, np.float64):
+            rng.standard_normal(out=out, dtype=out.dtype)
+            if (loc, scale) != (0., 1.):
+                out *= scale
+                out += loc
+        else:
+            out[:] = rng.normal(loc, scale, out.shape)
+    elif dist == 'integers':
+        out[:] = rng.integers(params['low'],
+                              params['high'],
+                              out.shape,
+                              dtype=out.dtype)
+    else:
+        raise ValueError(f"Unknown distribution {dist}")
+
+
+def generate(name: str,
+             shape,
+             dtype: str = 'float32',
+             dist: str = 'uniform',
+             seed: int = None,
+             chunk_size: int = DEFAULT_CHUNK_SIZE,
+             workers: int = None,
+             **params):
+    '''
+    Generate a random tensor
+
+
+    Parameters
+    ----------
+    name: str
+        Name of the tensor, which selects its stream
+    shape: tuple
+    dtype: str
+    dist: str
+        "uniform" (with `low` and `high`, default [0, 1)), "normal" (with `loc`
+        and `scale`, default 0 and 1) or "integers" (with `low` and `high`,
+        where `high` is exclusive)
+    seed: int
+        Global seed. Defaults to $DATA_SEED, or 0
+    chunk_size: int
+        Number of elements per chunk. Part of the definition of the stream: the
+        same seed with a different chunk size gives different data
+    workers: int
+        Number of threads. Defaults to the number of available cores
+    '''
+
+    if seed is None:
+        seed = default_seed()
+    key = zlib.crc32(name.encode())
+    ret = np.empty(shape, dtype=dtype)
+    flat = ret.reshape(-1)
+    starts = range(0, flat.shape[0], chunk_size)
+
+    def fill_chunk(i):
+        rng = np.random.Generator(
+            np.random.PCG64(np.random.SeedSequence(seed, spawn_key=(key, i))))
+        start = starts[i]
+        _fill(rng, flat[start:start + chunk_size], dist, params)
+
+    if len(starts) <= 1:
+        for i in range(len(starts)):
+            fill_chunk(i)
+    else:
+        workers = workers or len(os.sched_getaffinity(0))
+        with concurrent.futures.ThreadPoolExecutor(workers) as executor:
+            # NumPy's generators release the GIL while filling
+            list(executor.map(fill_chunk, range(len(starts))))
+    return ret
+
+
+def store_spec(filename: str, name: str, shape, dtype: str = 'float32',
+               dist: str = 'uniform', seed: int = None, **params):
+    '''
+    Write a spec file, from which `synthesize` generates the same tensor as
+    `generate` with these arguments
+    '''
+
+    spec = {
+        'name': name,
+        'shape': list(map(int, shape)),
+        'dtype': dtype,
+        'dist': dist,
+        'seed': default_seed() if seed is None else seed,
+        'chunk_size': DEFAULT_CHUNK_SIZE,
+        'params': params,
+    }
+    with open(filename, 'wb') as f:
+        f.write(MAGIC + json.dumps(spec).encode() + b'\n')
+
+
+def is_spec(filename: str):
+    '''
+    Check whether a file is a spec file written by `store_spec`
+    '''
+
+    with open(filename, 'rb') as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def load_spec(filename: str):
+    with open(filename, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{filename} is not a spec file")
+        return json.loads(f.read())
+
+
+def synthesize(filename: str, dtype: str = None):
+    '''
+    Generate the tensor described by a spec file
+    '''
+
+    spec = load_spec(filename)
+    data = generate(spec['name'],
+                    spec['shape'],
+                    spec['dtype'],
+                    spec['dist'],
+                    spec['seed'],
+                    spec['chunk_size'],
+                    **spec['params'])
+    if dtype is not None and data.dtype != np.dtype(dtype):
+        data = data.astype(dtype)
+    return data
+
+
+def save_random(save, filename: str, shape, dtype: str = 'float32',
+                dist: str = 'uniform', seed: int = None, **params):
+    '''
+    Generate a random input and store it with `save` (`store` or `store_txt`),
+    or only write its spec file if `save` is None. The stream is named after the
+    file, e.g. "x" for "x.in"
+    '''
+
+    name = os.path.basename(filename).split('.')[0]
+    if save is None:
+        store_spec(filename, name, shape, dtype, dist, seed, **params)
+    else:
+        save(filename, generate(name, shape, dtype, dist, seed, **params))
@@ -0,0 +1,176 @@
+'''
+A single-file binary store of CSR graphs
+
+Layout: the magic `FTGRAPH1`, the length of a JSON header as a little-endian
+uint64, the header, then the `ptr` and `idx` payloads, each aligned to 64 bytes.
+The header holds the number of vertices and edges, the data types and offsets of
+the payloads, whether the neighbors of each vertex are sorted, and whether there
+is any self loop. Loading memory-maps the payloads, so it is O(1) in the graph
+size and concurrent processes share the pages
+
+To import `<prefix>.config` and `<prefix>.graph` ahead of time (from the
+repository root):
+
+    python3 -m common.numpy.graph <prefix>...
+'''
+
+import os
+import sys
+import json
+import struct
+import numpy as np
+
+from .io import read_txt_arrays
+from .csr import csr_to_coo, validate_csr
+
+MAGIC = b'FTGRAPH1'
+_ALIGN = 64
+
+
+def _align(offset: int):
+    return (offset + _ALIGN - 1) // _ALIGN * _ALIGN
+
+
+def graph_properties(ptr: np.array, idx: np.array):
+    '''
+    Check whether the neighbors of each vertex are sorted, and whether there is
+    any self loop
+    '''
+
+    # Only decreases inside a row count
+    decrease = np.diff(idx) < 0
+    row_ends = ptr[1:-1]
+    decrease[row_ends[(row_ends > 0) & (row_ends < idx.shape[0])] - 1] = False
+    row, col = csr_to_coo(ptr, idx)
+    return {
+        'sorted': not bool(np.any(decrease)),
+        'self_loops': bool(np.any(row == col)),
+    }
+
+
+def store_graph(filename: str, ptr: np.array, idx: np.array):
+    '''
+    Store a CSR graph
+
+    The file is written to a temporary path and then renamed, so concurrent
+    readers never see a partial file
+    '''
+
+    validate_csr(ptr, idx)
+    ptr = np.ascontiguousarray(ptr)
+    idx = np.ascontiguousarray(idx)
+    header = {
+        'num_v': ptr.shape[0] - 1,
+        'num_e': idx.shape[0],
+        'ptr_dtype': str(ptr.dtype),
+        'idx_dtype': str(idx.dtype),
+        **graph_properties(ptr, idx),
+    }
+    data_start = _align(len(MAGIC) + 8 + len(json.dumps(header)) + 64)
+    header['ptr_offset'] = data_start
+    header['idx_offset'] = _align(data_start + ptr.nbytes)
+    header = json.dumps(header).encode()
+    assert len(MAGIC) + 8 + len(header) <= data_start
+
+    tmp = f"{filename}.{os.getpid()}.tmp"
+    try:
+        with open(tmp, 'wb') as f:
+            f.write(MAGIC + struct.pack('<Q', len(header)) + header)
+            f.seek(data_start)
+            f.write(ptr.tobytes())
+            f.seek(_align(f.tell()))
+            f.write(idx.tobytes())
+        os.replace(tmp, filename)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def load_graph(filename: str):
+    '''
+    Load a graph written by `store_graph`
+
+
+    Returns
+    -------
+    (dict, np.array, np.array)
+        The header, and the `ptr` and `idx` arrays, memory-mapped copy-on-write
+    '''
+
+    with open(filename, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{filename} is not a graph file")
+        header_len, = struct.unpack('<Q', f.read(8))
+        header = json.loads(f.read(header_len))
+    ptr = np.memmap(filename,
+                    dtype=header['ptr_dtype'],
+                    mode='c',
+                    offset=header['ptr_offset'],
+                    shape=(header['num_v'] + 1, ))
+    if header['num_e'] > 0:
+        idx = np.memmap(filename,
+                        dtype=header['idx_dtype'],
+                        mode='c',
+                        offset=header['idx_offset'],
+                        shape=(header['num_e'], ))
+    else:
+        # np.memmap cannot map an empty range
+        idx = np.zeros((0, ), dtype=header['idx_dtype'])
+    return header, ptr, idx
+
+
+def import_graph(prefix: str, filename: str = None):
+    '''
+    Import the `<prefix>.config` and `<prefix>.graph` text pair into a graph file
+    (`<prefix>.csr` by default)
+
+    `ptr` and `idx` are stored as int32 if the number of edges fits, int64
+    otherwise
+    '''
+
+    if filename is None:
+        filename = prefix + '.csr'
+    with open(prefix + '.config', 'r') as f:
+        num_v, num_e = map(int, f.readline().split())
+    with open(prefix + '.graph', 'rb') as f:
+        ptr, idx = read_txt_arrays(f, [num_v + 1, num_e], 'int64')
+    validate_csr(ptr, idx)
+    dtype = 'int32' if max(num_v, num_e) < 2**31 else 'int64'
+    store_graph(filename, ptr.astype(dtype), idx.astype(dtype))
+    return filename
+
+
+def load_dataset(prefix: str):
+    '''
+    Load the graph in `<prefix>.config` and `<prefix>.graph`
+
+    The text pair is imported to `<prefix>.csr` the first time (or when the text
+    files are newer than it), and later loads memory-map `<prefix>.csr`
+
+
+    Returns
+    -------
+    (int, int, np.array, np.array)
+        (#vertices, #edges, ptr, idx), where ptr and idx forms a CSR format
+    '''
+
+    filename = prefix + '.csr'
+    sources = [prefix + '.config', prefix + '.graph']
+    if not os.path.exists(filename) or any(
+            os.path.getmtime(src) > os.path.getmtime(filename)
+            for src in sources):
+        import_graph(prefix, filename)
+    header, ptr, idx = load_graph(filename)
+    return header['num_v'], header['num_e'], ptr, idx
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print(f"Usage: python3 -m common.numpy.graph <prefix>...")
+        exit(-1)
+    for prefix in sys.argv[1:]:
+        filename = import_graph(prefix)
+        header, _, _ = load_graph(filename)
+        print(f"{prefix}: {header['num_v']} vertices, {header['num_e']} edges"
+              f", sorted={header['sorted']}, self_loops="
+              f"{header['self_loops']} -> {filename}")
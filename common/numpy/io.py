@@ -1,16 +1,339 @@
+import os
+import glob
+import json
+import hashlib
 import numpy as np
 
+from .. import lru
+from .generate import is_spec, load_spec, synthesize
 
-def load_txt(filename: str, dtype: str):
-    with open(filename) as f:
-        shape = list(map(int, f.readline().split()))
-        if dtype.startswith('int'):
-            data = list(map(int, f.readline().split()))
-        elif dtype.startswith('float'):
-            data = list(map(float, f.readline().split()))
+# Size budget of the cached binary copies in each input directory, e.g. "16G".
+# Set to 0 to disable caching
+CACHE_SIZE_ENV = 'INPUT_CACHE_SIZE'
+DEFAULT_CACHE_SIZE = '16G'
+
+
+def is_binary(filename: str):
+    '''
+    Check whether a file is in the binary tensor format written by `store`
+    '''
+
+    magic = np.lib.format.MAGIC_PREFIX
+    with open(filename, 'rb') as f:
+        return f.read(len(magic)) == magic
+
+
+def load(filename: str, dtype: str = None):
+    '''
+    Load a tensor written by `store`
+
+    The file is memory-mapped copy-on-write, so loading is O(1) regardless of the
+    tensor size, pages are only read on access, and writing to the returned array
+    never modifies the file
+
+    Parameters
+    ----------
+    filename: str
+        Path to the file
+    dtype: str, optional
+        If set and different from the stored data type, the data is converted
+        (which copies it into memory)
+    '''
+
+    data = np.load(filename, mmap_mode='c', allow_pickle=False)
+    if dtype is not None and data.dtype != np.dtype(dtype):
+        data = data.astype(dtype)
+    return data
+
+
+def store(filename: str, tensor: np.array):
+    '''
+    Store a tensor in a self-describing binary format
+
+    The format is NumPy's `.npy` format: a header holding the shape and data type,
+    followed by the raw C-order payload aligned to 64 bytes. The file name is used
+    as-is, no extension is appended
+    '''
+
+    with open(filename, 'wb') as f:
+        np.lib.format.write_array(f,
+                                  np.ascontiguousarray(tensor),
+                                  allow_pickle=False)
+
+
+def tensor_shape(filename: str):
+    '''
+    Shape of a tensor written by `store`, `store_txt` or as a spec file, without
+    reading its data
+    '''
+
+    if is_spec(filename):
+        return load_spec(filename)['shape']
+    if is_binary(filename):
+        with open(filename, 'rb') as f:
+            if np.lib.format.read_magic(f) == (1, 0):
+                shape, _, _ = np.lib.format.read_array_header_1_0(f)
+            else:
+                shape, _, _ = np.lib.format.read_array_header_2_0(f)
+        return list(shape)
+    with open(filename, 'rb') as f:
+        return list(map(int, f.readline().split()))
+
+
+_WHITESPACES = (b' ', b'\n', b'\t', b'\r')
+
+
+def parse_txt(body: bytes, dtype: str):
+    '''
+    Convert whitespace-separated numbers to a 1-D array using NumPy's C parser
+    '''
+
+    if not body or body.isspace():
+        # NOTE: np.fromstring returns a bogus value for whitespace-only strings
+        return np.empty((0,), dtype=dtype)
+    return np.fromstring(body, dtype=dtype, sep=' ')
+
+
+def iter_txt(f, dtype: str, chunk_size: int = 1 << 24):
+    '''
+    Parse whitespace-separated numbers from a file, one byte chunk at a time
+
+    Each chunk is converted with NumPy's C parser, and numbers split across
+    chunk boundaries are carried to the next chunk, so the peak memory is one
+    chunk regardless of the file size
+
+
+    Parameters
+    ----------
+    f: file
+        A file opened in binary mode, positioned at the first number to read
+    dtype: str
+        Data type of the numbers
+    chunk_size: int
+        Number of bytes to read at a time
+
+
+    Yields
+    ------
+    np.array
+        Non-empty 1-D arrays of consecutive numbers
+    '''
+
+    tail = b''
+    while True:
+        chunk = f.read(chunk_size)
+        if chunk:
+            buf = tail + chunk
+            # The last number may continue in the next chunk
+            cut = max(buf.rfind(ws) for ws in _WHITESPACES) + 1
+            body, tail = buf[:cut], buf[cut:]
         else:
-            assert False
-        return np.array(data, dtype=dtype).reshape(shape)
+            body, tail = tail, b''
+        vals = parse_txt(body, dtype)
+        if vals.shape[0] > 0:
+            yield vals
+        if not chunk:
+            return
+
+
+def read_txt_arrays(f, counts, dtype: str, chunk_size: int = 1 << 24):
+    '''
+    Read whitespace-separated numbers from a file into preallocated arrays
+
+    The file is parsed with `iter_txt`, so the peak memory is the size of the
+    arrays plus one chunk. Line breaks are treated as ordinary separators, so
+    consecutive arrays may span several lines (e.g. a `store_txt` data line, or
+    the two lines of a `.graph` file)
+
+
+    Parameters
+    ----------
+    f: file
+        A file opened in binary mode, positioned at the first number to read
+    counts: list of int
+        Number of elements of each array to read
+    dtype: str
+        Data type of the arrays
+    chunk_size: int
+        Number of bytes to read at a time
+
+
+    Returns
+    -------
+    list of np.array
+        1-D arrays of the lengths given in `counts`
+    '''
+
+    outs = [np.empty((count,), dtype=dtype) for count in counts]
+    which, pos = 0, 0
+    while which < len(outs) and outs[which].shape[0] == 0:
+        which += 1
+    if which < len(outs):
+        for vals in iter_txt(f, dtype, chunk_size):
+            while vals.shape[0] > 0 and which < len(outs):
+                n = min(vals.shape[0], outs[which].shape[0] - pos)
+                outs[which][pos:pos + n] = vals[:n]
+                vals = vals[n:]
+                pos += n
+                while which < len(outs) and pos == outs[which].shape[0]:
+                    which, pos = which + 1, 0
+            if which == len(outs):
+                break
+    if which < len(outs):
+        raise ValueError(
+            f"Expected {sum(counts)} numbers, got {sum(counts[:which]) + pos}")
+    return outs
+
+
+def file_sha256(filename: str, chunk_size: int = 1 << 24):
+    h = hashlib.sha256()
+    with open(filename, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def converted_path(filename: str):
+    '''
+    Path of the binary copy of a text tensor, written by `common.convert` or by
+    the cache of `load_txt`
+    '''
+
+    return filename + '.npy'
+
+
+def write_sidecar(filename: str, dtype: str, sha256: str = None):
+    '''
+    Record which version of the text file `filename` its binary copy is converted
+    from
+
+    The sidecar is `converted_path(filename) + '.sum'`, holding the size,
+    modification time and SHA-256 of the text file
+    '''
+
+    st = os.stat(filename)
+    meta = {
+        'size': st.st_size,
+        'mtime_ns': st.st_mtime_ns,
+        'sha256': sha256 if sha256 is not None else file_sha256(filename),
+        'dtype': str(np.dtype(dtype)),
+    }
+    sidecar = converted_path(filename) + '.sum'
+    tmp = f"{sidecar}.{os.getpid()}.tmp"
+    with open(tmp, 'w') as f:
+        json.dump(meta, f)
+    os.replace(tmp, sidecar)
+
+
+def is_converted(filename: str, dtype: str = None):
+    '''
+    Check whether the binary copy of the text file `filename` is up to date
+
+    The size and modification time are compared first. If they differ (e.g. the
+    file is copied or touched), the content hash decides, and a matching hash
+    refreshes the sidecar so the cheap check succeeds next time
+    '''
+
+    sidecar = converted_path(filename) + '.sum'
+    if not os.path.exists(converted_path(filename)) or not os.path.exists(
+            sidecar):
+        return False
+    try:
+        with open(sidecar) as f:
+            meta = json.load(f)
+    except ValueError:
+        return False
+    if dtype is not None and meta['dtype'] != str(np.dtype(dtype)):
+        return False
+    st = os.stat(filename)
+    if st.st_size != meta['size']:
+        return False
+    if st.st_mtime_ns == meta['mtime_ns']:
+        return True
+    sha256 = file_sha256(filename)
+    if sha256 != meta['sha256']:
+        return False
+    write_sidecar(filename, meta['dtype'], sha256)
+    return True
+
+
+def cache_budget():
+    return lru.parse_size(os.environ.get(CACHE_SIZE_ENV, DEFAULT_CACHE_SIZE))
+
+
+def evict_cache(directory: str, budget: int):
+    '''
+    Remove least-recently-used binary copies in `directory` until their total
+    size fits in `budget` bytes. A copy is used when its sidecar is touched
+    '''
+
+    entries = []
+    for sidecar in glob.glob(os.path.join(directory, '*.npy.sum')):
+        path = sidecar[:-len('.sum')]
+        try:
+            entries.append(((path, sidecar), os.path.getsize(path),
+                            os.path.getmtime(sidecar)))
+        except OSError:
+            pass  # Removed by another process
+    for path, sidecar in lru.evict(entries, budget):
+        for victim in (sidecar, path):
+            try:
+                os.remove(victim)
+            except OSError:
+                pass
+
+
+def cache_txt(filename: str, data: np.array):
+    '''
+    Store the parsed text tensor `filename` as its binary copy, so later loads
+    are served by memory-mapping it. Nothing is cached if the directory is not
+    writable or the tensor exceeds the budget
+    '''
+
+    budget = cache_budget()
+    if data.nbytes > budget:
+        return
+    directory = os.path.dirname(os.path.abspath(filename))
+    tmp = f"{converted_path(filename)}.{os.getpid()}.tmp"
+    try:
+        store(tmp, data)
+        os.replace(tmp, converted_path(filename))
+        write_sidecar(filename, data.dtype)
+        with lru.locked(os.path.join(directory, '.input_cache.lock')):
+            evict_cache(directory, budget)
+    except OSError:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def load_txt(filename: str, dtype: str, cache: bool = True):
+    '''
+    Load a tensor, either in the text format written by `store_txt` or in the
+    binary format written by `store`, or synthesize it from a spec file (see
+    `common.numpy.generate`)
+
+    A text tensor is parsed once and then cached as a binary copy next to it
+    (see `converted_path`), keyed by the size, modification time and content
+    hash of the text. Later loads memory-map the copy. The copies in a directory
+    are evicted in LRU order when they exceed the budget set by the
+    `INPUT_CACHE_SIZE` environment variable (default 16G, 0 to disable)
+    '''
+
+    if is_binary(filename):
+        return load(filename, dtype)
+    if is_spec(filename):
+        return synthesize(filename, dtype)
+    if is_converted(filename, dtype):
+        lru.touch(converted_path(filename) + '.sum')
+        return load(converted_path(filename))
+    assert dtype.startswith('int') or dtype.startswith('float')
+    with open(filename, 'rb') as f:
+        shape = list(map(int, f.readline().split()))
+        data, = read_txt_arrays(f, [int(np.prod(shape))], dtype)
+    data = data.reshape(shape)
+    if cache:
+        cache_txt(filename, data)
+    return data
 
 
 def store_txt(filename: str, tensor: np.array):
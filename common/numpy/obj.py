@@ -0,0 +1,147 @@
+import numpy as np
+
+from .io import parse_txt
+
+_SPACE, _TAB, _LF, _CR, _SLASH = map(ord, ' \t\n\r/')
+
+
+def _select_lines(buf: np.array, starts: np.array, lengths: np.array,
+                  mask: np.array):
+    '''
+    Concatenate the lines selected by `mask` with their keyword blanked out
+
+    Returns the bytes and the offset of each selected line in them
+    '''
+
+    sel = buf[np.repeat(mask, lengths)]
+    offsets = np.cumsum(lengths[mask]) - lengths[mask]
+    sel[offsets] = _SPACE
+    return sel, offsets
+
+
+def _parse_records(sel: np.array, offsets: np.array, dtype: str):
+    '''
+    Parse the numbers of concatenated records
+
+    Returns the flat values and the number of values of each record
+    '''
+
+    is_ws = (sel == _SPACE) | (sel == _TAB) | (sel == _LF) | (sel == _CR)
+    # Every record starts with the blanked keyword, so a number never starts at
+    # the first byte of a record
+    token_start = np.zeros(sel.shape, dtype=np.int32)
+    token_start[1:] = is_ws[:-1] & ~is_ws[1:]
+    counts = np.add.reduceat(token_start, offsets) if offsets.shape[0] > 0 \
+        else np.zeros((0,), dtype=np.int32)
+    vals = parse_txt(sel.tobytes(), dtype)
+    if vals.shape[0] != counts.sum():
+        raise ValueError("Malformed OBJ record")
+    return vals, counts
+
+
+def _parse_block(block: bytes, n_verts_before: int):
+    buf = np.frombuffer(block, dtype=np.uint8)
+    ends = np.flatnonzero(buf == _LF) + 1
+    starts = np.concatenate([[0], ends[:-1]])
+    lengths = ends - starts
+    c0 = buf[starts]
+    c1 = buf[np.minimum(starts + 1, buf.shape[0] - 1)]
+    keyword_end = (c1 == _SPACE) | (c1 == _TAB)
+    is_v = (c0 == ord('v')) & keyword_end
+    is_f = (c0 == ord('f')) & keyword_end
+
+    # Vertices: keep (x, y, z), dropping the optional w or colors
+    sel, offsets = _select_lines(buf, starts, lengths, is_v)
+    vals, counts = _parse_records(sel, offsets, 'float32')
+    if np.any(counts < 3):
+        raise ValueError("A vertex has less than 3 coordinates")
+    first = np.cumsum(counts) - counts
+    vertices = vals[first[:, None] + np.arange(3)]
+
+    # Faces: drop the "/<texture>/<normal>" suffixes of "f a/b/c" records
+    sel, offsets = _select_lines(buf, starts, lengths, is_f)
+    is_slash = sel == _SLASH
+    if np.any(is_slash):
+        pos = np.arange(sel.shape[0], dtype=np.int32)
+        is_ws = (sel == _SPACE) | (sel == _TAB) | (sel == _LF) | (sel == _CR)
+        last_ws = np.maximum.accumulate(np.where(is_ws, pos, -1))
+        last_slash = np.maximum.accumulate(np.where(is_slash, pos, -1))
+        sel[last_slash > last_ws] = _SPACE
+    vals, counts = _parse_records(sel, offsets, 'int64')
+    if np.any(counts != 3):
+        raise ValueError("Only triangle faces are supported")
+    faces = vals.reshape(-1, 3)
+
+    # Indices count from 1. Negative indices count backwards from the last
+    # vertex defined before the face
+    n_verts_at = n_verts_before + np.cumsum(is_v)[is_f]
+    faces = np.where(faces > 0, faces - 1, faces + n_verts_at[:, None])
+    return vertices, faces.astype(np.int32)
+
+
+def iter_obj(path: str, block_size: int = 1 << 24):
+    '''
+    Stream a Wavefront OBJ file block by block
+
+    Each block is split into lines and parsed with vectorized byte operations,
+    so no Python object is created per line. Only `v` and `f` records are read;
+    `vt`, `vn`, comments and other records are skipped
+
+
+    Parameters
+    ----------
+    path: str
+        Path to the OBJ file, with triangle faces
+    block_size: int
+        Number of bytes to read at a time
+
+
+    Yields
+    ------
+    (np.array, np.array)
+        Vertices and faces defined in the block. The vertices are an n*3-shaped float32 array of (x, y, z). The
+        faces are an m*3-shaped int32 array of vertex IDs counting from 0 over the whole file
+    '''
+
+    n_verts = 0
+    tail = b''
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(block_size)
+            buf = tail + chunk
+            if chunk:
+                cut = buf.rfind(b'\n') + 1
+                block, tail = buf[:cut], buf[cut:]
+            else:
+                block, tail = buf, b''
+                if block and not block.endswith(b'\n'):
+                    block += b'\n'
+            if block:
+                vertices, faces = _parse_block(block, n_verts)
+                n_verts += vertices.shape[0]
+                yield vertices, faces
+            if not chunk:
+                break
+
+
+def load_obj(path: str, block_size: int = 1 << 24):
+    '''
+    Load a Wavefront OBJ file
+
+    See `iter_obj` for details
+
+
+    Returns
+    -------
+    (np.array, np.array)
+        ret[0] is an n*3-shaped float32 array, where n is the number of vertices. array[i] = the coordinate (x, y, z)
+        ret[1] is an m*3-shaped int32 array, where m is the number of faces. array[i] = IDs of the vertices of the
+        face, counting from 0
+    '''
+
+    vertices = [np.zeros((0, 3), dtype=np.float32)]
+    faces = [np.zeros((0, 3), dtype=np.int32)]
+    for v, f in iter_obj(path, block_size):
+        vertices.append(v)
+        faces.append(f)
+    return np.concatenate(vertices), np.concatenate(faces)
@@ -0,0 +1,179 @@
+'''
+Renumber graph nodes (e.g. mesh faces) for memory locality
+
+A kernel that gathers the features of each node's neighbors touches rows far
+apart in memory when neighbors have distant IDs. `bfs_order` and `rcm_order`
+(reverse Cuthill-McKee) number nodes level by level from a peripheral node, so
+neighbors get close IDs and the bandwidth of the adjacency matrix shrinks.
+`morton_order` sorts nodes along a Z-order curve of their positions (e.g. face
+centroids). All orders are computed level-synchronously with vectorized NumPy
+
+An order is a permutation `perm` where `perm[k]` is the old ID of new node k.
+`permute_adj` renumbers an adjacency array, and per-node data is permuted with
+`data[perm]` and restored with `data[inverse(perm)]`
+'''
+
+import numpy as np
+
+from .csr import degrees
+
+
+def inverse(perm: np.array):
+    '''
+    The inverse permutation: `inverse(perm)[perm[k]] = k`
+    '''
+
+    inv = np.empty_like(perm)
+    inv[perm] = np.arange(perm.shape[0], dtype=perm.dtype)
+    return inv
+
+
+def adj_to_csr(adj: np.array):
+    '''
+    A CSR graph from an n*k-shaped adjacency array, dropping negative entries
+    (missing neighbors)
+    '''
+
+    valid = adj >= 0
+    ptr = np.zeros((adj.shape[0] + 1, ), dtype=np.int64)
+    np.cumsum(valid.sum(axis=1), out=ptr[1:])
+    return ptr, adj[valid].astype(np.int64)
+
+
+def permute_adj(adj: np.array, perm: np.array):
+    '''
+    Renumber an n*k-shaped adjacency array: row k of the result is row
+    `perm[k]`, with neighbor IDs mapped to the new numbering. Negative entries
+    are kept
+    '''
+
+    inv = inverse(perm)
+    rows = adj[perm]
+    ret = np.where(rows >= 0, inv[np.maximum(rows, 0)], rows)
+    return ret.astype(adj.dtype)
+
+
+def _bfs(ptr: np.array, idx: np.array, deg: np.array, start: int,
+         visited: np.array, by_degree: bool):
+    # Returns the nodes reachable from `start` in BFS order, marking them
+    # visited. With `by_degree`, the children of each node are visited by
+    # increasing degree (Cuthill-McKee)
+    order = [np.array([start], dtype=np.int64)]
+    visited[start] = True
+    frontier = order[0]
+    while frontier.shape[0] > 0:
+        counts = deg[frontier]
+        parent_pos = np.repeat(np.arange(frontier.shape[0]), counts)
+        starts = np.repeat(ptr[frontier] - np.cumsum(counts) + counts, counts)
+        nbrs = idx[starts + np.arange(parent_pos.shape[0])]
+        keep = ~visited[nbrs]
+        nbrs, parent_pos = nbrs[keep], parent_pos[keep]
+        if by_degree:
+            sort = np.lexsort((deg[nbrs], parent_pos))
+            nbrs = nbrs[sort]
+        # The first occurrence wins, i.e. the earliest parent
+        _, first = np.unique(nbrs, return_index=True)
+        frontier = nbrs[np.sort(first)]
+        visited[frontier] = True
+        order.append(frontier)
+    return np.concatenate(order)
+
+
+def _peripheral(ptr: np.array, idx: np.array, deg: np.array, start: int,
+                scratch: np.array, n_iter: int = 2):
+    # A node far from `start`: repeatedly take the last node of a BFS. Only the
+    # nodes of the component are marked in the all-False `scratch`, and they
+    # are cleared afterwards, so the cost is linear in the component size
+    for _ in range(n_iter):
+        reached = _bfs(ptr, idx, deg, start, scratch, False)
+        scratch[reached] = False
+        start = int(reached[-1])
+    return start
+
+
+def bfs_order(ptr: np.array, idx: np.array, by_degree: bool = False):
+    '''
+    Breadth-first order of an undirected graph in CSR format. Each connected
+    component is numbered contiguously, starting from a pseudo-peripheral node
+    found from its lowest-ID node of minimum degree
+    '''
+
+    n = ptr.shape[0] - 1
+    deg = degrees(ptr)
+    visited = np.zeros((n, ), dtype=bool)
+    scratch = np.zeros((n, ), dtype=bool)
+    order = []
+    # Components in increasing order of their minimum-degree node
+    for candidate in np.lexsort((np.arange(n), deg)):
+        if not visited[candidate]:
+            start = _peripheral(ptr, idx, deg, int(candidate), scratch)
+            order.append(_bfs(ptr, idx, deg, start, visited, by_degree))
+    return np.concatenate(order) if order else np.zeros((0, ), dtype=np.int64)
+
+
+def rcm_order(ptr: np.array, idx: np.array):
+    '''
+    Reverse Cuthill-McKee order of an undirected graph in CSR format
+    '''
+
+    return bfs_order(ptr, idx, by_degree=True)[::-1].copy()
+
+
+def _spread_bits(v: np.array, bits: int):
+    # Insert two zero bits between the lowest `bits` bits of each value
+    ret = np.zeros_like(v)
+    for b in range(bits):
+        ret |= ((v >> b) & 1) << (3 * b)
+    return ret
+
+
+def morton_order(points: np.array, bits: int = 21):
+    '''
+    Order 3-D points along a Z-order (Morton) curve, quantizing each coordinate
+    to `bits` bits over the bounding box
+    '''
+
+    points = np.asarray(points, dtype=np.float64)
+    lo = points.min(axis=0)
+    extent = np.maximum(points.max(axis=0) - lo, 1e-30)
+    q = ((points - lo) / extent * ((1 << bits) - 1)).astype(np.int64)
+    code = (_spread_bits(q[:, 0], bits) | _spread_bits(q[:, 1], bits) << 1 |
+            _spread_bits(q[:, 2], bits) << 2)
+    return np.argsort(code, kind='stable')
+
+
+def gather_distance(adj: np.array):
+    '''
+    Mean distance |i - adj[i, p]| between a node and its neighbors, a proxy of
+    how scattered the gathers of neighbor features are
+    '''
+
+    rows = np.repeat(np.arange(adj.shape[0]), adj.shape[1])
+    cols = adj.ravel()
+    valid = cols >= 0
+    if not np.any(valid):
+        return 0.
+    return float(np.mean(np.abs(rows[valid] - cols[valid])))
+
+
+ORDERS = ['none', 'bfs', 'rcm', 'morton']
+
+
+def face_order(method: str, adj: np.array, centroids: np.array = None):
+    '''
+    A face order of a mesh by `method` ("none", "bfs", "rcm" or "morton",
+    which requires the face centroids)
+    '''
+
+    if method == 'none':
+        return np.arange(adj.shape[0], dtype=np.int64)
+    if method == 'morton':
+        if centroids is None:
+            raise ValueError("Morton order requires the face centroids")
+        return morton_order(centroids)
+    ptr, idx = adj_to_csr(adj)
+    if method == 'bfs':
+        return bfs_order(ptr, idx)
+    if method == 'rcm':
+        return rcm_order(ptr, idx)
+    raise ValueError(f"Unknown order {method}")
@@ -0,0 +1,317 @@
+'''
+Per-kernel memory traffic and FLOPs from nvprof and Nsight Compute logs
+
+`parse` reads the output of `nvprof -m all` (as written by the run_nvprof.sh
+scripts, or with `--csv`) or of `ncu --csv`, and returns one `KernelStats` per
+kernel name with the number of invocations and the DRAM bytes, L2 bytes and
+FLOPs summed over them. Logs of several runs are aggregated with `merge`. Given
+the peak FLOP/s and DRAM bandwidth of the device, `roofline` tells whether each
+kernel is memory- or compute-bound at its arithmetic intensity
+
+From the repository root:
+
+    python3 gather_nvprof_log.py <log>... [--peak-gflops G --peak-bandwidth B]
+        [--csv <file>] [--json <file>]
+'''
+
+import io
+import re
+import csv
+import json
+
+# nvprof metric -> [(field, weight)]
+NVPROF_METRICS = {
+    'dram_read_bytes': [('dram_bytes', 1)],
+    'dram_write_bytes': [('dram_bytes', 1)],
+    'l2_global_load_bytes': [('l2_bytes', 1)],
+    'l2_local_load_bytes': [('l2_bytes', 1)],
+    'l2_global_atomic_store_bytes': [('l2_bytes', 1)],
+    'l2_local_global_store_bytes': [('l2_bytes', 1)],
+    'flop_count_sp': [('flops', 1)],
+    'flop_count_dp': [('flops', 1)],
+    'flop_count_hp': [('flops', 1)],
+    'flop_count_sp_mul': [('flops_mul', 1)],
+    'flop_count_sp_fma': [('flops_fma', 1)],
+}
+
+# Nsight Compute counts instructions, so an FMA is 2 FLOPs
+NCU_METRICS = {
+    'dram__bytes_read.sum': [('dram_bytes', 1)],
+    'dram__bytes_write.sum': [('dram_bytes', 1)],
+    'lts__t_bytes.sum': [('l2_bytes', 1)],
+    'smsp__sass_thread_inst_executed_op_fadd_pred_on.sum': [('flops', 1)],
+    'smsp__sass_thread_inst_executed_op_fmul_pred_on.sum': [('flops', 1),
+                                                            ('flops_mul', 1)],
+    'smsp__sass_thread_inst_executed_op_ffma_pred_on.sum': [('flops', 2),
+                                                            ('flops_fma', 1)],
+    'smsp__sass_thread_inst_executed_op_dadd_pred_on.sum': [('flops', 1)],
+    'smsp__sass_thread_inst_executed_op_dmul_pred_on.sum': [('flops', 1)],
+    'smsp__sass_thread_inst_executed_op_dfma_pred_on.sum': [('flops', 2)],
+}
+
+# Units of Nsight Compute values (decimal prefixes)
+NCU_UNITS = {
+    '': 1,
+    'byte': 1,
+    'Kbyte': 1e3,
+    'Mbyte': 1e6,
+    'Gbyte': 1e9,
+    'Tbyte': 1e12,
+    'inst': 1,
+    'Kinst': 1e3,
+    'Minst': 1e6,
+    'Ginst': 1e9,
+}
+
+FIELDS = ['dram_bytes', 'l2_bytes', 'flops', 'flops_mul', 'flops_fma']
+
+_KERNEL_LINE = re.compile(r'^\s*Kernel:\s*(.*?)\s*$')
+
+
+def num(s: str):
+    s = s.replace(',', '')
+    try:
+        return int(s)
+    except ValueError:
+        return float(s)
+
+
+class KernelStats:
+    '''
+    Totals of one kernel over all its invocations (and runs)
+    '''
+
+    def __init__(self, name: str):
+        self.name = name
+        self.invocations = 0
+        self.runs = 1
+        for field in FIELDS:
+            setattr(self, field, 0)
+
+    def add(self, field: str, value):
+        setattr(self, field, getattr(self, field) + value)
+
+    @property
+    def intensity(self):
+        '''
+        FLOPs per DRAM byte, or None if there is no DRAM traffic
+        '''
+
+        return self.flops / self.dram_bytes if self.dram_bytes else None
+
+    @property
+    def l2_intensity(self):
+        return self.flops / self.l2_bytes if self.l2_bytes else None
+
+    def as_dict(self):
+        ret = {'kernel': self.name, 'invocations': self.invocations,
+               'runs': self.runs}
+        for field in FIELDS:
+            ret[field] = getattr(self, field)
+        ret['intensity'] = self.intensity
+        ret['l2_intensity'] = self.l2_intensity
+        return ret
+
+
+def _kernel(kernels: dict, name: str):
+    if name not in kernels:
+        kernels[name] = KernelStats(name)
+    return kernels[name]
+
+
+def _parse_nvprof_txt(lines):
+    kernels = {}
+    current = None
+    counted = set()
+    for line in lines:
+        m = _KERNEL_LINE.match(line)
+        if m is not None:
+            current = _kernel(kernels, m.group(1))
+            continue
+        cols = line.split()
+        if current is None or len(cols) < 6 or not cols[0].isdigit():
+            continue
+        invocations = int(cols[0])
+        if current.name not in counted:
+            current.invocations += invocations
+            counted.add(current.name)
+        if cols[1] not in NVPROF_METRICS:
+            continue
+        try:
+            avg = num(cols[-1])
+        except ValueError:
+            continue
+        for field, weight in NVPROF_METRICS[cols[1]]:
+            current.add(field, invocations * avg * weight)
+    return kernels
+
+
+def _parse_csv(lines):
+    # Skip the lines before the header, e.g. "==PROF==" messages of ncu
+    start = next(i for i, line in enumerate(lines)
+                 if line.startswith('"') and '"Metric Name"' in line)
+    kernels = {}
+    ncu_ids = {}
+    for row in csv.DictReader(io.StringIO(''.join(lines[start:]))):
+        if 'Kernel Name' in row:  # ncu: one row per launch and metric
+            metric = row['Metric Name']
+            if metric not in NCU_METRICS:
+                continue
+            kernel = _kernel(kernels, row['Kernel Name'])
+            unit = row.get('Metric Unit') or ''
+            if unit not in NCU_UNITS:
+                raise ValueError(f"Unknown unit {unit} of {metric}")
+            value = num(row['Metric Value']) * NCU_UNITS[unit]
+            ncu_ids.setdefault(kernel.name, set()).add(row.get('ID'))
+            for field, weight in NCU_METRICS[metric]:
+                kernel.add(field, value * weight)
+        else:  # nvprof --csv: one row per kernel and metric
+            metric = row['Metric Name']
+            if metric not in NVPROF_METRICS:
+                continue
+            kernel = _kernel(kernels, row['Kernel'])
+            invocations = int(row['Invocations'])
+            kernel.invocations = invocations
+            try:
+                avg = num(row['Avg'])
+            except ValueError:
+                continue
+            for field, weight in NVPROF_METRICS[metric]:
+                kernel.add(field, invocations * avg * weight)
+    for name, ids in ncu_ids.items():
+        kernels[name].invocations = len(ids)
+    return kernels
+
+
+def parse(filename: str):
+    '''
+    Per-kernel statistics of one log
+
+    Returns
+    -------
+    dict
+        Kernel name -> `KernelStats`
+    '''
+
+    with open(filename, errors='replace') as f:
+        lines = f.readlines()
+    if any(line.startswith('"') and '"Metric Name"' in line for line in lines):
+        return _parse_csv(lines)
+    return _parse_nvprof_txt(lines)
+
+
+def merge(runs):
+    '''
+    Aggregate the statistics of several runs (dicts returned by `parse`) by
+    kernel name, summing invocations and totals
+    '''
+
+    ret = {}
+    for kernels in runs:
+        for name, stats in kernels.items():
+            if name not in ret:
+                ret[name] = KernelStats(name)
+                ret[name].runs = 0
+            total = ret[name]
+            total.runs += stats.runs
+            total.invocations += stats.invocations
+            for field in FIELDS:
+                total.add(field, getattr(stats, field))
+    return ret
+
+
+def totals(kernels: dict):
+    '''
+    Sums over all kernels, as printed by gather_nvprof_log.py
+    '''
+
+    ret = {'kernels': sum(k.invocations for k in kernels.values())}
+    for field in FIELDS:
+        ret[field] = sum(getattr(k, field) for k in kernels.values())
+    return ret
+
+
+def roofline(stats: KernelStats, peak_flops: float, peak_bandwidth: float):
+    '''
+    Roofline bound of a kernel
+
+    Parameters
+    ----------
+    stats: KernelStats
+    peak_flops: float
+        Peak FLOP/s of the device
+    peak_bandwidth: float
+        Peak DRAM bytes/s of the device
+
+    Returns
+    -------
+    (bound, attainable)
+        "memory" if the arithmetic intensity is below the ridge point
+        `peak_flops / peak_bandwidth`, else "compute" (None if unknown), and the
+        attainable FLOP/s at this intensity
+    '''
+
+    ai = stats.intensity
+    if ai is None:
+        return ('compute' if stats.flops else None), peak_flops
+    bound = 'memory' if ai < peak_flops / peak_bandwidth else 'compute'
+    return bound, min(peak_flops, ai * peak_bandwidth)
+
+
+def table(kernels: dict, peak_flops: float = None,
+          peak_bandwidth: float = None):
+    '''
+    One row (dict) per kernel, with the roofline bound if the peaks are given,
+    sorted by DRAM traffic
+    '''
+
+    rows = []
+    for stats in sorted(kernels.values(),
+                        key=lambda k: (-k.dram_bytes, k.name)):
+        row = stats.as_dict()
+        if peak_flops is not None and peak_bandwidth is not None:
+            row['bound'], row['attainable_flops'] = roofline(
+                stats, peak_flops, peak_bandwidth)
+        rows.append(row)
+    return rows
+
+
+def write_csv(rows, filename: str):
+    if not rows:
+        open(filename, 'w').close()
+        return
+    with open(filename, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0].keys()))
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def write_json(rows, filename: str):
+    with open(filename, 'w') as f:
+        json.dump(rows, f, indent=1)
+
+
+def format_table(rows):
+    def fmt(x):
+        if x is None:
+            return '-'
+        if isinstance(x, float):
+            return f"{x:.3g}"
+        return str(x)
+
+    def short(name):
+        return name if len(name) <= 40 else name[:37] + '...'
+
+    has_bound = any('bound' in row for row in rows)
+    header = ['kernel', 'calls', 'DRAM bytes', 'L2 bytes', 'FLOP', 'FLOP/B']
+    if has_bound:
+        header.append('bound')
+    lines = [f"{header[0]:<40}" + ''.join(f"{h:>12}" for h in header[1:])]
+    for row in rows:
+        cols = [row['invocations'], row['dram_bytes'], row['l2_bytes'],
+                row['flops'], row['intensity']]
+        if has_bound:
+            cols.append(row.get('bound'))
+        lines.append(f"{short(row['kernel']):<40}" +
+                     ''.join(f"{fmt(c):>12}" for c in cols))
+    return '\n'.join(lines)
@@ -0,0 +1,290 @@
+'''
+Hardware performance counters of benchmark phases, through perf_event_open
+
+With `--profile-cpu`, `common.benchmark.Benchmark` counts CPU cycles,
+instructions and last-level cache misses over the timed iterations of every
+phase (warmup excluded), in all threads of the process. Counters are opened for
+every existing thread (e.g. OpenMP workers created during warmup) and inherited
+by threads created later. Memory traffic is read from the uncore memory
+controller counters (uncore_imc, system-wide, which usually requires
+/proc/sys/kernel/perf_event_paranoid <= 0 or CAP_PERFMON) if available, and is
+otherwise estimated as LLC misses times the cache line size
+
+Each phase reports IPC and bytes per FLOP, with the FLOPs counted analytically
+by `common.flops`, and a row in the same table as `gather_nvprof_log.py` prints
+for GPU kernels
+'''
+
+import os
+import sys
+import glob
+import fcntl
+import ctypes
+import struct
+import platform
+
+from . import nvprof
+
+_SYS_PERF_EVENT_OPEN = {'x86_64': 298, 'aarch64': 241}.get(platform.machine())
+
+PERF_TYPE_HARDWARE = 0
+PERF_COUNT_HW_CPU_CYCLES = 0
+PERF_COUNT_HW_INSTRUCTIONS = 1
+PERF_COUNT_HW_CACHE_MISSES = 3  # Usually last-level cache misses
+
+PERF_FORMAT_TOTAL_TIME_ENABLED = 1 << 0
+PERF_FORMAT_TOTAL_TIME_RUNNING = 1 << 1
+
+# Bits of perf_event_attr.flags
+_DISABLED = 1 << 0
+_INHERIT = 1 << 1
+_EXCLUDE_KERNEL = 1 << 5
+_EXCLUDE_HV = 1 << 6
+
+PERF_EVENT_IOC_ENABLE = 0x2400
+PERF_EVENT_IOC_DISABLE = 0x2401
+PERF_EVENT_IOC_RESET = 0x2403
+
+CACHE_LINE = 64
+
+HW_EVENTS = {
+    'cycles': PERF_COUNT_HW_CPU_CYCLES,
+    'instructions': PERF_COUNT_HW_INSTRUCTIONS,
+    'llc_misses': PERF_COUNT_HW_CACHE_MISSES,
+}
+
+
+class PerfEventAttr(ctypes.Structure):
+    # PERF_ATTR_SIZE_VER0, which every kernel accepts
+    _fields_ = [
+        ('type', ctypes.c_uint32),
+        ('size', ctypes.c_uint32),
+        ('config', ctypes.c_uint64),
+        ('sample_period', ctypes.c_uint64),
+        ('sample_type', ctypes.c_uint64),
+        ('read_format', ctypes.c_uint64),
+        ('flags', ctypes.c_uint64),
+        ('wakeup_events', ctypes.c_uint32),
+        ('bp_type', ctypes.c_uint32),
+        ('config1', ctypes.c_uint64),
+    ]
+
+
+_libc = ctypes.CDLL(None, use_errno=True)
+
+
+def perf_event_open(type_: int, config: int, pid: int = 0, cpu: int = -1,
+                    flags: int = _DISABLED | _EXCLUDE_KERNEL | _EXCLUDE_HV):
+    '''
+    Open a counter, disabled. Raises OSError if it is not supported
+    '''
+
+    if _SYS_PERF_EVENT_OPEN is None:
+        raise OSError(f"perf_event_open is not known on {platform.machine()}")
+    attr = PerfEventAttr()
+    attr.type = type_
+    attr.size = ctypes.sizeof(PerfEventAttr)
+    attr.config = config
+    attr.read_format = (PERF_FORMAT_TOTAL_TIME_ENABLED |
+                        PERF_FORMAT_TOTAL_TIME_RUNNING)
+    attr.flags = flags
+    fd = _libc.syscall(_SYS_PERF_EVENT_OPEN, ctypes.byref(attr), pid, cpu, -1,
+                       0)
+    if fd < 0:
+        err = ctypes.get_errno()
+        raise OSError(err, os.strerror(err))
+    return fd
+
+
+def read_counter(fd: int):
+    '''
+    Value of a counter, scaled up if the kernel multiplexed it
+    '''
+
+    value, enabled, running = struct.unpack('QQQ', os.read(fd, 24))
+    if running == 0:
+        return 0
+    return value * enabled / running if running < enabled else value
+
+
+def _parse_event(spec: str):
+    # "event=0x04,umask=0x03" -> config
+    config = 0
+    for term in spec.strip().split(','):
+        key, _, val = term.partition('=')
+        val = int(val, 0) if val else 1
+        if key == 'event':
+            config |= val
+        elif key == 'umask':
+            config |= val << 8
+        else:
+            raise ValueError(f"Unsupported term {term}")
+    return config
+
+
+def imc_events():
+    '''
+    (type, config, cpu, scale in bytes) of the uncore memory controller read and
+    write counters, from sysfs
+    '''
+
+    ret = []
+    for dev in sorted(glob.glob('/sys/bus/event_source/devices/uncore_imc*')):
+        try:
+            with open(os.path.join(dev, 'type')) as f:
+                type_ = int(f.read())
+            with open(os.path.join(dev, 'cpumask')) as f:
+                cpu = int(f.read().split(',')[0].split('-')[0])
+            for event in ('cas_count_read', 'cas_count_write'):
+                path = os.path.join(dev, 'events', event)
+                with open(path) as f:
+                    config = _parse_event(f.read())
+                scale = 1.
+                if os.path.exists(path + '.scale'):
+                    with open(path + '.scale') as f:
+                        scale = float(f.read())
+                    with open(path + '.unit') as f:
+                        if f.read().strip() == 'MiB':
+                            scale *= 1 << 20
+                ret.append((type_, config, cpu, scale))
+        except (OSError, ValueError):
+            continue
+    return ret
+
+
+class PerfCounters:
+    '''
+    Count events between `start` and `stop`. Counters that cannot be opened
+    (e.g. in a VM without a PMU) are reported as None
+    '''
+
+    def __init__(self):
+        self.fds = {}
+        self.imc = []
+        self.counts = None
+        self.warned = False
+
+    def _open(self):
+        tids = [int(t) for t in os.listdir('/proc/self/task')]
+        errors = []
+        for name, config in HW_EVENTS.items():
+            fds = []
+            for tid in tids:
+                try:
+                    fds.append(
+                        perf_event_open(
+                            PERF_TYPE_HARDWARE, config, tid, -1, _DISABLED |
+                            _INHERIT | _EXCLUDE_KERNEL | _EXCLUDE_HV))
+                except OSError as e:
+                    if tid == os.getpid():
+                        errors.append(f"{name}: {e.strerror}")
+                        for fd in fds:
+                            os.close(fd)
+                        fds = []
+                        break
+                    # The thread may have exited
+            self.fds[name] = fds
+        for type_, config, cpu, scale in imc_events():
+            try:
+                # Uncore counters are per socket, so count system-wide
+                self.imc.append((perf_event_open(type_, config, -1, cpu,
+                                                 _DISABLED), scale))
+            except OSError as e:
+                # Counting only some of the channels would under-report the
+                # traffic, so fall back to the LLC misses for all of it
+                errors.append(f"uncore_imc: {e.strerror} (DRAM traffic is "
+                              "estimated from the LLC misses)")
+                for fd, _ in self.imc:
+                    os.close(fd)
+                self.imc = []
+                break
+        if errors and not self.warned:
+            print("Some CPU counters are not available: " + ', '.join(errors),
+                  file=sys.stderr)
+            self.warned = True
+
+    def _all_fds(self):
+        return [fd for fds in self.fds.values() for fd in fds
+               ] + [fd for fd, _ in self.imc]
+
+    def _close(self):
+        for fd in self._all_fds():
+            os.close(fd)
+        self.fds, self.imc = {}, []
+
+    def start(self):
+        self._open()
+        for fd in self._all_fds():
+            fcntl.ioctl(fd, PERF_EVENT_IOC_RESET, 0)
+        for fd in self._all_fds():
+            fcntl.ioctl(fd, PERF_EVENT_IOC_ENABLE, 0)
+
+    def stop(self):
+        for fd in self._all_fds():
+            fcntl.ioctl(fd, PERF_EVENT_IOC_DISABLE, 0)
+        counts = {}
+        for name, fds in self.fds.items():
+            counts[name] = sum(read_counter(fd) for fd in fds) if fds else None
+        if self.imc:
+            counts['dram_bytes'] = sum(
+                read_counter(fd) * scale for fd, scale in self.imc)
+            counts['dram_source'] = 'uncore_imc'
+        elif counts.get('llc_misses') is not None:
+            counts['dram_bytes'] = counts['llc_misses'] * CACHE_LINE
+            counts['dram_source'] = 'llc_misses'
+        else:
+            counts['dram_bytes'] = None
+            counts['dram_source'] = None
+        self._close()
+        self.counts = counts
+
+
+def summarize(counts: dict, iterations: int, flops: int = None):
+    '''
+    Counter values of a phase, with IPC and bytes per FLOP
+
+    Parameters
+    ----------
+    counts: dict
+        `PerfCounters.counts`
+    iterations: int
+        Number of timed iterations the counts cover
+    flops: int, optional
+        FLOPs of one iteration (see `common.flops`)
+    '''
+
+    ret = dict(counts)
+    ret['iterations'] = iterations
+    cycles, instructions = counts.get('cycles'), counts.get('instructions')
+    ret['ipc'] = instructions / cycles if cycles and instructions is not None \
+            else None
+    ret['flops'] = flops * iterations if flops else None
+    ret['bytes_per_flop'] = counts['dram_bytes'] / ret['flops'] \
+            if ret['flops'] and counts.get('dram_bytes') is not None else None
+    return ret
+
+
+def format_counts(perf: dict):
+    def fmt(x, spec='.4g'):
+        return '-' if x is None else f"{x:{spec}}"
+
+    return (f"cycles={fmt(perf.get('cycles'))}, "
+            f"instructions={fmt(perf.get('instructions'))}, "
+            f"IPC={fmt(perf.get('ipc'), '.3f')}, "
+            f"LLC misses={fmt(perf.get('llc_misses'))}, "
+            f"DRAM bytes={fmt(perf.get('dram_bytes'))} "
+            f"({perf.get('dram_source') or 'n/a'}), "
+            f"bytes/FLOP={fmt(perf.get('bytes_per_flop'), '.3f')}")
+
+
+def as_kernel(name: str, perf: dict):
+    '''
+    A phase as an `nvprof.KernelStats`, to print in the table of
+    `gather_nvprof_log.py`
+    '''
+
+    stats = nvprof.KernelStats(name)
+    stats.invocations = perf['iterations']
+    stats.dram_bytes = perf.get('dram_bytes') or 0
+    stats.flops = perf.get('flops') or 0
+    return stats
@@ -0,0 +1,168 @@
+'''
+Compare benchmark results between two revisions and flag regressions
+
+Usage (from the repository root):
+
+    python3 -m common.report --baseline <rev> [--candidate <rev>] [--results <file>]
+
+Records (see `common.results`) are grouped by workload, implementation, target,
+phase and input fingerprint. For every group with results at both revisions,
+the latencies are compared with a one-sided Mann-Whitney U test. A slowdown is
+flagged when it is significant and the median grows by more than a threshold.
+The command exits with 1 if any slowdown is flagged, so it can gate upgrades
+'''
+
+import sys
+import math
+import argparse
+import numpy as np
+
+from . import results
+
+
+def rank(x: np.array):
+    '''
+    Ranks starting from 1, with ties given their average rank
+    '''
+
+    order = np.argsort(x, kind='stable')
+    sorted_x = x[order]
+    # Runs of equal values
+    starts = np.flatnonzero(np.r_[True, sorted_x[1:] != sorted_x[:-1]])
+    ends = np.r_[starts[1:], x.shape[0]]
+    avg = (starts + ends + 1) / 2
+    ranks = np.empty(x.shape[0], dtype=np.float64)
+    ranks[order] = np.repeat(avg, ends - starts)
+    return ranks, ends - starts
+
+
+def mann_whitney_greater(a, b):
+    '''
+    p-value of the one-sided Mann-Whitney U test that `a` tends to be greater
+    than `b`, using the normal approximation with tie and continuity corrections
+    '''
+
+    a = np.asarray(a, dtype=np.float64)
+    b = np.asarray(b, dtype=np.float64)
+    n1, n2 = a.shape[0], b.shape[0]
+    n = n1 + n2
+    ranks, ties = rank(np.concatenate([a, b]))
+    u = ranks[:n1].sum() - n1 * (n1 + 1) / 2
+    mu = n1 * n2 / 2
+    tie_term = float((ties**3 - ties).sum()) / (n * (n - 1))
+    sigma = math.sqrt(n1 * n2 / 12 * ((n + 1) - tie_term))
+    if sigma == 0:
+        return 1.
+    z = (u - mu - 0.5) / sigma
+    return 0.5 * math.erfc(z / math.sqrt(2))
+
+
+def _base_rev(rev: str):
+    # Runs from a tree with uncommitted changes are recorded as "<sha>-dirty"
+    return rev[:-len('-dirty')] if rev.endswith('-dirty') else rev
+
+
+def _rev_matches(rev: str, query: str):
+    return rev is not None and _base_rev(rev).startswith(_base_rev(query))
+
+
+def group_key(rec):
+    # Runs with different options (e.g. --ad-save-all) are not pooled
+    return (rec['workload'], rec['impl'], rec['target'], rec['phase'],
+            rec['fingerprint'], rec.get('threads') or 0,
+            tuple(rec.get('config') or ()))
+
+
+def compare(records, baseline: str, candidate: str, alpha: float,
+            threshold: float):
+    '''
+    Compare each group between the revisions, pooling the samples of all runs of
+    a revision
+
+
+    Returns
+    -------
+    list of dict
+        One row per group, with the medians, their ratio, the p-value and
+        whether it is a regression
+    '''
+
+    groups = {}
+    for rec in records:
+        for side, rev in (('baseline', baseline), ('candidate', candidate)):
+            if _rev_matches(rec.get('git_rev'), rev):
+                groups.setdefault(group_key(rec), {
+                    'baseline': [],
+                    'candidate': []
+                })[side] += rec['samples_ms']
+    rows = []
+    for key, samples in sorted(groups.items()):
+        if not samples['baseline'] or not samples['candidate']:
+            continue
+        base = np.median(samples['baseline'])
+        cand = np.median(samples['candidate'])
+        p = mann_whitney_greater(samples['candidate'], samples['baseline'])
+        ratio = cand / base if base > 0 else float('inf')
+        rows.append({
+            'key': key,
+            'baseline': float(base),
+            'candidate': float(cand),
+            'ratio': float(ratio),
+            'p': p,
+            'regression': p < alpha and ratio > 1 + threshold,
+        })
+    return rows
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        prog='python3 -m common.report',
+        description='Flag benchmark slowdowns between two revisions')
+    parser.add_argument('--baseline',
+                        required=True,
+                        help='Git revision (or a prefix) to compare against')
+    parser.add_argument('--candidate',
+                        default=None,
+                        help='Git revision (or a prefix) to check. Defaults '
+                        'to the current one')
+    parser.add_argument('--results',
+                        default=None,
+                        help='Results file. Defaults to the one benchmarks '
+                        'write to')
+    parser.add_argument('--alpha',
+                        type=float,
+                        default=0.01,
+                        help='Significance level')
+    parser.add_argument('--threshold',
+                        type=float,
+                        default=0.02,
+                        help='Minimum relative growth of the median to flag')
+    cmd_args = parser.parse_args()
+
+    candidate = cmd_args.candidate or results.git_revision()
+    if candidate is None:
+        print("No candidate revision given, and not in a git repository")
+        exit(1)
+    print(f"Comparing {cmd_args.baseline} (baseline) against "
+          f"{_base_rev(candidate)} (candidate)")
+    records = results.load(cmd_args.results)
+    rows = compare(records, cmd_args.baseline, candidate, cmd_args.alpha,
+                   cmd_args.threshold)
+    if not rows:
+        print(f"No results found at both {cmd_args.baseline} and {candidate}")
+        exit(0)
+
+    print(f"{'workload':<16}{'impl':<16}{'target':<8}{'phase':<18}"
+          f"{'baseline ms':>12}{'candidate ms':>14}{'ratio':>8}{'p':>10}")
+    for row in rows:
+        workload, impl, target, phase, _, threads, config = row['key']
+        if threads:
+            target = f"{target}/{threads}"
+        flag = '  SLOWER' if row['regression'] else ''
+        print(f"{workload:<16}{impl:<16}{target:<8}{phase:<18}"
+              f"{row['baseline']:>12.4f}{row['candidate']:>14.4f}"
+              f"{row['ratio']:>8.3f}{row['p']:>10.2g}{flag}"
+              f"{'  ' + ' '.join(config) if config else ''}")
+    n_regressions = sum(row['regression'] for row in rows)
+    print(f"{n_regressions} significant slowdowns out of {len(rows)} results")
+    exit(1 if n_regressions > 0 else 0)
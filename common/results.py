@@ -0,0 +1,183 @@
+'''
+A JSON Lines store of benchmark results
+
+Each timed phase run by `common.benchmark.Benchmark` appends one record to the
+results file, holding where the numbers come from (workload, implementation,
+target, phase, a fingerprint of the input shapes, the git revisions of this
+repository and of FreeTensor) and the per-iteration latencies. See
+`common.report` to compare revisions
+'''
+
+import os
+import sys
+import json
+import time
+import glob
+import fcntl
+import hashlib
+import subprocess
+
+from .numpy.io import tensor_shape
+from .cpu import current_threads
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Path of the results file. Set to an empty string to disable recording
+RESULTS_ENV = 'BENCHMARK_RESULTS'
+DEFAULT_RESULTS = os.path.join(ROOT, 'results.jsonl')
+
+
+def results_path():
+    return os.environ.get(RESULTS_ENV, DEFAULT_RESULTS)
+
+
+def _git(*args, cwd=ROOT):
+    try:
+        return subprocess.run(['git', *args],
+                              cwd=cwd,
+                              stdout=subprocess.PIPE,
+                              stderr=subprocess.DEVNULL,
+                              timeout=30,
+                              check=True).stdout.decode().strip()
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def git_revision(path: str = ROOT):
+    '''
+    Revision of the git repository at `path`, with "-dirty" appended if there
+    are uncommitted changes to tracked files
+    '''
+
+    rev = _git('rev-parse', 'HEAD', cwd=path)
+    if rev is None:
+        return None
+    if _git('status', '--porcelain', '--untracked-files=no', cwd=path):
+        rev += '-dirty'
+    return rev
+
+
+def script_context(script: str = None):
+    '''
+    Infer the workload and implementation from the path of a
+    `<workload>/<impl>/main.py` script. Other scripts of an implementation, e.g.
+    `<workload>/<impl>/network.py`, are recorded as implementation
+    "<impl>/network"
+    '''
+
+    script = os.path.abspath(script or sys.argv[0])
+    impl_dir = os.path.dirname(script)
+    impl = os.path.basename(impl_dir)
+    name = os.path.splitext(os.path.basename(script))[0]
+    if name != 'main':
+        impl += '/' + name
+    return {
+        'workload': os.path.basename(os.path.dirname(impl_dir)),
+        'impl': impl,
+    }
+
+
+def input_fingerprint(directory: str = '..'):
+    '''
+    The shapes of the `*.in` inputs in `directory`, and a short hash of them
+    '''
+
+    shapes = {}
+    for filename in sorted(glob.glob(os.path.join(directory, '*.in'))):
+        try:
+            shapes[os.path.basename(filename)] = tensor_shape(filename)
+        except (OSError, ValueError):
+            pass
+    h = hashlib.sha256(json.dumps(shapes, sort_keys=True).encode())
+    return h.hexdigest()[:16], shapes
+
+
+def config_args(argv=None):
+    '''
+    The command line options of a benchmark other than the target and those of
+    `common.benchmark`, e.g. ["--ad-save-all"]
+    '''
+
+    import argparse
+    from .benchmark import add_benchmark_args
+
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument('target', nargs='?')
+    add_benchmark_args(parser)
+    _, rest = parser.parse_known_args(sys.argv[1:] if argv is None else argv)
+    return rest
+
+
+def phase_of(name: str):
+    '''
+    "Impl1 Forward" -> "forward"
+    '''
+
+    return name.split()[-1].lower() if name else 'run'
+
+
+def record(name: str, samples_ns, stats: dict, target: str = None, path=None):
+    '''
+    Append the result of one timed phase to the results file
+    '''
+
+    path = results_path() if path is None else path
+    if not path:
+        return
+    fingerprint, shapes = input_fingerprint()
+    entry = {
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        **script_context(),
+        'target': target or os.environ.get('JAX_PLATFORM_NAME') or 'unknown',
+        'name': name,
+        'phase': phase_of(name),
+        'threads': current_threads(),
+        'config': config_args(),
+        'fingerprint': fingerprint,
+        'shapes': shapes,
+        'git_rev': git_revision(),
+        'freetensor_rev': git_revision(os.path.join(ROOT, 'FreeTensor'))
+                          if os.path.isdir(os.path.join(ROOT, 'FreeTensor'))
+                          else None,
+        'samples_ms': [t / 1e6 for t in samples_ns],
+        'stats': stats,
+    }
+    append([entry], path)
+
+
+def append(entries, path=None):
+    '''
+    Append records to the results file
+    '''
+
+    path = results_path() if path is None else path
+    if not path or not entries:
+        return
+    lines = ''.join(json.dumps(entry) + '\n' for entry in entries)
+    # Several benchmarks may run in parallel
+    with open(path, 'a') as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            f.write(lines)
+            f.flush()
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def load(path=None):
+    '''
+    Read all records, skipping lines that are not valid JSON (e.g. cut off by a
+    killed process)
+    '''
+
+    path = results_path() if path is None else path
+    ret = []
+    if not os.path.exists(path):
+        return ret
+    with open(path) as f:
+        for line in f:
+            try:
+                ret.append(json.loads(line))
+            except ValueError:
+                pass
+    return ret
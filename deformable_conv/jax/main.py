@@ -1,10 +1,15 @@
 import sys
-import time
 import math
+import argparse
 import numpy as np
 import jax
 import jax.numpy as jnp
 
+sys.path.append('../..')
+from common.benchmark import (add_benchmark_args, parse_benchmark_args,
+                              Benchmark)
+from common.numpy.generate import generate
+
 
 @jax.jit
 def conv_impl1(x, w1, w2):
@@ -65,6 +70,10 @@ def conv_impl1(x, w1, w2):
 
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    add_benchmark_args(parser)
+    cmd_args = parse_benchmark_args(parser)
+
     n = 8
     c_in = 256
     c_out = 256
@@ -73,23 +82,16 @@ if __name__ == '__main__':
     k_h = 3
     k_w = 3
 
-    key = jax.random.PRNGKey(0)
-    x = jax.random.uniform(key, (n, c_in, h, w), dtype=jnp.float32) * 2 - 1
-    w1 = jax.random.uniform(key, (k_h, k_w, 2, c_in, k_h, k_w),
-                            dtype=jnp.float32) * 2 - 1
-    w2 = jax.random.uniform(key,
-                            (c_out, c_in, k_h, k_w), dtype=jnp.float32) * 2 - 1
+    x = generate("x", (n, c_in, h, w), low=-1, high=1)
+    w1 = generate("w1", (k_h, k_w, 2, c_in, k_h, k_w), low=-1, high=1)
+    w2 = generate("w2", (c_out, c_in, k_h, k_w), low=-1, high=1)
 
     x = jax.device_put(x)
     w1 = jax.device_put(w1)
     w2 = jax.device_put(w2)
 
-    test_num = 100
+    def check_y(y):
+        assert y.shape == (n, c_out, h, w)
 
-    y = conv_impl1(x, w1, w2)  # init lazy ops
-    t0 = time.time()
-    for i in range(test_num):
-        y = conv_impl1(x, w1, w2)
-    t1 = time.time()
-    assert y.shape == (n, c_out, h, w)
-    print(f"Time = {(t1 - t0) / test_num * 1000} ms")
+    Benchmark(cmd_args, jax.block_until_ready).run(
+        "", lambda: conv_impl1(x, w1, w2), check_y)
@@ -1,8 +1,8 @@
 #!/usr/bin/env bash
 
-if [ $# != 1 ]; then
-    echo "Usage: ./main.sh <cpu/gpu>"
+if [ $# -lt 1 ]; then
+    echo "Usage: ./main.sh <cpu/gpu> [--warmup-repeat <NUM>] [--timing-repeat <NUM>]"
     exit -1
 fi
 
-JAX_PLATFORM_NAME=$1 python3 main.py
+JAX_PLATFORM_NAME=$1 python3 main.py ${@: 2}
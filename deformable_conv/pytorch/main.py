@@ -1,9 +1,14 @@
 import sys
-import time
 import math
+import argparse
 import numpy as np
 import torch
 
+sys.path.append('../..')
+from common.benchmark import (add_benchmark_args, parse_benchmark_args,
+                              Benchmark)
+from common.numpy.generate import generate
+
 
 def conv_impl1(x, w1, w2):
     n, c_in, h, w = x.shape
@@ -79,10 +84,12 @@ def conv_impl1(x, w1, w2):
 
 
 if __name__ == '__main__':
-    if len(sys.argv) != 2:
-        print(f"Usage: {sys.argv[0]} <cpu/gpu>")
-        exit(-1)
-    device = sys.argv[1]
+    parser = argparse.ArgumentParser()
+    parser.add_argument('target', nargs='?')
+    add_benchmark_args(parser)
+    cmd_args = parse_benchmark_args(parser)
+
+    device = cmd_args.target
 
     n = 8
     c_in = 256
@@ -92,23 +99,23 @@ if __name__ == '__main__':
     k_h = 3
     k_w = 3
 
-    x = torch.rand(n, c_in, h, w, dtype=torch.float) * 2 - 1
-    w1 = torch.rand(k_h, k_w, 2, c_in, k_h, k_w, dtype=torch.float) * 2 - 1
-    w2 = torch.rand(c_out, c_in, k_h, k_w, dtype=torch.float) * 2 - 1
+    x = torch.from_numpy(generate("x", (n, c_in, h, w), low=-1, high=1))
+    w1 = torch.from_numpy(
+        generate("w1", (k_h, k_w, 2, c_in, k_h, k_w), low=-1, high=1))
+    w2 = torch.from_numpy(
+        generate("w2", (c_out, c_in, k_h, k_w), low=-1, high=1))
 
     if device == 'gpu':
         x = x.cuda()
         w1 = w1.cuda()
         w2 = w2.cuda()
+        sync = torch.cuda.synchronize
     else:
         assert device == 'cpu'
+        sync = lambda: None
 
-    test_num = 100
+    def check_y(y):
+        assert y.shape == (n, c_out, h, w)
 
-    y = conv_impl1(x, w1, w2)  # init lazy ops
-    t0 = time.time()
-    for i in range(test_num):
-        y = conv_impl1(x, w1, w2)
-    t1 = time.time()
-    assert y.shape == (n, c_out, h, w)
-    print(f"Impl1 Time = {(t1 - t0) / test_num * 1000} ms")
+    Benchmark(cmd_args, lambda _: sync()).run(
+        "Impl1", lambda: conv_impl1(x, w1, w2), check_y)
@@ -1,9 +1,7 @@
 import sys
-import torch
-import numpy as np
 
 sys.path.append('..')
-from common.numpy.io import load_txt
+from common.numpy.compare import compare_outputs
 
 if __name__ == '__main__':
     if len(sys.argv) != 3:
@@ -13,10 +11,6 @@ if __name__ == '__main__':
     dir1 = sys.argv[1]
     dir2 = sys.argv[2]
 
-    #for name in ['y', 'd_x', 'd_w', 'd_w_attn_1', 'd_w_attn_2']:
-    for name in ['y']:
-        print(f"Comparing {name}")
-        data1 = load_txt(f"{dir1}/{name}.out", "float32")
-        data2 = load_txt(f"{dir2}/{name}.out", "float32")
-        assert np.all(np.isclose(data2, data1, 1e-4, 1e-4)), f"{name} differs"
-    print("All output matches")
+    #names = ['y', 'd_x', 'd_w', 'd_w_attn_1', 'd_w_attn_2']
+    #compare_outputs(dir1, dir2, names)
+    compare_outputs(dir1, dir2, ['y'])
@@ -1,5 +1,4 @@
 import sys
-import time
 import argparse
 import numpy as np
 import torch
@@ -10,23 +9,21 @@ import dgl.function as fn
 
 sys.path.append('../..')
 from common.numpy.io import load_txt, store_txt
+from common.numpy.csr import csr_to_coo
+from common.numpy.graph import load_dataset
+from common.benchmark import (add_benchmark_args, parse_benchmark_args,
+                              Benchmark)
 
 
 def load_data(data_name: str):
     '''
-    Load data from ../data/{data_name}.config and ../data/{data_name}.graph
+    Load data from ../data/{data_name}.config and ../data/{data_name}.graph,
+    through the binary copy ../data/{data_name}.csr imported the first time
 
     Returns (#vertices, #edges, ptr, idx), where ptr and idx forms a CSR format
     '''
 
-    with open(f"../data/{data_name}.config", 'r') as f:
-        num_v, num_e = map(int, f.readline().strip().split(' '))
-
-    with open(f"../data/{data_name}.graph", 'r') as f:
-        ptr = np.array(list(map(int, f.readline().strip().split(" "))))
-        idx = np.array(list(map(int, f.readline().strip().split(" "))))
-
-    return num_v, num_e, ptr, idx
+    return load_dataset(f"../data/{data_name}")
 
 
 def gat_layer(g, feat, weight, attn_l, attn_r):
@@ -45,21 +42,8 @@ def gat_layer(g, feat, weight, attn_l, attn_r):
 if __name__ == '__main__':
     parser = argparse.ArgumentParser()
     parser.add_argument('target', nargs='?')
-    parser.add_argument('--warmup-repeat',
-                        type=int,
-                        default=10,
-                        dest='warmup_num')
-    parser.add_argument('--timing-repeat',
-                        type=int,
-                        default=100,
-                        dest='test_num')
-    parser.add_argument('--profile-gpu',
-                        action='store_true',
-                        dest='profile_gpu')
-    cmd_args = parser.parse_args()
-
-    if cmd_args.profile_gpu:
-        from common.gpu import profile_start, profile_stop
+    add_benchmark_args(parser)
+    cmd_args = parse_benchmark_args(parser)
 
     device = cmd_args.target
 
@@ -67,16 +51,13 @@ if __name__ == '__main__':
     idx = load_txt("../idx.in", "int32")
     num_v = ptr.shape[0] - 1
     num_e = idx.shape[0]
-    src_list = []
-    dst_list = []
-    for which in range(num_v):
-        for i in range(ptr[which], ptr[which + 1]):
-            dst_list.append(which)
-            src_list.append(idx[i])
-    g = dgl.graph((src_list, dst_list))
-
-    feat_len = 32
+    dst, src = csr_to_coo(ptr, idx)
+    g = dgl.graph((torch.from_numpy(np.asarray(src, dtype=np.int64)),
+                   torch.from_numpy(np.asarray(dst, dtype=np.int64))),
+                  num_nodes=num_v)
+
     x = torch.tensor(load_txt("../x.in", "float32"), dtype=torch.float)
+    feat_len = x.shape[1]
     w = torch.tensor(load_txt("../w.in", "float32"), dtype=torch.float)
     w_attn_1 = torch.tensor(load_txt("../w_attn_1.in", "float32"),
                             dtype=torch.float)
@@ -96,28 +77,14 @@ if __name__ == '__main__':
         assert device == 'cpu'
         sync = lambda: None
 
-    print(
-        f"{cmd_args.warmup_num} warmup, {cmd_args.test_num} repeats for evalution"
-    )
-    warmup_num = cmd_args.warmup_num
-    test_num = cmd_args.test_num
-
-    for i in range(warmup_num):
-        y = gat_layer(g, x, w, w_attn_1, w_attn_2)
-        if i == 0:
-            store_txt("y.out", y.cpu().numpy())
-    sync()
-    if cmd_args.profile_gpu:
-        profile_start()
-    t0 = time.time()
-    for i in range(test_num):
-        y = gat_layer(g, x, w, w_attn_1, w_attn_2)
-    sync()
-    t1 = time.time()
-    if cmd_args.profile_gpu:
-        profile_stop()
-    assert y.shape == (num_v, feat_len)
-    print(f"Inference Time = {(t1 - t0) / test_num * 1000} ms")
+    bench = Benchmark(cmd_args, lambda _: sync())
+
+    def store_y(y):
+        assert y.shape == (num_v, feat_len)
+        store_txt("y.out", y.cpu().numpy())
+
+    bench.run("Inference", lambda: gat_layer(g, x, w, w_attn_1, w_attn_2),
+              store_y)
 
     if cmd_args.profile_gpu:
         exit(0)
@@ -127,28 +94,14 @@ if __name__ == '__main__':
     w_attn_1.requires_grad = True
     w_attn_2.requires_grad = True
 
-    for i in range(warmup_num):
-        y = gat_layer(g, x, w, w_attn_1, w_attn_2)
-    sync()
-    t0 = time.time()
-    for i in range(test_num):
-        y = gat_layer(g, x, w, w_attn_1, w_attn_2)
-    sync()
-    t1 = time.time()
-    assert y.shape == (num_v, feat_len)
-    print(f"Forward Time = {(t1 - t0) / test_num * 1000} ms")
-
-    for i in range(warmup_num):
-        y.backward(d_y, retain_graph=True)
-        if i == 0:
-            store_txt("d_x.out", x.grad.cpu().numpy())
-            store_txt("d_w.out", w.grad.cpu().numpy())
-            store_txt("d_w_attn_1.out", w_attn_1.grad.cpu().numpy())
-            store_txt("d_w_attn_2.out", w_attn_2.grad.cpu().numpy())
-    sync()
-    t0 = time.time()
-    for i in range(test_num):
-        y.backward(d_y, retain_graph=True)
-    sync()
-    t1 = time.time()
-    print(f"Backward Time = {(t1 - t0) / test_num * 1000} ms")
+    bench.run("Forward", lambda: gat_layer(g, x, w, w_attn_1, w_attn_2))
+
+    def store_grads(_):
+        store_txt("d_x.out", x.grad.cpu().numpy())
+        store_txt("d_w.out", w.grad.cpu().numpy())
+        store_txt("d_w_attn_1.out", w_attn_1.grad.cpu().numpy())
+        store_txt("d_w_attn_2.out", w_attn_2.grad.cpu().numpy())
+
+    y = gat_layer(g, x, w, w_attn_1, w_attn_2)
+    bench.run("Backward", lambda: y.backward(d_y, retain_graph=True),
+              store_grads)
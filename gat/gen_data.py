@@ -1,49 +1,59 @@
 import sys
+import argparse
 import itertools
 import numpy as np
 
 sys.path.append('..')
-from common.numpy.io import store_txt
+from common.numpy.io import store, store_txt
+from common.numpy.generate import save_random
+from common.numpy.graph import load_dataset
 
 
 def load_data(data_name: str):
     '''
-    Load data from ../data/{data_name}.config and ../data/{data_name}.graph
+    Load data from data/{data_name}.config and data/{data_name}.graph,
+    through the binary copy data/{data_name}.csr imported the first time
 
     Returns (#vertices, #edges, ptr, idx), where ptr and idx forms a CSR format
     '''
 
-    with open(f"data/{data_name}.config", 'r') as f:
-        num_v, num_e = map(int, f.readline().strip().split(' '))
-
-    with open(f"data/{data_name}.graph", 'r') as f:
-        ptr = np.array(list(map(int, f.readline().strip().split(" "))))
-        idx = np.array(list(map(int, f.readline().strip().split(" "))))
-
-    return num_v, num_e, ptr, idx
+    return load_dataset(f"data/{data_name}")
 
 
 if __name__ == '__main__':
-    if len(sys.argv) != 2:
-        print(f"Usage: {sys.argv[0]} <data_name>")
-        exit(-1)
-    data_name = sys.argv[1]
+    parser = argparse.ArgumentParser()
+    parser.add_argument('data_name')
+    parser.add_argument('--binary',
+                        action='store_true',
+                        dest='binary',
+                        help='Store inputs in the binary format. Julia '
+                        'implementations cannot read it')
+    parser.add_argument('--seed',
+                        type=int,
+                        default=None,
+                        help='Seed of the random inputs. Defaults to '
+                        '$DATA_SEED, or 0')
+    parser.add_argument('--synthesize',
+                        action='store_true',
+                        help='Only write specs of the random inputs, from '
+                        'which Python implementations synthesize them in '
+                        'memory. Julia implementations cannot read them')
+    parser.add_argument('--feat-len', type=int, default=32, dest='feat_len')
+    cmd_args = parser.parse_args()
+    data_name = cmd_args.data_name
 
     num_v, num_e, ptr, idx = load_data(data_name)
 
-    feat_len = 32
+    feat_len = cmd_args.feat_len
     ptr = ptr.astype("int32")
     idx = idx.astype("int32")
-    x = np.random.uniform(size=(num_v, feat_len)).astype("float32")
-    w = np.random.uniform(size=(feat_len, feat_len)).astype("float32")
-    w_attn_1 = np.random.uniform(size=(feat_len,)).astype("float32")
-    w_attn_2 = np.random.uniform(size=(feat_len,)).astype("float32")
-    d_y = np.random.uniform(size=(num_v, feat_len)).astype('float32')
-
-    store_txt("ptr.in", ptr)
-    store_txt("idx.in", idx)
-    store_txt("x.in", x)
-    store_txt("w.in", w)
-    store_txt("w_attn_1.in", w_attn_1)
-    store_txt("w_attn_2.in", w_attn_2)
-    store_txt("d_y.in", d_y)
+    save = store if cmd_args.binary else store_txt
+    save_rand = None if cmd_args.synthesize else save
+    seed = cmd_args.seed
+    save("ptr.in", ptr)
+    save("idx.in", idx)
+    save_random(save_rand, "x.in", (num_v, feat_len), seed=seed)
+    save_random(save_rand, "w.in", (feat_len, feat_len), seed=seed)
+    save_random(save_rand, "w_attn_1.in", (feat_len, ), seed=seed)
+    save_random(save_rand, "w_attn_2.in", (feat_len, ), seed=seed)
+    save_random(save_rand, "d_y.in", (num_v, feat_len), seed=seed)
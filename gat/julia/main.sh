@@ -4,7 +4,7 @@
 export JULIA_CUDA_USE_BINARYBUILDER=false
 
 if [ $1 == 'cpu' ]; then
-    threads=`cat /proc/cpuinfo | grep "processor" | wc -l`
+    threads=${JULIA_NUM_THREADS:-`cat /proc/cpuinfo | grep "processor" | wc -l`}
     JULIA_NUM_THREADS=$threads julia cpu.jl $@
 elif [ $1 == 'gpu' ]; then
     JULIA_CUDA_USE_BINARYBUILDER=false julia ./gpu.jl $@
@@ -9,36 +9,41 @@ from freetensor import debug
 
 sys.path.append('../..')
 from common.numpy.io import load_txt, store_txt
+from common.numpy.csr import validate_csr
+from common.numpy.graph import load_dataset
+from common.freetensor.cache import optimize
+from common.benchmark import (add_benchmark_args, parse_benchmark_args,
+                              Benchmark)
 
 
 def load_data(data_name: str):
     '''
-    Load data from ../data/{data_name}.config and ../data/{data_name}.graph
+    Load data from ../data/{data_name}.config and ../data/{data_name}.graph,
+    through the binary copy ../data/{data_name}.csr imported the first time
 
     Returns (#vertices, #edges, ptr, idx), where ptr and idx forms a CSR format
     '''
 
-    with open(f"../data/{data_name}.config", 'r') as f:
-        num_v, num_e = map(int, f.readline().strip().split(' '))
+    return load_dataset(f"../data/{data_name}")
 
-    with open(f"../data/{data_name}.graph", 'r') as f:
-        ptr = np.array(list(map(int, f.readline().strip().split(" "))))
-        idx = np.array(list(map(int, f.readline().strip().split(" "))))
 
-    return num_v, num_e, ptr, idx
-
-
-def compile_all(num_v, num_e, feat_len, device):
+def make_inference(num_rows, num_cols, num_e, feat_len):
+    '''
+    GAT inference of `num_rows` target vertices, whose `num_e` edges are in
+    (ptr, idx), over the features of `num_cols` vertices. The targets are the
+    first `num_rows` of those vertices. On the whole graph, num_rows = num_cols
+    = the number of vertices
+    '''
 
     @ft.transform
     def inference(ptr, idx, feat, weight, attn_l, attn_r, y):
-        ptr: ft.Var[(num_v + 1, ), "int32", "input"]
+        ptr: ft.Var[(num_rows + 1, ), "int32", "input"]
         idx: ft.Var[(num_e, ), "int32", "input"]
-        feat: ft.Var[(num_v, feat_len), "float32", "input"]
+        feat: ft.Var[(num_cols, feat_len), "float32", "input"]
         weight: ft.Var[(feat_len, feat_len), "float32", "input"]
         attn_l: ft.Var[(feat_len, ), "float32", "input"]
         attn_r: ft.Var[(feat_len, ), "float32", "input"]
-        y: ft.Var[(num_v, feat_len), "float32", "output"]
+        y: ft.Var[(num_rows, feat_len), "float32", "output"]
 
         feat2 = matmul(feat, weight)
         att_l = matmul(feat2, attn_l)
@@ -50,7 +55,7 @@ def compile_all(num_v, num_e, feat_len, device):
         #! no_deps: edge
         #! no_deps: edge_exp
         #! no_deps: idx
-        for i in range(num_v):
+        for i in range(num_rows):
             edge_max = ft.empty((), "float32")
             edge_max[()] = -float("inf")
             #! nid: Lk1
@@ -74,33 +79,30 @@ def compile_all(num_v, num_e, feat_len, device):
                 for k in range(ptr[i], ptr[i + 1]):
                     y[i, j] += feat2[idx[k], j] * edge_exp[k] / edge_sum[()]
 
+    return inference
+
+
+def compile_all(num_v, num_e, feat_len, device):
+    inference = make_inference(num_v, num_v, num_e, feat_len)
+
     forward, backward, requires, privdes = ft.grad_(
         inference, set(["feat", "weight", "attn_l", "attn_r"]), set(["y"]))
 
     print("# Inference:")
     print(inference)
     t0 = time.time()
-    inference_exe = ft.optimize(
-        inference,
-        schedule_callback=lambda s: s.auto_schedule(device.target()),
-        verbose=1)
+    inference_exe = optimize(inference, device, verbose=1)
     t1 = time.time()
     print(f"Inference compiling time: {t1 - t0}s")
 
     return inference_exe, None, None
     #print("# Forward:")
     #print(forward)
-    #forward_exe = ft.optimize(
-    #    forward,
-    #    schedule_callback=lambda s: s.auto_schedule(device.target()),
-    #    verbose=1)
+    #forward_exe = optimize(forward, device, verbose=1)
 
     #print("# Backward:")
     #print(backward)
-    #backward_exe = ft.optimize(
-    #    backward,
-    #    schedule_callback=lambda s: s.auto_schedule(device.target()),
-    #    verbose=1)
+    #backward_exe = optimize(backward, device, verbose=1)
 
     #def run_backward(ptr, idx, x, w, w_attn_1, w_attn_2, y, d_y, d_x, d_w,
     #                 d_w_attn_1, d_w_attn_2):
@@ -118,21 +120,8 @@ def compile_all(num_v, num_e, feat_len, device):
 if __name__ == '__main__':
     parser = argparse.ArgumentParser()
     parser.add_argument('target', nargs='?')
-    parser.add_argument('--warmup-repeat',
-                        type=int,
-                        default=10,
-                        dest='warmup_num')
-    parser.add_argument('--timing-repeat',
-                        type=int,
-                        default=100,
-                        dest='test_num')
-    parser.add_argument('--profile-gpu',
-                        action='store_true',
-                        dest='profile_gpu')
-    cmd_args = parser.parse_args()
-
-    if cmd_args.profile_gpu:
-        from common.gpu import profile_start, profile_stop
+    add_benchmark_args(parser)
+    cmd_args = parse_benchmark_args(parser)
 
     device = cmd_args.target
 
@@ -140,11 +129,13 @@ if __name__ == '__main__':
     idx = load_txt("../idx.in", "int32")
     num_v = ptr.shape[0] - 1
     num_e = idx.shape[0]
+    # Catch malformed graphs here rather than as out-of-bound reads in kernels
+    validate_csr(ptr, idx)
 
-    feat_len = 32
     ptr = ptr.astype("int32")
     idx = idx.astype("int32")
     x = load_txt("../x.in", "float32")
+    feat_len = x.shape[1]
     w = load_txt("../w.in", "float32")
     w_attn_1 = load_txt("../w_attn_1.in", "float32")
     w_attn_2 = load_txt("../w_attn_2.in", "float32")
@@ -178,57 +169,25 @@ if __name__ == '__main__':
         inference, forward, backward = compile_all(num_v, num_e, feat_len,
                                                    ir_dev)
 
-    print(
-        f"{cmd_args.warmup_num} warmup, {cmd_args.test_num} repeats for evalution"
-    )
-    warmup_num = cmd_args.warmup_num
-    test_num = cmd_args.test_num
-
-    for i in range(warmup_num):
-        inference(ptr, idx, x, w, w_attn_1, w_attn_2, y)
-        if i == 0:
-            store_txt("y.out", y.numpy().reshape((num_v, feat_len)))
-    ir_dev.sync()
-    if cmd_args.profile_gpu:
-        profile_start()
-    t0 = time.time()
-    for i in range(test_num):
-        inference(ptr, idx, x, w, w_attn_1, w_attn_2, y)
-    ir_dev.sync()
-    t1 = time.time()
-    if cmd_args.profile_gpu:
-        profile_stop()
+    bench = Benchmark(cmd_args, lambda _: ir_dev.sync())
 
-    print(f"Inference Time = {(t1 - t0) / test_num * 1000} ms")
+    bench.run(
+        "Inference", lambda: inference(ptr, idx, x, w, w_attn_1, w_attn_2, y),
+        lambda _: store_txt("y.out", y.numpy().reshape((num_v, feat_len))))
 
     if cmd_args.profile_gpu:
         exit(0)
 
-    #for i in range(warmup_num):
-    #    forward(ptr, idx, x, w, w_attn_1, w_attn_2, y)
-    #ir_dev.sync()
-    #t0 = time.time()
-    #for i in range(test_num):
-    #    forward(ptr, idx, x, w, w_attn_1, w_attn_2, y)
-    #ir_dev.sync()
-    #t1 = time.time()
-
-    #print(f"Forward Time = {(t1 - t0) / test_num * 1000} ms")
-
-    #for i in range(warmup_num):
-    #    backward(ptr, idx, x, w, w_attn_1, w_attn_2, y, d_y, d_x, d_w,
-    #             d_w_attn_1, d_w_attn_2)
-    #    if i == 0:
-    #        store_txt("d_x.out", d_x.numpy().reshape((num_v, feat_len)))
-    #        store_txt("d_w.out", d_w.numpy().reshape((feat_len, feat_len)))
-    #        store_txt("d_w_attn_1.out", d_w_attn_1.numpy())
-    #        store_txt("d_w_attn_2.out", d_w_attn_2.numpy())
-    #ir_dev.sync()
-    #t0 = time.time()
-    #for i in range(test_num):
-    #    backward(ptr, idx, x, w, w_attn_1, w_attn_2, y, d_y, d_x, d_w,
-    #             d_w_attn_1, d_w_attn_2)
-    #ir_dev.sync()
-    #t1 = time.time()
-
-    #print(f"Backward Time = {(t1 - t0) / test_num * 1000} ms")
+    #bench.run("Forward",
+    #          lambda: forward(ptr, idx, x, w, w_attn_1, w_attn_2, y))
+
+    #def store_grads(_):
+    #    store_txt("d_x.out", d_x.numpy().reshape((num_v, feat_len)))
+    #    store_txt("d_w.out", d_w.numpy().reshape((feat_len, feat_len)))
+    #    store_txt("d_w_attn_1.out", d_w_attn_1.numpy())
+    #    store_txt("d_w_attn_2.out", d_w_attn_2.numpy())
+
+    #bench.run(
+    #    "Backward", lambda: backward(ptr, idx, x, w, w_attn_1, w_attn_2, y,
+    #                                 d_y, d_x, d_w, d_w_attn_1, d_w_attn_2),
+    #    store_grads)
@@ -0,0 +1,192 @@
+'''
+Mini-batch GAT inference with neighbor sampling
+
+main.py compiles the whole graph into one kernel, whose memory (`feat2` of
+every vertex, and `edge` and `edge_exp` of every edge) grows with the graph.
+Here the vertices are split into batches of target vertices. For each batch,
+`sample_subgraph` (common/numpy/csr.py) samples up to `--fanout` neighbors of
+each target from the CSR graph and renumbers the batch to local IDs, and the
+features of only those vertices are gathered. The kernel is compiled once for
+bounds on the targets, vertices and edges of a batch, so its memory is bounded
+by the batch size rather than the graph size. Batches are padded to the bounds
+with empty rows. The rows of each batch are written to `minibatch_y.out`, a
+memory-mapped file in the format of `common.numpy.io.store`, so the output is
+not held in memory either
+
+Usage: minibatch.py <cpu/gpu> [--batch-size N] [--fanout N] [--shuffle]
+                    [--seed N] [benchmark options]
+
+Use `gen_data.py --binary` so the graph and features are memory-mapped and only
+the rows of each batch are read. With `--fanout 0` every neighbor is kept, so
+the output equals main.py's:
+
+    python3 -m common.numpy.compare gat/ours/y.out gat/ours/minibatch_y.out
+'''
+
+import sys
+import time
+import argparse
+import numpy as np
+import freetensor as ft
+from freetensor.libop import *
+
+sys.path.append('../..')
+from common.numpy.io import load_txt
+from common.numpy.csr import sample_subgraph
+from common.freetensor.cache import optimize
+from common.benchmark import (add_benchmark_args, parse_benchmark_args,
+                              Benchmark)
+
+from main import make_inference
+
+
+def make_batches(num_v: int, batch_size: int, rng=None):
+    '''
+    Split the vertices into batches of at most `batch_size` targets, in order,
+    or shuffled with `rng`
+    '''
+
+    order = np.arange(num_v) if rng is None else rng.permutation(num_v)
+    return [order[i:i + batch_size] for i in range(0, num_v, batch_size)]
+
+
+def batch_bounds(ptr: np.array, batches, fanout: int):
+    '''
+    The maximum numbers of targets, vertices and edges of any batch. Only the
+    rows of `ptr` are read, and only with `fanout <= 0`
+    '''
+
+    max_targets = max(b.shape[0] for b in batches)
+    if fanout > 0:
+        max_edges = max_targets * fanout
+    else:
+        max_edges = max(
+            int((ptr[b + 1].astype(np.int64) - ptr[b]).sum())
+            for b in batches)
+    num_v = ptr.shape[0] - 1
+    return max_targets, min(max_targets + max_edges, num_v), max_edges
+
+
+def pad_batch(vertices, sub_ptr, sub_idx, x, max_targets, max_vertices,
+              max_edges):
+    '''
+    Gather the features of a batch and pad it to the bounds
+
+
+    Returns
+    -------
+    (np.array, np.array, np.array)
+        ptr, idx and features of the batch, of shapes (max_targets + 1, ),
+        (max_edges, ) and (max_vertices, feat_len)
+    '''
+
+    n_targets = sub_ptr.shape[0] - 1
+    ptr = np.full((max_targets + 1, ), sub_ptr[-1], dtype="int32")
+    ptr[:n_targets + 1] = sub_ptr
+    idx = np.zeros((max_edges, ), dtype="int32")
+    idx[:sub_idx.shape[0]] = sub_idx
+    feat = np.zeros((max_vertices, x.shape[1]), dtype="float32")
+    feat[:vertices.shape[0]] = x[vertices]
+    return ptr, idx, feat
+
+
+def compile_batch(max_targets, max_vertices, max_edges, feat_len, device):
+    inference = make_inference(max_targets, max_vertices, max_edges, feat_len)
+
+    print("# Inference:")
+    print(inference)
+    t0 = time.time()
+    inference_exe = optimize(inference, device, verbose=1)
+    t1 = time.time()
+    print(f"Inference compiling time: {t1 - t0}s")
+    return inference_exe
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('target', nargs='?')
+    parser.add_argument('--batch-size',
+                        type=int,
+                        default=1024,
+                        dest='batch_size',
+                        help='Number of target vertices per batch')
+    parser.add_argument('--fanout',
+                        type=int,
+                        default=10,
+                        help='Neighbors sampled per target. 0 keeps all of '
+                        'them')
+    parser.add_argument('--shuffle',
+                        action='store_true',
+                        help='Batch the vertices in a random order')
+    parser.add_argument('--seed',
+                        type=int,
+                        default=0,
+                        help='Seed of the sampling, reset every epoch')
+    add_benchmark_args(parser)
+    cmd_args = parse_benchmark_args(parser)
+
+    device = cmd_args.target
+
+    ptr = load_txt("../ptr.in", "int32")
+    idx = load_txt("../idx.in", "int32")
+    num_v = ptr.shape[0] - 1
+    # Malformed rows are caught by `sample_subgraph` as each batch reads them,
+    # instead of scanning the whole graph up front
+
+    x = load_txt("../x.in", "float32")
+    feat_len = x.shape[1]
+    w = load_txt("../w.in", "float32")
+    w_attn_1 = load_txt("../w_attn_1.in", "float32")
+    w_attn_2 = load_txt("../w_attn_2.in", "float32")
+    y = np.lib.format.open_memmap("minibatch_y.out",
+                                  mode='w+',
+                                  dtype="float32",
+                                  shape=(num_v, feat_len))
+
+    batches = make_batches(
+        num_v, cmd_args.batch_size,
+        np.random.default_rng(cmd_args.seed) if cmd_args.shuffle else None)
+    max_targets, max_vertices, max_edges = batch_bounds(ptr, batches,
+                                                        cmd_args.fanout)
+    # ptr, idx, edge, edge_exp, feat, feat2, att_l, att_r and y
+    batch_bytes = 4 * ((max_targets + 1) + 3 * max_edges +
+                       2 * max_vertices * (feat_len + 1) +
+                       max_targets * feat_len)
+    print(f"{len(batches)} batches of at most {max_targets} targets, "
+          f"{max_vertices} vertices and {max_edges} edges "
+          f"({batch_bytes / 2**20:.1f} MiB per batch)")
+
+    if device == 'gpu':
+        ir_dev = ft.Device(ft.GPU())
+    else:
+        assert device == 'cpu'
+        ir_dev = ft.Device(ft.CPU())
+
+    w = ft.Array(w)
+    w_attn_1 = ft.Array(w_attn_1)
+    w_attn_2 = ft.Array(w_attn_2)
+    y_batch = ft.Array(np.zeros((max_targets, feat_len), dtype="float32"))
+
+    with ir_dev:
+        inference = compile_batch(max_targets, max_vertices, max_edges,
+                                  feat_len, ir_dev)
+
+    bench = Benchmark(cmd_args, lambda _: ir_dev.sync())
+    bench.memory.track(w, w_attn_1, w_attn_2, y_batch)
+
+    def run_epoch():
+        rng = np.random.default_rng(cmd_args.seed)
+        for targets in batches:
+            vertices, sub_ptr, sub_idx = sample_subgraph(
+                ptr, idx, targets, cmd_args.fanout, rng)
+            b_ptr, b_idx, b_feat = pad_batch(vertices, sub_ptr, sub_idx, x,
+                                             max_targets, max_vertices,
+                                             max_edges)
+            inference(ft.Array(b_ptr), ft.Array(b_idx), ft.Array(b_feat), w,
+                      w_attn_1, w_attn_2, y_batch)
+            y[targets] = y_batch.numpy().reshape(
+                (max_targets, feat_len))[:targets.shape[0]]
+
+    stats = bench.run("Minibatch Inference", run_epoch, lambda _: y.flush())
+    print(f"Minibatch throughput = {num_v / stats['mean'] * 1e3:.1f} "
+          f"vertices/s")
@@ -20,6 +20,7 @@ logging.getLogger().setLevel(logging.DEBUG)
 
 sys.path.append('../..')
 from common.numpy.io import load_txt, store_txt
+from common.numpy.csr import csr_to_coo
 
 ######################################################################
 # Define Neural Network in Relay
@@ -59,12 +60,10 @@ d_y_np = load_txt("../d_y.in", dtype)
 # d_y_np = np.loadtxt("../d_y.in", dtype=dtype)
 num_v = ptr_np.shape[0] - 1
 num_e = idx_np.shape[0]
-idx_center_np = np.zeros([num_e], dtype=itype)
-for i in range(num_v):
-    idx_center_np[ptr_np[i]:ptr_np[i+1]] = i
+idx_center_np, _ = csr_to_coo(ptr_np, idx_np)
 print(feat_np.shape, weight_np.shape)
 
-feat_len = 32
+feat_len = feat_np.shape[1]
 
 output_shape = (num_v, feat_len)
 
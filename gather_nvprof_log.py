@@ -1,48 +1,40 @@
-import sys
+import argparse
 
+from common import nvprof
 
-def num(s):
-    try:
-        return int(s)
-    except ValueError:
-        return float(s)
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Per-kernel DRAM/L2 traffic and FLOPs from nvprof -m all '
+        'or ncu --csv logs. Several logs are aggregated by kernel name')
+    parser.add_argument('logs', nargs='+')
+    parser.add_argument('--peak-gflops',
+                        type=float,
+                        default=None,
+                        help='Peak GFLOP/s of the device, for the roofline')
+    parser.add_argument('--peak-bandwidth',
+                        type=float,
+                        default=None,
+                        help='Peak DRAM bandwidth (GB/s), for the roofline')
+    parser.add_argument('--csv', default=None, help='Write the table as CSV')
+    parser.add_argument('--json', default=None, help='Write the table as JSON')
+    cmd_args = parser.parse_args()
 
+    kernels = nvprof.merge(nvprof.parse(log) for log in cmd_args.logs)
+    peak_flops = cmd_args.peak_gflops * 1e9 if cmd_args.peak_gflops else None
+    peak_bandwidth = cmd_args.peak_bandwidth * 1e9 \
+            if cmd_args.peak_bandwidth else None
+    rows = nvprof.table(kernels, peak_flops, peak_bandwidth)
+    if cmd_args.csv:
+        nvprof.write_csv(rows, cmd_args.csv)
+    if cmd_args.json:
+        nvprof.write_json(rows, cmd_args.json)
 
-filename = sys.argv[1]
-
-kernels = 0
-dram_bytes = 0
-l2_bytes = 0
-flops = 0
-flops_mul = 0
-flops_fma = 0
-
-for line in open(filename):
-    cols = line.split()
-    if len(cols) >= 6:
-        if cols[1] == 'dram_read_bytes':
-            dram_bytes += num(cols[0]) * num(cols[-1])
-            kernels += num(cols[0])
-        if cols[1] == 'dram_write_bytes':
-            dram_bytes += num(cols[0]) * num(cols[-1])
-        if cols[1] == 'l2_global_load_bytes':
-            l2_bytes += num(cols[0]) * num(cols[-1])
-        if cols[1] == 'l2_local_load_bytes':
-            l2_bytes += num(cols[0]) * num(cols[-1])
-        if cols[1] == 'l2_global_atomic_store_bytes':
-            l2_bytes += num(cols[0]) * num(cols[-1])
-        if cols[1] == 'l2_local_global_store_bytes':
-            l2_bytes += num(cols[0]) * num(cols[-1])
-        if cols[1] == 'flop_count_sp':
-            flops += num(cols[0]) * num(cols[-1])
-        if cols[1] == 'flop_count_sp_mul':
-            flops_mul += num(cols[0]) * num(cols[-1])
-        if cols[1] == 'flop_count_sp_fma':
-            flops_fma += num(cols[0]) * num(cols[-1])
-
-print("Kernels: ", kernels)
-print("DRAM bytes: ", dram_bytes)
-print("L2 bytes: ", l2_bytes)
-print("FLOP: ", flops)
-print("FLOP (MUL): ", flops_mul)
-print("FLOP (FMA): ", flops_fma)
+    print(nvprof.format_table(rows))
+    print()
+    total = nvprof.totals(kernels)
+    print("Kernels: ", total['kernels'])
+    print("DRAM bytes: ", total['dram_bytes'])
+    print("L2 bytes: ", total['l2_bytes'])
+    print("FLOP: ", total['flops'])
+    print("FLOP (MUL): ", total['flops_mul'])
+    print("FLOP (FMA): ", total['flops_fma'])
@@ -1,9 +1,7 @@
 import sys
-import torch
-import numpy as np
 
 sys.path.append('..')
-from common.numpy.io import load_txt
+from common.numpy.compare import compare_outputs
 
 if __name__ == '__main__':
     if len(sys.argv) not in range(3, 5):
@@ -19,9 +17,4 @@ if __name__ == '__main__':
     if '--infer-only' not in sys.argv:
         to_check += ['d_q', 'd_k', 'd_v']
 
-    for name in to_check:
-        print(f"Comparing {name}")
-        data1 = load_txt(f"{dir1}/{name}.out", "float32")
-        data2 = load_txt(f"{dir2}/{name}.out", "float32")
-        assert np.all(np.isclose(data2, data1, 1e-4, 1e-4)), f"{name} differs"
-    print("All output matches")
+    compare_outputs(dir1, dir2, to_check)
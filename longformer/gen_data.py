@@ -1,23 +1,41 @@
 import sys
-import numpy as np
+import argparse
 
 sys.path.append('..')
-from common.numpy.io import store_txt
+from common.numpy.io import store, store_txt
+from common.numpy.generate import save_random
 
 if __name__ == '__main__':
-    n_heads = 8
-    seq_len = 10000
-    feat_len = 512
-    w = 32
-    dilation = 4  # counts from 1
-    dilation_heads = 2
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--binary',
+                        action='store_true',
+                        dest='binary',
+                        help='Store inputs in the binary format. Julia '
+                        'implementations cannot read it')
+    parser.add_argument('--seed',
+                        type=int,
+                        default=None,
+                        help='Seed of the random inputs. Defaults to '
+                        '$DATA_SEED, or 0')
+    parser.add_argument('--synthesize',
+                        action='store_true',
+                        help='Only write specs of the random inputs, from '
+                        'which Python implementations synthesize them in '
+                        'memory. Julia implementations cannot read them')
+    parser.add_argument('--n-heads', type=int, default=8, dest='n_heads')
+    parser.add_argument('--seq-len', type=int, default=10000, dest='seq_len')
+    parser.add_argument('--feat-len', type=int, default=512, dest='feat_len')
+    cmd_args = parser.parse_args()
 
-    q = np.random.uniform(size=(n_heads, seq_len, feat_len)).astype("float32")
-    k = np.random.uniform(size=(n_heads, seq_len, feat_len)).astype("float32")
-    v = np.random.uniform(size=(n_heads, seq_len, feat_len)).astype("float32")
-    d_y = np.random.uniform(size=(n_heads, seq_len, feat_len)).astype('float32')
+    n_heads = cmd_args.n_heads
+    seq_len = cmd_args.seq_len
+    feat_len = cmd_args.feat_len
 
-    store_txt("q.in", q)
-    store_txt("k.in", k)
-    store_txt("v.in", v)
-    store_txt("d_y.in", d_y)
+    shape = (n_heads, seq_len, feat_len)
+    save = store if cmd_args.binary else store_txt
+    save_rand = None if cmd_args.synthesize else save
+    seed = cmd_args.seed
+    save_random(save_rand, "q.in", shape, seed=seed)
+    save_random(save_rand, "k.in", shape, seed=seed)
+    save_random(save_rand, "v.in", shape, seed=seed)
+    save_random(save_rand, "d_y.in", shape, seed=seed)
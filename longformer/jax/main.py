@@ -1,5 +1,4 @@
 import sys
-import time
 import math
 import argparse
 import numpy as np
@@ -8,13 +7,8 @@ import jax.numpy as jnp
 
 sys.path.append('../..')
 from common.jax.io import load_txt, store_txt
-
-n_heads = 8
-seq_len = 10000
-feat_len = 512
-w = 32
-dilation = 4  # counts from 1
-dilation_heads = 2
+from common.benchmark import (add_benchmark_args, parse_benchmark_args,
+                              Benchmark)
 
 
 def dilated_attention(q, k, v, dilation):
@@ -64,23 +58,25 @@ def transformer_impl1(q, k, v):
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser()
-    parser.add_argument('--warmup-repeat',
+    parser.add_argument('--w', type=int, default=32, help='Half window size')
+    parser.add_argument('--dilation',
                         type=int,
-                        default=10,
-                        dest='warmup_num')
-    parser.add_argument('--timing-repeat',
+                        default=4,
+                        help='Dilation of the first heads, counting from 1')
+    parser.add_argument('--dilation-heads',
                         type=int,
-                        default=100,
-                        dest='test_num')
-    parser.add_argument('--profile-gpu',
-                        action='store_true',
-                        dest='profile_gpu')
-    cmd_args = parser.parse_args()
+                        default=2,
+                        dest='dilation_heads')
+    add_benchmark_args(parser)
+    cmd_args = parse_benchmark_args(parser)
 
-    if cmd_args.profile_gpu:
-        from common.gpu import profile_start, profile_stop
+    # Module-level, read by dilated_attention and transformer_impl1
+    w = cmd_args.w
+    dilation = cmd_args.dilation  # counts from 1
+    dilation_heads = cmd_args.dilation_heads
 
     q = load_txt("../q.in", "float32")
+    n_heads, seq_len, feat_len = q.shape
     k = load_txt("../k.in", "float32")
     v = load_txt("../v.in", "float32")
     d_y = load_txt("../d_y.in", "float32")
@@ -90,12 +86,6 @@ if __name__ == '__main__':
     v = jax.device_put(v)
     d_y = jax.device_put(d_y)
 
-    print(
-        f"{cmd_args.warmup_num} warmup, {cmd_args.test_num} repeats for evalution"
-    )
-    warmup_num = cmd_args.warmup_num
-    test_num = cmd_args.test_num
-
     transformer_impl1_inference = jax.jit(transformer_impl1)
     # NOTE: JAX requires to compute gradients w.r.t. a scalar, so we sum the output to compute it.
     #       We explicitly multiply d_y here, so it is mathematically equivalent to compute gradients
@@ -104,39 +94,26 @@ if __name__ == '__main__':
         lambda *args: jnp.sum(transformer_impl1(*args) * d_y),
         argnums=(0, 1, 2))
 
-    for i in range(warmup_num):
-        y = transformer_impl1_inference(q, k, v)
-        if i == 0:
-            store_txt("y.out", y)
-    y = y.block_until_ready()
-    if cmd_args.profile_gpu:
-        profile_start()
-    t0 = time.time()
-    for i in range(test_num):
-        y = transformer_impl1_inference(q, k, v)
-    y = y.block_until_ready()
-    t1 = time.time()
-    if cmd_args.profile_gpu:
-        profile_stop()
-    assert y.shape == (n_heads, seq_len, feat_len)
-    print(f"Inference Time = {(t1 - t0) / test_num * 1000} ms")
+    bench = Benchmark(cmd_args, jax.block_until_ready)
+
+    def store_y(y):
+        assert y.shape == (n_heads, seq_len, feat_len)
+        store_txt("y.out", y)
+
+    bench.run("Inference", lambda: transformer_impl1_inference(q, k, v),
+              store_y)
 
     if cmd_args.profile_gpu:
         exit(0)
 
-    for i in range(warmup_num):
-        d_q, d_k, d_v = transformer_impl1_forward_backward(q, k, v)
-        if i == 0:
-            store_txt("d_q.out", d_q)
-            store_txt("d_k.out", d_k)
-            store_txt("d_v.out", d_v)
-    y = y.block_until_ready()
-    t0 = time.time()
-    for i in range(test_num):
-        d_q, d_k, d_v = transformer_impl1_forward_backward(q, k, v)
-    y = y.block_until_ready()
-    t1 = time.time()
-    assert d_q.shape == q.shape
-    assert d_k.shape == k.shape
-    assert d_v.shape == v.shape
-    print(f"Forward+Backward Time = {(t1 - t0) / test_num * 1000} ms")
+    def store_grads(grads):
+        d_q, d_k, d_v = grads
+        assert d_q.shape == q.shape
+        assert d_k.shape == k.shape
+        assert d_v.shape == v.shape
+        store_txt("d_q.out", d_q)
+        store_txt("d_k.out", d_k)
+        store_txt("d_v.out", d_v)
+
+    bench.run("Forward+Backward",
+              lambda: transformer_impl1_forward_backward(q, k, v), store_grads)
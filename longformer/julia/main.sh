@@ -9,7 +9,7 @@ fi
 export JULIA_CUDA_USE_BINARYBUILDER=false
 
 if [ $1 == 'cpu' ]; then
-    threads=`cat /proc/cpuinfo | grep "processor" | wc -l`
+    threads=${JULIA_NUM_THREADS:-`cat /proc/cpuinfo | grep "processor" | wc -l`}
     JULIA_NUM_THREADS=$threads julia cpu.jl $@
 elif [ $1 == 'gpu' ]; then
     julia gpu.jl $@
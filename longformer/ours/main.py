@@ -8,6 +8,9 @@ from freetensor import debug
 
 sys.path.append('../..')
 from common.numpy.io import load_txt, store_txt
+from common.freetensor.cache import optimize
+from common.benchmark import (add_benchmark_args, parse_benchmark_args,
+                              Benchmark)
 
 
 def compile_all(w, dilation, dilation_heads, n_heads, seq_len, feat_len,
@@ -63,10 +66,7 @@ def compile_all(w, dilation, dilation_heads, n_heads, seq_len, feat_len,
     print("# Inference:")
     print(inference)
     t0 = time.time()
-    inference_exe = ft.optimize(
-        inference,
-        schedule_callback=lambda s: s.auto_schedule(device.target()),
-        verbose=1)
+    inference_exe = optimize(inference, device, verbose=1)
     t1 = time.time()
     print(f"Inference compiling time: {t1 - t0}s")
 
@@ -76,17 +76,11 @@ def compile_all(w, dilation, dilation_heads, n_heads, seq_len, feat_len,
 
     print("# Forward:")
     print(forward)
-    forward_exe = ft.optimize(
-        forward,
-        schedule_callback=lambda s: s.auto_schedule(device.target()),
-        verbose=1)
+    forward_exe = optimize(forward, device, verbose=1)
 
     print("# Backward:")
     print(backward)
-    backward_exe = ft.optimize(
-        backward,
-        schedule_callback=lambda s: s.auto_schedule(device.target()),
-        verbose=1)
+    backward_exe = optimize(backward, device, verbose=1)
 
     def run_backward(Q, K, V, Y, d_Y, d_Q, d_K, d_V):
         kvs = {}
@@ -102,34 +96,28 @@ def compile_all(w, dilation, dilation_heads, n_heads, seq_len, feat_len,
 if __name__ == '__main__':
     parser = argparse.ArgumentParser()
     parser.add_argument('target', nargs='?')
-    parser.add_argument('--warmup-repeat',
-                        type=int,
-                        default=10,
-                        dest='warmup_num')
-    parser.add_argument('--timing-repeat',
-                        type=int,
-                        default=100,
-                        dest='test_num')
     parser.add_argument('--ad-save-all',
                         action='store_true',
                         dest='ad_save_all')
-    parser.add_argument('--profile-gpu',
-                        action='store_true',
-                        dest='profile_gpu')
-    cmd_args = parser.parse_args()
-
-    if cmd_args.profile_gpu:
-        from common.gpu import profile_start, profile_stop
+    parser.add_argument('--w', type=int, default=32, help='Half window size')
+    parser.add_argument('--dilation',
+                        type=int,
+                        default=4,
+                        help='Dilation of the first heads, counting from 1')
+    parser.add_argument('--dilation-heads',
+                        type=int,
+                        default=2,
+                        dest='dilation_heads')
+    add_benchmark_args(parser)
+    cmd_args = parse_benchmark_args(parser)
 
     device = cmd_args.target
 
-    n_heads = 8
-    seq_len = 10000
-    feat_len = 512
-    w = 32
-    dilation = 4  # counts from 1
-    dilation_heads = 2
+    w = cmd_args.w
+    dilation = cmd_args.dilation  # counts from 1
+    dilation_heads = cmd_args.dilation_heads
     q = load_txt("../q.in", "float32")
+    n_heads, seq_len, feat_len = q.shape
     k = load_txt("../k.in", "float32")
     v = load_txt("../v.in", "float32")
     y = np.zeros((n_heads, seq_len, feat_len), dtype="float32")
@@ -159,57 +147,22 @@ if __name__ == '__main__':
                                                    ir_dev,
                                                    cmd_args.ad_save_all)
 
-    print(
-        f"{cmd_args.warmup_num} warmup, {cmd_args.test_num} repeats for evalution"
-    )
-    warmup_num = cmd_args.warmup_num
-    test_num = cmd_args.test_num
-
-    for i in range(warmup_num):
-        inference(q, k, v, y)
-        if i == 0:
-            store_txt("y.out", y.numpy().reshape((n_heads, seq_len, feat_len)))
-    ir_dev.sync()
-    if cmd_args.profile_gpu:
-        profile_start()
-    t0 = time.time()
-    for i in range(test_num):
-        inference(q, k, v, y)
-    ir_dev.sync()
-    t1 = time.time()
-    if cmd_args.profile_gpu:
-        profile_stop()
+    bench = Benchmark(cmd_args, lambda _: ir_dev.sync())
+    bench.memory.track(q, k, v, y, d_q, d_k, d_v, d_y)
 
-    print(f"Inference Time = {(t1 - t0) / test_num * 1000} ms")
+    bench.run(
+        "Inference", lambda: inference(q, k, v, y), lambda _: store_txt(
+            "y.out", y.numpy().reshape((n_heads, seq_len, feat_len))))
 
     if cmd_args.profile_gpu:
         exit(0)
 
-    for i in range(warmup_num):
-        forward(q, k, v, y)
-    ir_dev.sync()
-    t0 = time.time()
-    for i in range(test_num):
-        forward(q, k, v, y)
-    ir_dev.sync()
-    t1 = time.time()
+    bench.run("Forward", lambda: forward(q, k, v, y))
 
-    print(f"Forward Time = {(t1 - t0) / test_num * 1000} ms")
-
-    for i in range(warmup_num):
-        backward(q, k, v, y, d_y, d_q, d_k, d_v)
-        if i == 0:
-            store_txt("d_q.out",
-                      d_q.numpy().reshape((n_heads, seq_len, feat_len)))
-            store_txt("d_k.out",
-                      d_k.numpy().reshape((n_heads, seq_len, feat_len)))
-            store_txt("d_v.out",
-                      d_v.numpy().reshape((n_heads, seq_len, feat_len)))
-    ir_dev.sync()
-    t0 = time.time()
-    for i in range(test_num):
-        backward(q, k, v, y, d_y, d_q, d_k, d_v)
-    ir_dev.sync()
-    t1 = time.time()
+    def store_grads(_):
+        store_txt("d_q.out", d_q.numpy().reshape((n_heads, seq_len, feat_len)))
+        store_txt("d_k.out", d_k.numpy().reshape((n_heads, seq_len, feat_len)))
+        store_txt("d_v.out", d_v.numpy().reshape((n_heads, seq_len, feat_len)))
 
-    print(f"Backward Time = {(t1 - t0) / test_num * 1000} ms")
+    bench.run("Backward", lambda: backward(q, k, v, y, d_y, d_q, d_k, d_v),
+              store_grads)
@@ -1,5 +1,4 @@
 import sys
-import time
 import math
 import argparse
 import numpy as np
@@ -7,6 +6,8 @@ import torch
 
 sys.path.append('../..')
 from common.numpy.io import load_txt, store_txt
+from common.benchmark import (add_benchmark_args, parse_benchmark_args,
+                              Benchmark)
 
 
 def dilated_attention(q, k, v, w, dilation):
@@ -46,31 +47,25 @@ def transformer_impl1(q, k, v, w, dilation, dilation_heads):
 if __name__ == '__main__':
     parser = argparse.ArgumentParser()
     parser.add_argument('target', nargs='?')
-    parser.add_argument('--warmup-repeat',
+    parser.add_argument('--w', type=int, default=32, help='Half window size')
+    parser.add_argument('--dilation',
                         type=int,
-                        default=10,
-                        dest='warmup_num')
-    parser.add_argument('--timing-repeat',
+                        default=4,
+                        help='Dilation of the first heads, counting from 1')
+    parser.add_argument('--dilation-heads',
                         type=int,
-                        default=100,
-                        dest='test_num')
-    parser.add_argument('--profile-gpu',
-                        action='store_true',
-                        dest='profile_gpu')
-    cmd_args = parser.parse_args()
-
-    if cmd_args.profile_gpu:
-        from common.gpu import profile_start, profile_stop
+                        default=2,
+                        dest='dilation_heads')
+    add_benchmark_args(parser)
+    cmd_args = parse_benchmark_args(parser)
 
     device = cmd_args.target
 
-    n_heads = 8
-    seq_len = 10000
-    feat_len = 512
-    w = 32
-    dilation = 4  # counts from 1
-    dilation_heads = 2
+    w = cmd_args.w
+    dilation = cmd_args.dilation  # counts from 1
+    dilation_heads = cmd_args.dilation_heads
     q = torch.tensor(load_txt("../q.in", "float32"), dtype=torch.float)
+    n_heads, seq_len, feat_len = q.shape
     k = torch.tensor(load_txt("../k.in", "float32"), dtype=torch.float)
     v = torch.tensor(load_txt("../v.in", "float32"), dtype=torch.float)
     d_y = torch.tensor(load_txt("../d_y.in", "float32"), dtype=torch.float)
@@ -85,28 +80,15 @@ if __name__ == '__main__':
         assert device == 'cpu'
         sync = lambda: None
 
-    print(
-        f"{cmd_args.warmup_num} warmup, {cmd_args.test_num} repeats for evalution"
-    )
-    warmup_num = cmd_args.warmup_num
-    test_num = cmd_args.test_num
-
-    for i in range(warmup_num):
-        y = transformer_impl1(q, k, v, w, dilation, dilation_heads)
-        if i == 0:
-            store_txt("y.out", y.cpu().numpy())
-    sync()
-    if cmd_args.profile_gpu:
-        profile_start()
-    t0 = time.time()
-    for i in range(test_num):
-        y = transformer_impl1(q, k, v, w, dilation, dilation_heads)
-    sync()
-    t1 = time.time()
-    if cmd_args.profile_gpu:
-        profile_stop()
-    assert y.shape == (n_heads, seq_len, feat_len)
-    print(f"Inference Time = {(t1 - t0) / test_num * 1000} ms")
+    bench = Benchmark(cmd_args, lambda _: sync())
+
+    def store_y(y):
+        assert y.shape == (n_heads, seq_len, feat_len)
+        store_txt("y.out", y.cpu().numpy())
+
+    bench.run("Inference",
+              lambda: transformer_impl1(q, k, v, w, dilation, dilation_heads),
+              store_y)
 
     if cmd_args.profile_gpu:
         exit(0)
@@ -115,27 +97,14 @@ if __name__ == '__main__':
     k.requires_grad = True
     v.requires_grad = True
 
-    for i in range(warmup_num):
-        y = transformer_impl1(q, k, v, w, dilation, dilation_heads)
-    sync()
-    t0 = time.time()
-    for i in range(test_num):
-        y = transformer_impl1(q, k, v, w, dilation, dilation_heads)
-    sync()
-    t1 = time.time()
-    assert y.shape == (n_heads, seq_len, feat_len)
-    print(f"Forward Time = {(t1 - t0) / test_num * 1000} ms")
-
-    for i in range(warmup_num):
-        y.backward(d_y, retain_graph=True)
-        if i == 0:
-            store_txt("d_q.out", q.grad.cpu().numpy())
-            store_txt("d_k.out", k.grad.cpu().numpy())
-            store_txt("d_v.out", v.grad.cpu().numpy())
-    sync()
-    t0 = time.time()
-    for i in range(test_num):
-        y.backward(d_y, retain_graph=True)
-    sync()
-    t1 = time.time()
-    print(f"Backward Time = {(t1 - t0) / test_num * 1000} ms")
+    bench.run("Forward",
+              lambda: transformer_impl1(q, k, v, w, dilation, dilation_heads))
+
+    def store_grads(_):
+        store_txt("d_q.out", q.grad.cpu().numpy())
+        store_txt("d_k.out", k.grad.cpu().numpy())
+        store_txt("d_v.out", v.grad.cpu().numpy())
+
+    y = transformer_impl1(q, k, v, w, dilation, dilation_heads)
+    bench.run("Backward", lambda: y.backward(d_y, retain_graph=True),
+              store_grads)
@@ -22,6 +22,7 @@ import logging
 
 sys.path.append('../..')
 from common.numpy.io import load_txt, store_txt
+from common.benchmark import record_samples
 
 logging.basicConfig()
 logging.getLogger().setLevel(logging.DEBUG)
@@ -37,6 +38,15 @@ parser.add_argument('--eval', default='', dest='eval')
 parser.add_argument('--warmup-repeat', type=int, default=10, dest='warmup_num')
 parser.add_argument('--timing-repeat', type=int, default=100, dest='test_num')
 parser.add_argument('--profile-gpu', action='store_true', dest='profile_gpu')
+parser.add_argument('--w', type=int, default=32, help='Half window size')
+parser.add_argument('--dilation',
+                    type=int,
+                    default=4,
+                    help='Dilation of the first heads, counting from 1')
+parser.add_argument('--dilation-heads',
+                    type=int,
+                    default=2,
+                    dest='dilation_heads')
 cmd_args = parser.parse_args()
 
 if cmd_args.profile_gpu:
@@ -57,18 +67,16 @@ else:
         print("Please specify --eval <log_file> if not tuning")
         exit(-1)
 
-n_heads = 8
-seq_len = 10000
-feat_len = 512
-w = 32
-dilation = 4  # counts from 1
-dilation_heads = 2
+w = cmd_args.w
+dilation = cmd_args.dilation  # counts from 1
+dilation_heads = cmd_args.dilation_heads
 
 target = tvm.target.Target(target_name)
 dtype, itype = 'float32', 'int32'
 print('log file:', log_file)
 
 d_q = load_txt("../q.in", "float32")
+n_heads, seq_len, feat_len = d_q.shape
 d_k = load_txt("../k.in", "float32")
 d_v = load_txt("../v.in", "float32")
 
@@ -291,15 +299,23 @@ for func, inputs in zip(funcs, inputs_funcs):
 if cmd_args.profile_gpu:
     profile_start()
 time_log = []
+# One sample per iteration, so the end-to-end latencies can be recorded
+samples = np.zeros((cmd_args.test_num, ))
 for func, inputs in zip(funcs, inputs_funcs):
     evaluator = func.time_evaluator(func.entry_name,
                                     dev,
-                                    number=cmd_args.test_num)
-    time_ms = np.median(evaluator(*inputs).results) * 1000
+                                    number=1,
+                                    repeat=cmd_args.test_num)
+    results = np.array(evaluator(*inputs).results)
+    time_ms = np.median(results) * 1000
     time_log.append(time_ms)
+    samples += results
 if cmd_args.profile_gpu:
     profile_stop()
 print(
     f"{cmd_args.warmup_num} warmup, {cmd_args.test_num} repeats for evalution")
 print('Time breakdown (ms):', time_log)
 print("Average e2e time: %.3f ms" % (sum(time_log)))
+# Profiled runs are slowed down and not recorded
+if not cmd_args.profile_gpu:
+    record_samples("Inference", samples * 1e9, cmd_args.target)
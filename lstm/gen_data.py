@@ -1,37 +1,55 @@
+import sys
+import argparse
 import numpy as np
-import torch
+
+sys.path.append('..')
+from common.numpy.generate import generate
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--length', type=int, default=100)
+    parser.add_argument('--in-feats', type=int, default=4, dest='in_feats')
+    parser.add_argument('--hidden-feats',
+                        type=int,
+                        default=256,
+                        dest='hidden_feats')
+    parser.add_argument('--seed',
+                        type=int,
+                        default=None,
+                        help='Seed of the random inputs. Defaults to '
+                        '$DATA_SEED, or 0')
+    cmd_args = parser.parse_args()
 
-    length = 100
-    in_feats = 4
-    hidden_feats = 256
+    length = cmd_args.length
+    in_feats = cmd_args.in_feats
+    hidden_feats = cmd_args.hidden_feats
 
     # NOTE: LSTM requires special initialization for numerical stability
 
 
-    def init_weight(shape):
-        w = torch.empty(shape, dtype=torch.float)
-        torch.nn.init.xavier_uniform_(w)
-        return w.numpy()
-
-    def init_norm(shape):
-        return torch.randn(shape, dtype=torch.float).numpy()
-
-    x = init_norm((length, in_feats))
-    wf = init_weight((hidden_feats, in_feats))
-    wi = init_weight((hidden_feats, in_feats))
-    wo = init_weight((hidden_feats, in_feats))
-    wc = init_weight((hidden_feats, in_feats))
-    uf = init_weight((hidden_feats, hidden_feats))
-    ui = init_weight((hidden_feats, hidden_feats))
-    uo = init_weight((hidden_feats, hidden_feats))
-    uc = init_weight((hidden_feats, hidden_feats))
-    bf = init_norm((hidden_feats,))
-    bi = init_norm((hidden_feats,))
-    bo = init_norm((hidden_feats,))
-    bc = init_norm((hidden_feats,))
-    d_y = init_norm((hidden_feats,))
+    def init_weight(name, shape):
+        # Xavier (Glorot) uniform initialization, as torch.nn.init.xavier_uniform_
+        fan_out, fan_in = shape
+        bound = np.sqrt(6 / (fan_in + fan_out))
+        return generate(name, shape, low=-bound, high=bound, seed=cmd_args.seed)
+
+    def init_norm(name, shape):
+        return generate(name, shape, dist='normal', seed=cmd_args.seed)
+
+    x = init_norm("x", (length, in_feats))
+    wf = init_weight("wf", (hidden_feats, in_feats))
+    wi = init_weight("wi", (hidden_feats, in_feats))
+    wo = init_weight("wo", (hidden_feats, in_feats))
+    wc = init_weight("wc", (hidden_feats, in_feats))
+    uf = init_weight("uf", (hidden_feats, hidden_feats))
+    ui = init_weight("ui", (hidden_feats, hidden_feats))
+    uo = init_weight("uo", (hidden_feats, hidden_feats))
+    uc = init_weight("uc", (hidden_feats, hidden_feats))
+    bf = init_norm("bf", (hidden_feats,))
+    bi = init_norm("bi", (hidden_feats,))
+    bo = init_norm("bo", (hidden_feats,))
+    bc = init_norm("bc", (hidden_feats,))
+    d_y = init_norm("d_y", (hidden_feats,))
 
     np.savetxt("x.in", x)
     np.savetxt("wf.in", wf)
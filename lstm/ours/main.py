@@ -1,210 +1,13 @@
 import sys
-import time
-import itertools
+import argparse
 import numpy as np
 import freetensor as ft
 from freetensor.libop import *
 from freetensor import debug
 
 sys.path.append('../..')
-from common.numpy.io import load_txt, store_txt
-
-
-def compile_all(n_faces, in_feats, out_feats, device, ad_save_all):
-    mtype = device.main_mem_type()
-
-    @ft.transform
-    def inference(adj, x, w0, w1, w2, w3, y):
-        adj: ft.Var[(n_faces, 3), "int32", "input", mtype]
-        x: ft.Var[(n_faces, in_feats), "float32", "input", mtype]
-        w0: ft.Var[(in_feats, out_feats), "float32", "input", mtype]
-        w1: ft.Var[(in_feats, out_feats), "float32", "input", mtype]
-        w2: ft.Var[(in_feats, out_feats), "float32", "input", mtype]
-        w3: ft.Var[(in_feats, out_feats), "float32", "input", mtype]
-        y: ft.Var[(n_faces, out_feats), "float32", "output", mtype]
-
-        for i in range(n_faces):
-            sum1 = zeros((in_feats,), "float32", mtype)
-            sum2 = zeros((in_feats,), "float32", mtype)
-            sum3 = zeros((in_feats,), "float32", mtype)
-            for p in range(3):
-                add_to(sum1, x[adj[i, p]])
-                add_to(sum2, abs(sub(x[adj[i, p]], x[adj[i, (p + 1) % 3]])))
-                add_to(sum3, abs(sub(x[adj[i, p]], x[i])))
-            y0 = matmul(x[i], w0)
-            y1 = matmul(sum1, w1)
-            y2 = matmul(sum2, w2)
-            y3 = matmul(sum3, w3)
-            assign(y[i], add(add(add(y0, y1), y2), y3))
-
-    print("# Inference:")
-    print(inference)
-    t0 = time.time()
-    s = ft.Schedule(inference)
-    s.auto_schedule(device.target())
-    f = ft.lower(s.func(), device.target())
-    code = ft.codegen(f, device.target())
-    inference_exe = ft.Driver(inference, code, device)
-    t1 = time.time()
-    print(f)
-    print(debug.with_line_no(code))
-    print(f"Inference compiling time: {t1 - t0}s")
-
-    forward, backward, requires, privdes = ft.grad_(
-        inference, set(["x", "w0", "w1", "w2", "w3"]), set(["y"]),
-        ft.GradTapeMode.All if ad_save_all else ft.GradTapeMode.NoReuseOnly)
-
-    print("# Forward:")
-    print(forward)
-    s = ft.Schedule(forward)
-    s.auto_schedule(device.target())
-    f = ft.lower(s.func(), device.target())
-    print(f)
-    code = ft.codegen(f, device.target())
-    print(debug.with_line_no(code))
-    forward_exe = ft.Driver(forward, code, device)
-
-    print("# Backward:")
-    print(backward)
-    s = ft.Schedule(backward)
-    s.auto_schedule(device.target())
-    f = ft.lower(s.func(), device.target())
-    print(f)
-    code = ft.codegen(f, device.target())
-    print(debug.with_line_no(code))
-    backward_exe = ft.Driver(backward, code, device)
-
-    def run_backward(adj, x, w0, w1, w2, w3, y, d_y, d_x, d_w0, d_w1, d_w2,
-                     d_w3):
-        kvs = {}
-        kvs[privdes['y']] = d_y
-        kvs[requires['x']] = d_x
-        kvs[requires['w0']] = d_w0
-        kvs[requires['w1']] = d_w1
-        kvs[requires['w2']] = d_w2
-        kvs[requires['w3']] = d_w3
-        backward_exe(**kvs)
-
-    return inference_exe, forward_exe, run_backward
-
-
-if __name__ == '__main__':
-    parser = argparse.ArgumentParser()
-    parser.add_argument('target', nargs='?')
-    parser.add_argument('--warmup-repeat',
-                        type=int,
-                        default=10,
-                        dest='warmup_num')
-    parser.add_argument('--timing-repeat',
-                        type=int,
-                        default=100,
-                        dest='test_num')
-    parser.add_argument('--profile-gpu',
-                        action='store_true',
-                        dest='profile_gpu')
-    parser.add_argument('--ad-save-all',
-                        action='store_true',
-                        dest='ad_save_all')
-    cmd_args = parser.parse_args()
-
-    if cmd_args.profile_gpu:
-        from common.gpu import profile_start, profile_stop
-
-    device = cmd_args.target
-
-    adj = load_txt("../adj.in", "int32")
-    n_faces = adj.shape[0]
-    in_feats = 13
-    out_feats = 64
-    x = load_txt("../x.in", "float32")
-    w0 = load_txt("../w0.in", "float32")
-    w1 = load_txt("../w1.in", "float32")
-    w2 = load_txt("../w2.in", "float32")
-    w3 = load_txt("../w3.in", "float32")
-    y = np.zeros((n_faces, out_feats), dtype="float32")
-    d_x = np.zeros(x.shape, dtype='float32')
-    d_w0 = np.zeros(w0.shape, dtype='float32')
-    d_w1 = np.zeros(w1.shape, dtype='float32')
-    d_w2 = np.zeros(w2.shape, dtype='float32')
-    d_w3 = np.zeros(w3.shape, dtype='float32')
-    d_y = load_txt("../d_y.in", "float32")
-
-    if device == 'gpu':
-        ir_dev = ft.Device(ft.GPU())
-    else:
-        assert device == 'cpu'
-        ir_dev = ft.Device(ft.CPU())
-
-    adj = ft.Array(adj, ir_dev)
-    x = ft.Array(x, ir_dev)
-    w0 = ft.Array(w0, ir_dev)
-    w1 = ft.Array(w1, ir_dev)
-    w2 = ft.Array(w2, ir_dev)
-    w3 = ft.Array(w3, ir_dev)
-    y = ft.Array(y, ir_dev)
-    d_x = ft.Array(d_x, ir_dev)
-    d_w0 = ft.Array(d_w0, ir_dev)
-    d_w1 = ft.Array(d_w1, ir_dev)
-    d_w2 = ft.Array(d_w2, ir_dev)
-    d_w3 = ft.Array(d_w3, ir_dev)
-    d_y = ft.Array(d_y, ir_dev)
-
-    inference, forward, backward = compile_all(n_faces, in_feats, out_feats,
-                                               ir_dev, cmd_args.ad_save_all)
-
-    print(
-        f"{cmd_args.warmup_num} warmup, {cmd_args.test_num} repeats for evalution"
-    )
-    warmup_num = cmd_args.warmup_num
-    test_num = cmd_args.test_num
-
-    for i in range(warmup_num):
-        inference(adj, x, w0, w1, w2, w3, y)
-        if i == 0:
-            store_txt("y.out", y.numpy().reshape((n_faces, out_feats)))
-    ir_dev.sync()
-    if cmd_args.profile_gpu:
-        profile_start()
-    t0 = time.time()
-    for i in range(test_num):
-        inference(adj, x, w0, w1, w2, w3, y)
-    ir_dev.sync()
-    t1 = time.time()
-    if cmd_args.profile_gpu:
-        profile_stop()
-
-    print(f"Inference Time = {(t1 - t0) / test_num * 1000} ms")
-
-    if cmd_args.profile_gpu:
-        exit(0)
-
-    for i in range(warmup_num):
-        forward(adj, x, w0, w1, w2, w3, y)
-    ir_dev.sync()
-    t0 = time.time()
-    for i in range(test_num):
-        forward(adj, x, w0, w1, w2, w3, y)
-    ir_dev.sync()
-    t1 = time.time()
-
-    print(f"Forward Time = {(t1 - t0) / test_num * 1000} ms")
-
-    for i in range(warmup_num):
-        backward(adj, x, w0, w1, w2, w3, y, d_y, d_x, d_w0, d_w1, d_w2, d_w3)
-        if i == 0:
-            store_txt("d_x.out", d_x.numpy().reshape((n_faces, in_feats)))
-            store_txt("d_w0.out", d_w0.numpy().reshape((in_feats, out_feats)))
-            store_txt("d_w1.out", d_w1.numpy().reshape((in_feats, out_feats)))
-            store_txt("d_w2.out", d_w2.numpy().reshape((in_feats, out_feats)))
-            store_txt("d_w3.out", d_w3.numpy().reshape((in_feats, out_feats)))
-    ir_dev.sync()
-    t0 = time.time()
-    for i in range(test_num):
-        backward(adj, x, w0, w1, w2, w3, y, d_y, d_x, d_w0, d_w1, d_w2, d_w3)
-    ir_dev.sync()
-    t1 = time.time()
-
-    print(f"Backward Time = {(t1 - t0) / test_num * 1000} ms")
+from common.benchmark import (add_benchmark_args, parse_benchmark_args,
+                              Benchmark)
 
 
 def compile_all(in_feats, hidden_feats, length, device):
@@ -293,10 +96,12 @@ def compile_all(in_feats, hidden_feats, length, device):
 
 
 if __name__ == '__main__':
-    if len(sys.argv) != 2:
-        print(f"Usage: {sys.argv[0]} <cpu/gpu>")
-        exit(-1)
-    device = sys.argv[1]
+    parser = argparse.ArgumentParser()
+    parser.add_argument('target', nargs='?')
+    add_benchmark_args(parser)
+    cmd_args = parse_benchmark_args(parser)
+
+    device = cmd_args.target
 
     x = np.loadtxt("../x.in").astype("float32")
     wf = np.loadtxt("../wf.in").astype("float32").transpose()
@@ -356,72 +161,28 @@ if __name__ == '__main__':
 
     inference, forward, backward = compile_all(in_feats, hidden_feats, length,
                                                ir_dev)
-    warmup_num = 10
-    test_num = 10
-    for i in range(warmup_num):
-        inference(x, y, w, u, b)
-        if i == 0:
-            np.savetxt("y.out", y.numpy().reshape((hidden_feats,)))
-    ir_dev.sync()
-    t0 = time.time()
-    for i in range(test_num):
-        inference(x, y, w, u, b)
-    ir_dev.sync()
-    t1 = time.time()
 
-    print(f"Inference Time = {(t1 - t0) / test_num * 1000} ms")
-    #
-    for i in range(warmup_num):
-        forward(x, y, w, u, b)
-    ir_dev.sync()
-    t0 = time.time()
-    for i in range(test_num):
-        forward(x, y, w, u, b)
-    ir_dev.sync()
-    t1 = time.time()
+    bench = Benchmark(cmd_args, lambda _: ir_dev.sync())
+
+    bench.run(
+        "Inference", lambda: inference(x, y, w, u, b), lambda _: np.savetxt(
+            "y.out", y.numpy().reshape((hidden_feats,))))
 
-    print(f"Forward Time = {(t1 - t0) / test_num * 1000} ms")
-    for i in range(warmup_num):
-        backward(x, y, w, u, b, d_w, d_u, d_b, d_x, d_y)
-        if i == 0:
-            np.savetxt("d_x.out", d_x.numpy().reshape((length, in_feats)))
-            np.savetxt(
-                "d_wf.out",
-                d_w.numpy().reshape((4, in_feats, hidden_feats))[0].transpose())
-            np.savetxt(
-                "d_wi.out",
-                d_w.numpy().reshape((4, in_feats, hidden_feats))[1].transpose())
-            np.savetxt(
-                "d_wo.out",
-                d_w.numpy().reshape((4, in_feats, hidden_feats))[2].transpose())
-            np.savetxt(
-                "d_wc.out",
-                d_w.numpy().reshape((4, in_feats, hidden_feats))[3].transpose())
-            np.savetxt(
-                "d_uf.out",
-                d_u.numpy().reshape(
-                    (4, hidden_feats, hidden_feats))[0].transpose())
-            np.savetxt(
-                "d_ui.out",
-                d_u.numpy().reshape(
-                    (4, hidden_feats, hidden_feats))[1].transpose())
-            np.savetxt(
-                "d_uo.out",
-                d_u.numpy().reshape(
-                    (4, hidden_feats, hidden_feats))[2].transpose())
-            np.savetxt(
-                "d_uc.out",
-                d_u.numpy().reshape(
-                    (4, hidden_feats, hidden_feats))[3].transpose())
-            np.savetxt("d_bf.out", d_b.numpy().reshape((4, hidden_feats))[0])
-            np.savetxt("d_bi.out", d_b.numpy().reshape((4, hidden_feats))[1])
-            np.savetxt("d_bo.out", d_b.numpy().reshape((4, hidden_feats))[2])
-            np.savetxt("d_bc.out", d_b.numpy().reshape((4, hidden_feats))[3])
-    ir_dev.sync()
-    t0 = time.time()
-    for i in range(test_num):
-        backward(x, y, w, u, b, d_w, d_u, d_b, d_x, d_y)
-    ir_dev.sync()
-    t1 = time.time()
+    if cmd_args.profile_gpu:
+        exit(0)
 
-    print(f"Backward Time = {(t1 - t0) / test_num * 1000} ms")
+    bench.run("Forward", lambda: forward(x, y, w, u, b))
+
+    def store_grads(_):
+        np.savetxt("d_x.out", d_x.numpy().reshape((length, in_feats)))
+        d_w_np = d_w.numpy().reshape((4, in_feats, hidden_feats))
+        d_u_np = d_u.numpy().reshape((4, hidden_feats, hidden_feats))
+        d_b_np = d_b.numpy().reshape((4, hidden_feats))
+        for i, gate in enumerate(['f', 'i', 'o', 'c']):
+            np.savetxt(f"d_w{gate}.out", d_w_np[i].transpose())
+            np.savetxt(f"d_u{gate}.out", d_u_np[i].transpose())
+            np.savetxt(f"d_b{gate}.out", d_b_np[i])
+
+    bench.run("Backward",
+              lambda: backward(x, y, w, u, b, d_w, d_u, d_b, d_x, d_y),
+              store_grads)
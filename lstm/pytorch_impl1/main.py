@@ -1,10 +1,14 @@
 import sys
-import time
+import argparse
 import numpy as np
 import torch
 import torch.nn as nn
 import torch._VF as vf
 
+sys.path.append('../..')
+from common.benchmark import (add_benchmark_args, parse_benchmark_args,
+                              Benchmark)
+
 
 def lstm(x, wi, ui, bi, wf, uf, bf, wc, uc, bc, wo, uo, bo):
     length = x.shape[0]
@@ -23,10 +27,12 @@ def lstm(x, wi, ui, bi, wf, uf, bf, wc, uc, bc, wo, uo, bo):
 
 
 if __name__ == '__main__':
-    if len(sys.argv) != 2:
-        print(f"Usage: {sys.argv[0]} <cpu/gpu>")
-        exit(-1)
-    device = sys.argv[1]
+    parser = argparse.ArgumentParser()
+    parser.add_argument('target', nargs='?')
+    add_benchmark_args(parser)
+    cmd_args = parse_benchmark_args(parser)
+
+    device = cmd_args.target
     x = torch.tensor(np.loadtxt("../x.in"), dtype=torch.float)
     d_y = torch.tensor(np.loadtxt("../d_y.in"), dtype=torch.float)
     wi = torch.tensor(np.loadtxt("../wi.in"), dtype=torch.float)
@@ -67,20 +73,17 @@ if __name__ == '__main__':
         assert device == 'cpu'
         sync = lambda: None
 
-    warmup_num = 10
-    test_num = 10
-    for i in range(warmup_num):
-        y = lstm(x, wi, ui, bi, wf, uf, bf, wc, uc, bc, wo, uo, bo)
-        if i == 0:
-            np.savetxt("y.out", y.cpu().detach().numpy())
-    sync()
-    t0 = time.time()
-    for i in range(test_num):
-        y = lstm(x, wi, ui, bi, wf, uf, bf, wc, uc, bc, wo, uo, bo)
-    sync()
-    t1 = time.time()
-    assert y.shape == (hidden_feats,)
-    print(f"Pytorch impl1 Inference Time = {(t1 - t0) / test_num * 1000} ms")
+    bench = Benchmark(cmd_args, lambda _: sync())
+
+    def store_y(y):
+        assert y.shape == (hidden_feats,)
+        np.savetxt("y.out", y.cpu().detach().numpy())
+
+    bench.run(
+        "Pytorch impl1 Inference",
+        lambda: lstm(x, wi, ui, bi, wf, uf, bf, wc, uc, bc, wo, uo, bo),
+        store_y)
+
     x.requires_grad = True
     wi.requires_grad = True
     wc.requires_grad = True
@@ -94,37 +97,26 @@ if __name__ == '__main__':
     bc.requires_grad = True
     bf.requires_grad = True
     bo.requires_grad = True
-    for i in range(warmup_num):
-        y = lstm(x, wi, ui, bi, wf, uf, bf, wc, uc, bc, wo, uo, bo)
-    sync()
-    t0 = time.time()
-    for i in range(test_num):
-        y = lstm(x, wi, ui, bi, wf, uf, bf, wc, uc, bc, wo, uo, bo)
-    sync()
-    t1 = time.time()
-    assert y.shape == (hidden_feats,)
-    print(f"Pytorch impl1 Forward Time = {(t1 - t0) / test_num * 1000} ms")
-
-    for i in range(warmup_num):
-        y.backward(d_y, retain_graph=True)
-        if i == 0:
-            np.savetxt("d_x.out", x.grad.cpu().numpy())
-            np.savetxt("d_wi.out", wi.grad.cpu().numpy())
-            np.savetxt("d_wc.out", wc.grad.cpu().numpy())
-            np.savetxt("d_wf.out", wf.grad.cpu().numpy())
-            np.savetxt("d_wo.out", wo.grad.cpu().numpy())
-            np.savetxt("d_ui.out", ui.grad.cpu().numpy())
-            np.savetxt("d_uc.out", uc.grad.cpu().numpy())
-            np.savetxt("d_uf.out", uf.grad.cpu().numpy())
-            np.savetxt("d_uo.out", uo.grad.cpu().numpy())
-            np.savetxt("d_bi.out", bi.grad.cpu().numpy())
-            np.savetxt("d_bc.out", bc.grad.cpu().numpy())
-            np.savetxt("d_bf.out", bf.grad.cpu().numpy())
-            np.savetxt("d_bo.out", bo.grad.cpu().numpy())
-    sync()
-    t0 = time.time()
-    for i in range(test_num):
-        y.backward(d_y, retain_graph=True)
-    sync()
-    t1 = time.time()
-    print(f"Pytorch impl1 Backward Time = {(t1 - t0) / test_num * 1000} ms")
+
+    bench.run(
+        "Pytorch impl1 Forward",
+        lambda: lstm(x, wi, ui, bi, wf, uf, bf, wc, uc, bc, wo, uo, bo))
+
+    def store_grads(_):
+        np.savetxt("d_x.out", x.grad.cpu().numpy())
+        np.savetxt("d_wi.out", wi.grad.cpu().numpy())
+        np.savetxt("d_wc.out", wc.grad.cpu().numpy())
+        np.savetxt("d_wf.out", wf.grad.cpu().numpy())
+        np.savetxt("d_wo.out", wo.grad.cpu().numpy())
+        np.savetxt("d_ui.out", ui.grad.cpu().numpy())
+        np.savetxt("d_uc.out", uc.grad.cpu().numpy())
+        np.savetxt("d_uf.out", uf.grad.cpu().numpy())
+        np.savetxt("d_uo.out", uo.grad.cpu().numpy())
+        np.savetxt("d_bi.out", bi.grad.cpu().numpy())
+        np.savetxt("d_bc.out", bc.grad.cpu().numpy())
+        np.savetxt("d_bf.out", bf.grad.cpu().numpy())
+        np.savetxt("d_bo.out", bo.grad.cpu().numpy())
+
+    y = lstm(x, wi, ui, bi, wf, uf, bf, wc, uc, bc, wo, uo, bo)
+    bench.run("Pytorch impl1 Backward",
+              lambda: y.backward(d_y, retain_graph=True), store_grads)
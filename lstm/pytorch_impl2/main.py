@@ -1,10 +1,14 @@
 import sys
-import time
+import argparse
 import numpy as np
 import torch
 import torch.nn as nn
 import torch._VF as vf
 
+sys.path.append('../..')
+from common.benchmark import (add_benchmark_args, parse_benchmark_args,
+                              Benchmark)
+
 
 def nn_lstm(x, lstm_layer, h, c):
     hidden = (h, c)
@@ -14,10 +18,12 @@ def nn_lstm(x, lstm_layer, h, c):
 
 
 if __name__ == '__main__':
-    if len(sys.argv) != 2:
-        print(f"Usage: {sys.argv[0]} <cpu/gpu>")
-        exit(-1)
-    device = sys.argv[1]
+    parser = argparse.ArgumentParser()
+    parser.add_argument('target', nargs='?')
+    add_benchmark_args(parser)
+    cmd_args = parse_benchmark_args(parser)
+
+    device = cmd_args.target
     x = torch.tensor(np.loadtxt("../x.in"), dtype=torch.float)
     d_y = torch.tensor(np.loadtxt("../d_y.in"), dtype=torch.float)
     hidden_feats = d_y.shape[0]
@@ -46,38 +52,22 @@ if __name__ == '__main__':
         assert device == 'cpu'
         sync = lambda: None
 
-    warmup_num = 10
-    test_num = 10
-    for i in range(warmup_num):
-        with torch.no_grad():
-            y = nn_lstm(x, lstm_nograd, h, c)
-    sync()
-    t0 = time.time()
-    for i in range(test_num):
+    bench = Benchmark(cmd_args, lambda _: sync())
+
+    def infer():
         with torch.no_grad():
-            y = nn_lstm(x, lstm_nograd, h, c)
-    sync()
-    t1 = time.time()
-    assert y.shape == (hidden_feats,)
-    print(f"Pytorch impl2 Inference Time = {(t1 - t0) / test_num * 1000} ms")
+            return nn_lstm(x, lstm_nograd, h, c)
+
+    def check_y(y):
+        assert y.shape == (hidden_feats,)
+
+    bench.run("Pytorch impl2 Inference", infer, check_y)
+
     x.requires_grad = True
-    for i in range(warmup_num):
-        y = nn_lstm(x, lstm_layer, h, c)
-    sync()
-    t0 = time.time()
-    for i in range(test_num):
-        y = nn_lstm(x, lstm_layer, h, c)
-    sync()
-    t1 = time.time()
-    assert y.shape == (hidden_feats,)
-    print(f"Pytorch impl2 Forward Time = {(t1 - t0) / test_num * 1000} ms")
 
-    for i in range(warmup_num):
-        y.backward(d_y, retain_graph=True)
-    sync()
-    t0 = time.time()
-    for i in range(test_num):
-        y.backward(d_y, retain_graph=True)
-    sync()
-    t1 = time.time()
-    print(f"Pytorch impl2 Backward Time = {(t1 - t0) / test_num * 1000} ms")
+    bench.run("Pytorch impl2 Forward", lambda: nn_lstm(x, lstm_layer, h, c),
+              check_y)
+
+    y = nn_lstm(x, lstm_layer, h, c)
+    bench.run("Pytorch impl2 Backward",
+              lambda: y.backward(d_y, retain_graph=True))
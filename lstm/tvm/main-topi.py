@@ -17,6 +17,10 @@ from datetime import datetime
 import sys
 # Enable debug logs
 import logging
+
+sys.path.append('../..')
+from common.benchmark import record_samples
+
 logging.basicConfig()
 logging.getLogger().setLevel(logging.DEBUG)
 
@@ -186,17 +190,22 @@ np.save('y.out.npy', y_tvm.asnumpy())
 warmup_num = 10
 timing_repeat = 1000
 time_log = []
+# One sample per iteration, so the end-to-end latencies can be recorded
+samples = np.zeros((timing_repeat, ))
 for func, inputs in zip(funcs, inputs_funcs):
     evaluator = func.time_evaluator(
         func.entry_name, dev, number=warmup_num)
     evaluator(*inputs)
     evaluator = func.time_evaluator(
-        func.entry_name, dev, number=timing_repeat)
-    time_ms = np.median(evaluator(*inputs).results) * 1000
+        func.entry_name, dev, number=1, repeat=timing_repeat)
+    results = np.array(evaluator(*inputs).results)
+    time_ms = np.median(results) * 1000
     time_log.append(time_ms)
+    samples += results
 print(f"{warmup_num} warmup, {timing_repeat} repeats for evalution")
 print('Time breakdown (ms):', time_log)
 print(
     "Average e2e time: %.3f ms"
     % (sum(time_log))
 )
+record_samples("Inference", samples * 1e9, sys.argv[1])
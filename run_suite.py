@@ -0,0 +1,624 @@
+'''
+Run every workload x implementation, check the outputs and tabulate speedups
+
+For each workload, `gen_data.py` is run once, then every implementation (each
+subdirectory with a `main.sh`) is run in its own subprocess with a timeout, and
+its outputs are checked against the FreeTensor implementation (`ours`) with the
+workload's `compare.py`. CPU jobs run in parallel, each pinned to a disjoint set
+of cores. GPU jobs run one at a time
+
+CPU jobs are pinned with the thread counts of all frameworks set to their
+number of cores (see `common.cpu`). With `--thread-sweep`, every CPU job is run
+with 1, 2, 4, ... threads, one job at a time, and the strong scaling is
+tabulated
+
+With `--size-sweep N`, the inputs of each workload are instead generated at N
+geometrically growing sizes (see `SIZE_SWEEPS`), and the latency, throughput
+(elements/s and FLOP/s, see `common.flops`) and memory of every implementation
+are tabulated against the size
+
+Usage (from the repository root):
+
+    python3 run_suite.py [--targets cpu gpu] [--workloads ...] [--cpu-jobs N]
+                         [--gen-arg subdivnet=<obj-file>] [--gen-arg gat=<data-name>]
+                         [--thread-sweep] [--size-sweep N [--sweep-factor F]]
+'''
+
+import os
+import re
+import sys
+import json
+import time
+import queue
+import signal
+import argparse
+import subprocess
+import concurrent.futures
+
+from common.cpu import thread_env
+from common.flops import work, phase_flops
+from common.memory import footprint, format_bytes
+from common.results import RESULTS_ENV, results_path, phase_of
+from common.results import load as load_records, append as append_records
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+WORKLOADS = [
+    'subdivnet', 'gat', 'longformer', 'lstm', 'softrast', 'deformable_conv'
+]
+
+# Positional arguments of gen_data.py, which have no defaults
+GEN_DATA_ARGS = {
+    'subdivnet': 'obj-file',
+    'softrast': 'obj-file',
+    'gat': 'data-name',
+}
+
+BASELINE = 'ours'
+
+# Options of gen_data.py scaled by --size-sweep, and their smallest value
+SIZE_SWEEPS = {
+    'subdivnet': (['--copies'], 1),
+    'gat': (['--feat-len'], 8),
+    'longformer': (['--seq-len'], 1250),
+    'lstm': (['--hidden-feats'], 32),
+    'softrast': (['--height', '--width'], 16),
+}
+
+# "Inference Time = 1.23 ms", "Impl1 Forward+Backward Time = 1.23 ms", or
+# "Time = 1.23 ms" for single-phase workloads
+_TIME_RE = re.compile(r'^(.*?) ?Time = ([0-9.eE+-]+) ms', re.M)
+# TVM implementations
+_TVM_TIME_RE = re.compile(r'^Average e2e time: ([0-9.eE+-]+) ms', re.M)
+
+
+def discover(workloads, impls=None, exclude=()):
+    '''
+    List (workload, impl) pairs that have a `main.sh`
+    '''
+
+    ret = []
+    for workload in workloads:
+        path = os.path.join(ROOT, workload)
+        if not os.path.isdir(path):
+            print(f"Unknown workload {workload}", file=sys.stderr)
+            continue
+        for impl in sorted(os.listdir(path)):
+            if impls and impl not in impls:
+                continue
+            if any(impl == e or impl.startswith(e + '_') for e in exclude):
+                continue
+            if os.path.isfile(os.path.join(path, impl, 'main.sh')):
+                ret.append((workload, impl))
+    return ret
+
+
+def uses_benchmark_harness(workload: str, impl: str):
+    '''
+    Whether the implementation takes the options of `common.benchmark`
+    '''
+
+    main = os.path.join(ROOT, workload, impl, 'main.py')
+    if not os.path.isfile(main):
+        return False
+    with open(main) as f:
+        return 'add_benchmark_args' in f.read()
+
+
+def phase_label(name: str):
+    '''
+    "Impl1 Forward" -> "Forward", and "" -> "Inference" for single-phase
+    workloads
+    '''
+
+    return phase_of(name).title() if name else 'Inference'
+
+
+def record_times(records):
+    '''
+    Phase -> mean time in ms, from the records of a job (see `common.results`)
+    '''
+
+    return {
+        phase_label(rec['name']): rec['stats']['mean']
+        for rec in records
+        if 'mean' in rec.get('stats', {})
+    }
+
+
+def parse_times(output: str):
+    '''
+    Phase -> time in ms printed by an implementation, for those that write no
+    records (TVM and Julia)
+    '''
+
+    ret = {}
+    for name, t in _TIME_RE.findall(output):
+        ret[phase_label(name)] = float(t)
+    for t in _TVM_TIME_RE.findall(output):
+        ret['Inference'] = float(t)
+    return ret
+
+
+def sweep_threads(max_threads: int):
+    '''
+    1, 2, 4, ... up to and including `max_threads`
+    '''
+
+    ret = []
+    n = 1
+    while n < max_threads:
+        ret.append(n)
+        n *= 2
+    return ret + [max_threads]
+
+
+def partition_cores(num_jobs: int):
+    '''
+    Split the cores this process may run on into `num_jobs` disjoint sets
+    '''
+
+    cores = sorted(os.sched_getaffinity(0))
+    num_jobs = max(1, min(num_jobs, len(cores)))
+    per_job = len(cores) // num_jobs
+    return [cores[i * per_job:(i + 1) * per_job] for i in range(num_jobs)]
+
+
+def run_cmd(cmd, cwd, log_file, timeout, cores=None, env=None):
+    '''
+    Run a command with its output teed to `log_file`
+
+    The command runs in a new session, so on timeout its whole process group
+    (e.g. python3 started by main.sh) is killed
+
+
+    Returns
+    -------
+    (str, str)
+        The status ("ok", "failed" or "timeout") and the output
+    '''
+
+    env = dict(os.environ if env is None else env)
+    if cores is not None:
+        env.update(thread_env(len(cores)))
+
+    def preexec():
+        if cores is not None:
+            os.sched_setaffinity(0, cores)
+
+    with open(log_file, 'w') as log:
+        log.write(f"$ cd {cwd} && {' '.join(cmd)}\n")
+        if cores is not None:
+            log.write(f"# cores: {cores}\n")
+        log.flush()
+        proc = subprocess.Popen(cmd,
+                                cwd=cwd,
+                                env=env,
+                                stdout=subprocess.PIPE,
+                                stderr=subprocess.STDOUT,
+                                start_new_session=True,
+                                preexec_fn=preexec)
+        try:
+            output, _ = proc.communicate(timeout=timeout)
+            status = 'ok' if proc.returncode == 0 else 'failed'
+        except subprocess.TimeoutExpired:
+            os.killpg(proc.pid, signal.SIGKILL)
+            output, _ = proc.communicate()
+            status = 'timeout'
+        output = output.decode(errors='replace')
+        log.write(output)
+    return status, output
+
+
+def gen_data(workload: str, cmd_args, extra_args=None, tag='gen_data'):
+    '''
+    Run `gen_data.py` of a workload. Returns whether its inputs are ready
+
+    With `extra_args` (e.g. sizes), the inputs are always regenerated
+    '''
+
+    path = os.path.join(ROOT, workload)
+    if not os.path.isfile(os.path.join(path, 'gen_data.py')):
+        return True
+    has_inputs = any(f.endswith('.in') for f in os.listdir(path))
+    if cmd_args.skip_gen_data and has_inputs and extra_args is None:
+        return True
+    args = cmd_args.gen_args.get(workload, [])
+    if workload in GEN_DATA_ARGS and not args:
+        if has_inputs and extra_args is None:
+            print(f"{workload}: no --gen-arg {workload}=<"
+                  f"{GEN_DATA_ARGS[workload]}>, reusing the existing inputs")
+            return True
+        print(f"{workload}: skipped, --gen-arg {workload}=<"
+              f"{GEN_DATA_ARGS[workload]}> is required")
+        return False
+    cmd = [sys.executable, 'gen_data.py', *args, *(extra_args or [])]
+    if cmd_args.binary:
+        cmd.append('--binary')
+    if cmd_args.synthesize:
+        with open(os.path.join(path, 'gen_data.py')) as f:
+            if '--synthesize' in f.read():
+                cmd.append('--synthesize')
+    status, _ = run_cmd(cmd, path,
+                        os.path.join(cmd_args.log_dir, f"{workload}.{tag}.log"),
+                        cmd_args.timeout)
+    print(f"{workload}: gen_data.py {' '.join(extra_args or [])} {status}")
+    return status == 'ok'
+
+
+def run_impl(workload: str, impl: str, target: str, cmd_args, cores=None):
+    cmd = ['bash', 'main.sh', target]
+    if cmd_args.main_args and uses_benchmark_harness(workload, impl):
+        cmd += cmd_args.main_args.split()
+    threads = len(cores) if cores is not None else None
+    tag = target if threads is None else f"{target}.{threads}t"
+    if cmd_args.size is not None:
+        tag += f".{cmd_args.size}"
+    log_file = os.path.join(cmd_args.log_dir, f"{workload}.{impl}.{tag}.log")
+    # Collect the records of this job separately, to read its memory usage
+    env = dict(os.environ)
+    records_file = log_file[:-len('.log')] + '.jsonl'
+    if results_path():
+        env[RESULTS_ENV] = records_file
+    t0 = time.time()
+    status, output = run_cmd(cmd, os.path.join(ROOT, workload, impl), log_file,
+                             cmd_args.timeout, cores, env)
+    print(f"{workload}/{impl} ({tag}): {status} in "
+          f"{time.time() - t0:.0f} s")
+    records = load_records(records_file)
+    append_records(records)
+    return {
+        'workload': workload,
+        'impl': impl,
+        'target': target,
+        'threads': threads,
+        'size': cmd_args.size,
+        'status': status,
+        'times': record_times(records) or parse_times(output),
+        'memory': {
+            phase_label(rec['name']):
+            footprint(rec['stats']['memory'], target)
+            for rec in records
+            if 'memory' in rec.get('stats', {})
+        },
+        'log': log_file,
+    }
+
+
+def check(workload: str, impl: str, target: str, cmd_args):
+    '''
+    Compare the outputs of `impl` against the baseline
+    '''
+
+    path = os.path.join(ROOT, workload)
+    if impl == BASELINE or not os.path.isfile(os.path.join(path, 'compare.py')):
+        return None
+    cmd = [sys.executable, 'compare.py', BASELINE, impl]
+    with open(os.path.join(path, 'compare.py')) as f:
+        accepts_infer_only = '--infer-only' in f.read()
+    # Implementations without differentiation write no gradients
+    if accepts_infer_only and not any(
+            f.startswith('d_') and f.endswith('.out')
+            for f in os.listdir(os.path.join(path, impl))):
+        cmd.append('--infer-only')
+    status, _ = run_cmd(
+        cmd, path,
+        os.path.join(cmd_args.log_dir, f"{workload}.{impl}.{target}.compare.log"),
+        cmd_args.timeout)
+    return status == 'ok'
+
+
+def run_target(jobs, target: str, cmd_args):
+    '''
+    Run all implementations on one target, then check their outputs
+
+    The outputs are checked after all runs, and before the next target
+    overwrites them
+    '''
+
+    if target == 'cpu':
+        # Every CPU job is pinned, with the thread counts of all frameworks set
+        # to its number of cores. A thread sweep runs one job at a time on all
+        # cores, so the scaling is not distorted by jobs sharing the LLC and
+        # memory bandwidth
+        num_jobs = 1 if cmd_args.thread_sweep else cmd_args.cpu_jobs
+        if cmd_args.thread_sweep and cmd_args.cpu_jobs > 1:
+            print("--thread-sweep runs CPU jobs one at a time, ignoring "
+                  "--cpu-jobs")
+        partition = partition_cores(num_jobs)
+        core_sets = queue.Queue()
+        for cores in partition:
+            core_sets.put(cores)
+        if cmd_args.thread_sweep:
+            counts = sweep_threads(len(partition[0]))
+        else:
+            counts = [len(partition[0])]
+
+        def pinned(job):
+            # The thread counts of one implementation run one after another,
+            # since they write the same output files
+            workload, impl = job
+            cores = core_sets.get()
+            try:
+                return [
+                    run_impl(workload, impl, target, cmd_args,
+                             cores[:threads]) for threads in counts
+                ]
+            finally:
+                core_sets.put(cores)
+
+        with concurrent.futures.ThreadPoolExecutor(len(partition)) as executor:
+            results = [r for rs in executor.map(pinned, jobs) for r in rs]
+    else:
+        results = [run_impl(*job, target, cmd_args) for job in jobs]
+
+    # Check once per implementation, against the latest outputs
+    ok = {(r['workload'], r['impl']) for r in results if r['status'] == 'ok'}
+    correct = {}
+    for workload, impl in sorted(ok):
+        if (workload, BASELINE) in ok:
+            correct[workload, impl] = check(workload, impl, target, cmd_args)
+    for r in results:
+        r['correct'] = correct.get((r['workload'], r['impl'])) \
+                if r['status'] == 'ok' else None
+    return results
+
+
+def speedup_table(results):
+    '''
+    One row per workload, target, phase and implementation. "Speedup" is the
+    time of the implementation divided by the time of the baseline, i.e. how
+    many times faster the baseline is
+    '''
+
+    def target_of(r):
+        return r['target'] if r['threads'] is None else \
+                f"{r['target']}/{r['threads']}"
+
+    baseline = {(r['workload'], target_of(r), phase): t
+                for r in results if r['impl'] == BASELINE
+                for phase, t in r['times'].items()}
+    header = ['Workload', 'Target', 'Phase', 'Impl', 'Time (ms)', 'Speedup',
+              'Check']
+    rows = []
+    for r in results:
+        check = {True: 'pass', False: 'FAIL', None: '-'}[r['correct']]
+        if not r['times']:
+            rows.append([r['workload'], target_of(r), '-', r['impl'], '-', '-',
+                         r['status'] if r['status'] != 'ok' else check])
+        for phase, t in r['times'].items():
+            base = baseline.get((r['workload'], target_of(r), phase))
+            rows.append([
+                r['workload'], target_of(r), phase, r['impl'], f"{t:.3f}",
+                f"{t / base:.2f}x" if base else '-', check
+            ])
+    return format_table(header, rows)
+
+
+def scaling_table(results):
+    '''
+    Strong scaling of each workload, implementation and phase on CPU: the time
+    with each number of threads, the speedup over the fewest threads, and the
+    parallel efficiency (speedup / relative number of threads)
+    '''
+
+    curves = {}
+    for r in results:
+        if r['threads'] is None:
+            continue
+        for phase, t in r['times'].items():
+            if r.get('size') is not None:
+                phase = f"{phase}@{r['size']}"
+            curves.setdefault((r['workload'], r['impl'], phase),
+                              []).append((r['threads'], t))
+    header = ['Workload', 'Impl', 'Phase', 'Threads', 'Time (ms)', 'Speedup',
+              'Efficiency']
+    rows = []
+    for (workload, impl, phase), points in curves.items():
+        points.sort()
+        threads0, t0 = points[0]
+        for threads, t in points:
+            speedup = t0 / t
+            rows.append([
+                workload, impl, phase,
+                str(threads), f"{t:.3f}", f"{speedup:.2f}x",
+                f"{speedup * threads0 / threads:.0%}"
+            ])
+    return format_table(header, rows)
+
+
+def sweep_table(results):
+    '''
+    Latency, throughput and memory of each workload, implementation, target and
+    phase against the input size. "Speedup" is relative to the baseline at the
+    same size
+    '''
+
+    def target_of(r):
+        return r['target'] if r['threads'] is None else \
+                f"{r['target']}/{r['threads']}"
+
+    baseline = {(r['workload'], target_of(r), r['size'], phase): t
+                for r in results if r['impl'] == BASELINE
+                for phase, t in r['times'].items()}
+    header = ['Workload', 'Impl', 'Target', 'Phase', 'Size', 'Elements',
+              'Time (ms)', 'Speedup', 'Elements/s', 'GFLOP/s', 'Memory']
+    rows = []
+    for r in sorted(results,
+                    key=lambda r: (r['workload'], r['impl'], target_of(r))):
+        elements, flops = r['work'] or (None, None)
+        for phase, t in r['times'].items():
+            base = baseline.get((r['workload'], target_of(r), r['size'], phase))
+            rows.append([
+                r['workload'], r['impl'], target_of(r), phase,
+                str(r['size']), str(elements or '-'), f"{t:.3f}",
+                f"{t / base:.2f}x" if base else '-',
+                f"{elements / t * 1e3:.3g}" if elements else '-',
+                f"{phase_flops(phase, flops) / t / 1e6:.2f}" if flops else '-',
+                format_bytes(r['memory'].get(phase))
+            ])
+    return format_table(header, rows)
+
+
+def run_size_sweep(jobs, cmd_args):
+    '''
+    Generate the inputs of each workload at growing sizes, and run all its
+    implementations at every size
+    '''
+
+    results = []
+    for workload in sorted({w for w, _ in jobs}):
+        if workload not in SIZE_SWEEPS:
+            print(f"{workload}: no size sweep defined, skipped")
+            continue
+        options, start = SIZE_SWEEPS[workload]
+        for i in range(cmd_args.size_sweep):
+            size = int(start * cmd_args.sweep_factor**i)
+            extra_args = [arg for opt in options for arg in (opt, str(size))]
+            if not gen_data(workload, cmd_args, extra_args,
+                            f"gen_data.{size}"):
+                break
+            cmd_args.size = size
+            amount = work(workload, config=cmd_args.main_args.split()
+                          if cmd_args.main_args else None)
+            for target in cmd_args.targets:
+                for r in run_target([j for j in jobs if j[0] == workload],
+                                    target, cmd_args):
+                    r['work'] = amount
+                    results.append(r)
+            cmd_args.size = None
+    return results
+
+
+def format_table(header, rows):
+    widths = [
+        max(len(row[i]) for row in [header] + rows) for i in range(len(header))
+    ]
+    lines = ['  '.join(c.ljust(w) for c, w in zip(header, widths)).rstrip()]
+    lines.append('  '.join('-' * w for w in widths))
+    for row in rows:
+        lines.append('  '.join(c.ljust(w) for c, w in zip(row, widths)).rstrip())
+    return '\n'.join(lines)
+
+
+def parse_gen_args(items):
+    ret = {}
+    for item in items:
+        workload, sep, args = item.partition('=')
+        if not sep:
+            raise argparse.ArgumentTypeError(
+                f"--gen-arg expects <workload>=<args>, got {item}")
+        ret.setdefault(workload, []).extend(args.split())
+    return ret
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Run all workloads and implementations')
+    parser.add_argument('--targets',
+                        nargs='+',
+                        default=['cpu', 'gpu'],
+                        choices=['cpu', 'gpu'])
+    parser.add_argument('--workloads', nargs='+', default=WORKLOADS)
+    parser.add_argument('--impls',
+                        nargs='+',
+                        default=None,
+                        help='Only run these implementations (e.g. ours '
+                        'pytorch)')
+    parser.add_argument('--exclude',
+                        nargs='+',
+                        default=['tvm'],
+                        help='Implementations to skip. TVM is skipped by '
+                        'default because auto-tuning takes hours')
+    parser.add_argument('--gen-arg',
+                        action='append',
+                        default=[],
+                        dest='gen_args',
+                        help='Arguments of gen_data.py of a workload, as '
+                        '<workload>=<args>, e.g. gat=reddit')
+    parser.add_argument('--binary',
+                        action='store_true',
+                        help='Pass --binary to gen_data.py')
+    parser.add_argument('--synthesize',
+                        action='store_true',
+                        help='Pass --synthesize to gen_data.py, so random '
+                        'inputs are generated in memory by each '
+                        'implementation. Exclude Julia with it')
+    parser.add_argument('--skip-gen-data',
+                        action='store_true',
+                        dest='skip_gen_data',
+                        help='Reuse existing inputs')
+    parser.add_argument('--main-args',
+                        default='',
+                        dest='main_args',
+                        help='Extra arguments of the implementations using '
+                        'common/benchmark.py, e.g. "--timing-repeat 20"')
+    parser.add_argument('--cpu-jobs',
+                        type=int,
+                        default=1,
+                        dest='cpu_jobs',
+                        help='Number of CPU jobs to run in parallel, each on '
+                        'a disjoint set of cores')
+    parser.add_argument('--thread-sweep',
+                        action='store_true',
+                        dest='thread_sweep',
+                        help='Run each CPU job with 1, 2, 4, ... threads up to '
+                        'the size of its core set, and print the scaling')
+    parser.add_argument('--size-sweep',
+                        type=int,
+                        default=0,
+                        dest='size_sweep',
+                        help='Generate inputs at this many geometrically '
+                        'growing sizes and tabulate latency, throughput and '
+                        'memory against the size. Julia implementations, '
+                        'whose shapes are fixed, are skipped')
+    parser.add_argument('--sweep-factor',
+                        type=float,
+                        default=2,
+                        dest='sweep_factor',
+                        help='Growth factor of --size-sweep')
+    parser.add_argument('--timeout',
+                        type=float,
+                        default=3600,
+                        help='Timeout of each job in seconds')
+    parser.add_argument('--log-dir',
+                        default=None,
+                        dest='log_dir',
+                        help='Defaults to suite_logs/<time>')
+    parser.add_argument('--summary',
+                        default=None,
+                        help='Write all results to this JSON file')
+    cmd_args = parser.parse_args()
+    cmd_args.gen_args = parse_gen_args(cmd_args.gen_args)
+    cmd_args.size = None
+    if cmd_args.log_dir is None:
+        cmd_args.log_dir = os.path.join(ROOT, 'suite_logs',
+                                        time.strftime('%Y%m%d-%H%M%S'))
+    os.makedirs(cmd_args.log_dir, exist_ok=True)
+
+    if cmd_args.size_sweep > 0:
+        jobs = discover(cmd_args.workloads, cmd_args.impls,
+                        cmd_args.exclude + ['julia'])
+        results = run_size_sweep(jobs, cmd_args)
+        failed = False
+        print()
+        print(sweep_table(results))
+    else:
+        workloads = [w for w in cmd_args.workloads if gen_data(w, cmd_args)]
+        failed = len(workloads) < len(cmd_args.workloads)
+        jobs = discover(workloads, cmd_args.impls, cmd_args.exclude)
+        results = []
+        for target in cmd_args.targets:
+            results += run_target(jobs, target, cmd_args)
+        print()
+        print(speedup_table(results))
+    if cmd_args.thread_sweep and 'cpu' in cmd_args.targets:
+        print()
+        print(scaling_table(results))
+    print(f"Logs are in {cmd_args.log_dir}")
+    if cmd_args.summary:
+        with open(cmd_args.summary, 'w') as f:
+            json.dump(results, f, indent=2)
+    if failed or any(r['status'] != 'ok' or r['correct'] is False
+                     for r in results):
+        exit(1)
@@ -1,9 +1,11 @@
 import sys
+import argparse
 import numpy as np
-import torch
 
 sys.path.append('..')
-from common.numpy.io import store_txt
+from common.numpy.io import store, store_txt
+from common.numpy.generate import save_random
+from common.numpy.obj import load_obj
 
 
 def load_faces(path: str):
@@ -26,29 +28,39 @@ def load_faces(path: str):
         ret[1] is an m*3-shaped numpy array, where m is the number of faces. array[i] = each vertices of the face
     """
 
-    vertices = []
-    faces = []
-    for line in open(path):
-        if line.startswith('v'):
-            vertices.append(tuple(map(float, line.split()[1:])))
-        if line.startswith('f'):
-            faces.append(tuple(map(lambda x: int(x) - 1, line.split()[1:])))
-    return np.array(vertices, dtype=np.float32), np.array(faces, dtype=np.int32)
+    return load_obj(path)
 
 
 if __name__ == '__main__':
-    if len(sys.argv) != 2:
-        print(f"Usage: {sys.argv[0]} <obj-file>")
-        exit(-1)
-    obj_file = sys.argv[1]
+    parser = argparse.ArgumentParser()
+    parser.add_argument('obj_file', metavar='obj-file')
+    parser.add_argument('--binary',
+                        action='store_true',
+                        dest='binary',
+                        help='Store inputs in the binary format. Julia '
+                        'implementations cannot read it')
+    parser.add_argument('--seed',
+                        type=int,
+                        default=None,
+                        help='Seed of the random inputs. Defaults to '
+                        '$DATA_SEED, or 0')
+    parser.add_argument('--synthesize',
+                        action='store_true',
+                        help='Only write specs of the random inputs, from '
+                        'which Python implementations synthesize them in '
+                        'memory. Julia implementations cannot read them')
+    parser.add_argument('--height', type=int, default=64)
+    parser.add_argument('--width', type=int, default=64)
+    cmd_args = parser.parse_args()
+    obj_file = cmd_args.obj_file
 
     vertices, faces = load_faces(obj_file)
     n_verts = vertices.shape[0]
     n_faces = faces.shape[0]
-    h = 64
-    w = 64
-    d_y = torch.rand(n_faces, h, w, dtype=torch.float).numpy()
-
-    store_txt("vertices.in", vertices)
-    store_txt("faces.in", faces)
-    store_txt("d_y.in", d_y)
+    h = cmd_args.height
+    w = cmd_args.width
+    save = store if cmd_args.binary else store_txt
+    save_rand = None if cmd_args.synthesize else save
+    save("vertices.in", vertices)
+    save("faces.in", faces)
+    save_random(save_rand, "d_y.in", (n_faces, h, w), seed=cmd_args.seed)
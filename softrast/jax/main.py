@@ -1,5 +1,4 @@
 import sys
-import time
 import argparse
 import numpy as np
 import jax
@@ -7,9 +6,8 @@ import jax.numpy as jnp
 
 sys.path.append('../..')
 from common.jax.io import load_txt, store_txt
-
-h = 64
-w = 64
+from common.benchmark import (add_benchmark_args, parse_benchmark_args,
+                              Benchmark)
 
 
 def rasterize(vertices, faces):
@@ -77,25 +75,14 @@ def rasterize(vertices, faces):
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser()
-    parser.add_argument('--warmup-repeat',
-                        type=int,
-                        default=10,
-                        dest='warmup_num')
-    parser.add_argument('--timing-repeat',
-                        type=int,
-                        default=100,
-                        dest='test_num')
-    parser.add_argument('--profile-gpu',
-                        action='store_true',
-                        dest='profile_gpu')
-    cmd_args = parser.parse_args()
-
-    if cmd_args.profile_gpu:
-        from common.gpu import profile_start, profile_stop
+    add_benchmark_args(parser)
+    cmd_args = parse_benchmark_args(parser)
 
     vertices = load_txt("../vertices.in", "float32")
     faces = load_txt("../faces.in", "int32")
     d_y = load_txt("../d_y.in", "float32")
+    # Module-level, read by rasterize
+    _, h, w = d_y.shape
     n_verts = vertices.shape[0]
     n_faces = faces.shape[0]
 
@@ -103,12 +90,6 @@ if __name__ == '__main__':
     faces = jax.device_put(faces)
     d_y = jax.device_put(d_y)
 
-    print(
-        f"{cmd_args.warmup_num} warmup, {cmd_args.test_num} repeats for evalution"
-    )
-    warmup_num = cmd_args.warmup_num
-    test_num = cmd_args.test_num
-
     rasterize_inference = jax.jit(rasterize)
     # NOTE: JAX requires to compute gradients w.r.t. a scalar, so we sum the output to compute it.
     #       We explicitly multiply d_y here, so it is mathematically equivalent to compute gradients
@@ -116,35 +97,22 @@ if __name__ == '__main__':
     rasterize_forward_backward = jax.grad(
         lambda *args: jnp.sum(rasterize(*args) * d_y), argnums=(0,))
 
-    for i in range(warmup_num):
-        y = rasterize_inference(vertices, faces)
-        if i == 0:
-            store_txt("y.out", y)
-    y = y.block_until_ready()
-    if cmd_args.profile_gpu:
-        profile_start()
-    t0 = time.time()
-    for i in range(test_num):
-        y = rasterize_inference(vertices, faces)
-    y = y.block_until_ready()
-    t1 = time.time()
-    if cmd_args.profile_gpu:
-        profile_stop()
-    assert y.shape == (n_faces, h, w)
-    print(f"Inference Time = {(t1 - t0) / test_num * 1000} ms")
+    bench = Benchmark(cmd_args, jax.block_until_ready)
+
+    def store_y(y):
+        assert y.shape == (n_faces, h, w)
+        store_txt("y.out", y)
+
+    bench.run("Inference", lambda: rasterize_inference(vertices, faces),
+              store_y)
 
     if cmd_args.profile_gpu:
         exit(0)
 
-    for i in range(warmup_num):
-        d_vertices, = rasterize_forward_backward(vertices, faces)
-        if i == 0:
-            store_txt("d_vertices.out", d_vertices)
-    y = y.block_until_ready()
-    t0 = time.time()
-    for i in range(test_num):
-        d_vertices, = rasterize_forward_backward(vertices, faces)
-    y = y.block_until_ready()
-    t1 = time.time()
-    assert d_vertices.shape == vertices.shape
-    print(f"Forward+Backward Time = {(t1 - t0) / test_num * 1000} ms")
+    def store_grads(grads):
+        d_vertices, = grads
+        assert d_vertices.shape == vertices.shape
+        store_txt("d_vertices.out", d_vertices)
+
+    bench.run("Forward+Backward",
+              lambda: rasterize_forward_backward(vertices, faces), store_grads)
@@ -8,6 +8,9 @@ from freetensor import debug
 
 sys.path.append('../..')
 from common.numpy.io import load_txt, store_txt
+from common.freetensor.cache import optimize
+from common.benchmark import (add_benchmark_args, parse_benchmark_args,
+                              Benchmark)
 
 
 def compile_all(h, w, n_verts, n_faces, device, ad_save_all):
@@ -99,10 +102,7 @@ def compile_all(h, w, n_verts, n_faces, device, ad_save_all):
     print("# Inference:")
     print(inference)
     t0 = time.time()
-    inference_exe = ft.optimize(
-        inference,
-        schedule_callback=lambda s: s.auto_schedule(device.target()),
-        verbose=1)
+    inference_exe = optimize(inference, device, verbose=1)
     t1 = time.time()
     print(f"Inference compiling time: {t1 - t0}s")
 
@@ -112,17 +112,11 @@ def compile_all(h, w, n_verts, n_faces, device, ad_save_all):
 
     print("# Forward:")
     print(forward)
-    forward_exe = ft.optimize(
-        forward,
-        schedule_callback=lambda s: s.auto_schedule(device.target()),
-        verbose=1)
+    forward_exe = optimize(forward, device, verbose=1)
 
     print("# Backward:")
     print(backward)
-    backward_exe = ft.optimize(
-        backward,
-        schedule_callback=lambda s: s.auto_schedule(device.target()),
-        verbose=1)
+    backward_exe = optimize(backward, device, verbose=1)
 
     def run_backward(vertices, faces, y, d_y, d_vertices):
         kvs = {}
@@ -136,24 +130,11 @@ def compile_all(h, w, n_verts, n_faces, device, ad_save_all):
 if __name__ == '__main__':
     parser = argparse.ArgumentParser()
     parser.add_argument('target', nargs='?')
-    parser.add_argument('--warmup-repeat',
-                        type=int,
-                        default=10,
-                        dest='warmup_num')
-    parser.add_argument('--timing-repeat',
-                        type=int,
-                        default=100,
-                        dest='test_num')
     parser.add_argument('--ad-save-all',
                         action='store_true',
                         dest='ad_save_all')
-    parser.add_argument('--profile-gpu',
-                        action='store_true',
-                        dest='profile_gpu')
-    cmd_args = parser.parse_args()
-
-    if cmd_args.profile_gpu:
-        from common.gpu import profile_start, profile_stop
+    add_benchmark_args(parser)
+    cmd_args = parse_benchmark_args(parser)
 
     device = cmd_args.target
 
@@ -161,11 +142,10 @@ if __name__ == '__main__':
     faces = load_txt("../faces.in", "int32")
     n_verts = vertices.shape[0]
     n_faces = faces.shape[0]
-    h = 64
-    w = 64
+    d_y = load_txt("../d_y.in", "float32")
+    _, h, w = d_y.shape
     y = np.zeros((n_faces, h, w), dtype="float32")
     d_vertices = np.zeros(vertices.shape, dtype='float32')
-    d_y = load_txt("../d_y.in", "float32")
 
     if device == 'gpu':
         ir_dev = ft.Device(ft.GPU())
@@ -184,53 +164,18 @@ if __name__ == '__main__':
                                                    ir_dev,
                                                    cmd_args.ad_save_all)
 
-    print(
-        f"{cmd_args.warmup_num} warmup, {cmd_args.test_num} repeats for evalution"
-    )
-    warmup_num = cmd_args.warmup_num
-    test_num = cmd_args.test_num
-
-    for i in range(warmup_num):
-        inference(vertices, faces, y)
-        if i == 0:
-            store_txt("y.out", y.numpy().reshape((n_faces, h, w)))
-    ir_dev.sync()
-    if cmd_args.profile_gpu:
-        profile_start()
-    t0 = time.time()
-    for i in range(test_num):
-        inference(vertices, faces, y)
-    ir_dev.sync()
-    t1 = time.time()
-    if cmd_args.profile_gpu:
-        profile_stop()
+    bench = Benchmark(cmd_args, lambda _: ir_dev.sync())
+    bench.memory.track(vertices, faces, y, d_y, d_vertices)
 
-    print(f"Inference Time = {(t1 - t0) / test_num * 1000} ms")
+    bench.run("Inference", lambda: inference(vertices, faces, y),
+              lambda _: store_txt("y.out", y.numpy().reshape((n_faces, h, w))))
 
     if cmd_args.profile_gpu:
         exit(0)
 
-    for i in range(warmup_num):
-        forward(vertices, faces, y)
-    ir_dev.sync()
-    t0 = time.time()
-    for i in range(test_num):
-        forward(vertices, faces, y)
-    ir_dev.sync()
-    t1 = time.time()
-
-    print(f"Forward Time = {(t1 - t0) / test_num * 1000} ms")
-
-    for i in range(warmup_num):
-        backward(vertices, faces, y, d_y, d_vertices)
-        if i == 0:
-            store_txt("d_vertices.out",
-                      d_vertices.numpy().reshape((n_verts, 3)))
-    ir_dev.sync()
-    t0 = time.time()
-    for i in range(test_num):
-        backward(vertices, faces, y, d_y, d_vertices)
-    ir_dev.sync()
-    t1 = time.time()
+    bench.run("Forward", lambda: forward(vertices, faces, y))
 
-    print(f"Backward Time = {(t1 - t0) / test_num * 1000} ms")
+    bench.run(
+        "Backward", lambda: backward(vertices, faces, y, d_y, d_vertices),
+        lambda _: store_txt("d_vertices.out",
+                            d_vertices.numpy().reshape((n_verts, 3))))
@@ -1,11 +1,12 @@
 import sys
-import time
 import argparse
 import numpy as np
 import torch
 
 sys.path.append('../..')
 from common.numpy.io import load_txt, store_txt
+from common.benchmark import (add_benchmark_args, parse_benchmark_args,
+                              Benchmark)
 
 
 def rasterize(vertices, faces, h, w):
@@ -81,21 +82,8 @@ def rasterize(vertices, faces, h, w):
 if __name__ == '__main__':
     parser = argparse.ArgumentParser()
     parser.add_argument('target', nargs='?')
-    parser.add_argument('--warmup-repeat',
-                        type=int,
-                        default=10,
-                        dest='warmup_num')
-    parser.add_argument('--timing-repeat',
-                        type=int,
-                        default=100,
-                        dest='test_num')
-    parser.add_argument('--profile-gpu',
-                        action='store_true',
-                        dest='profile_gpu')
-    cmd_args = parser.parse_args()
-
-    if cmd_args.profile_gpu:
-        from common.gpu import profile_start, profile_stop
+    add_benchmark_args(parser)
+    cmd_args = parse_benchmark_args(parser)
 
     device = cmd_args.target
 
@@ -104,9 +92,8 @@ if __name__ == '__main__':
     faces = torch.tensor(load_txt("../faces.in", "int32"))
     n_verts = vertices.shape[0]
     n_faces = faces.shape[0]
-    h = 64
-    w = 64
     d_y = torch.tensor(load_txt("../d_y.in", "float32"), dtype=torch.float)
+    _, h, w = d_y.shape
 
     if device == 'gpu':
         vertices = vertices.cuda()
@@ -117,53 +104,22 @@ if __name__ == '__main__':
         assert device == 'cpu'
         sync = lambda: None
 
-    print(
-        f"{cmd_args.warmup_num} warmup, {cmd_args.test_num} repeats for evalution"
-    )
-    warmup_num = cmd_args.warmup_num
-    test_num = cmd_args.test_num
-
-    for i in range(warmup_num):
-        y = rasterize(vertices, faces, h, w)
-        if i == 0:
-            store_txt("y.out", y.cpu().numpy())
-    sync()
-    if cmd_args.profile_gpu:
-        profile_start()
-    t0 = time.time()
-    for i in range(test_num):
-        y = rasterize(vertices, faces, h, w)
-    sync()
-    t1 = time.time()
-    if cmd_args.profile_gpu:
-        profile_stop()
-    assert y.shape == (n_faces, h, w)
-    print(f"Inference Time = {(t1 - t0) / test_num * 1000} ms")
+    bench = Benchmark(cmd_args, lambda _: sync())
+
+    def store_y(y):
+        assert y.shape == (n_faces, h, w)
+        store_txt("y.out", y.cpu().numpy())
+
+    bench.run("Inference", lambda: rasterize(vertices, faces, h, w), store_y)
 
     if cmd_args.profile_gpu:
         exit(0)
 
     vertices.requires_grad = True
 
-    for i in range(warmup_num):
-        y = rasterize(vertices, faces, h, w)
-    sync()
-    t0 = time.time()
-    for i in range(test_num):
-        y = rasterize(vertices, faces, h, w)
-    sync()
-    t1 = time.time()
-    assert y.shape == (n_faces, h, w)
-    print(f"Forward Time = {(t1 - t0) / test_num * 1000} ms")
-
-    for i in range(warmup_num):
-        y.backward(d_y, retain_graph=True)
-        if i == 0:
-            store_txt("d_vertices.out", vertices.grad.cpu().numpy())
-    sync()
-    t0 = time.time()
-    for i in range(test_num):
-        y.backward(d_y, retain_graph=True)
-    sync()
-    t1 = time.time()
-    print(f"Backward Time = {(t1 - t0) / test_num * 1000} ms")
+    bench.run("Forward", lambda: rasterize(vertices, faces, h, w))
+
+    y = rasterize(vertices, faces, h, w)
+    bench.run(
+        "Backward", lambda: y.backward(d_y, retain_graph=True),
+        lambda _: store_txt("d_vertices.out", vertices.grad.cpu().numpy()))
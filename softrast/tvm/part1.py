@@ -17,7 +17,7 @@ from datetime import datetime
 import logging
 
 sys.path.append('../..')
-from common.numpy.io import load_txt, store_txt
+from common.numpy.io import load_txt, store_txt, tensor_shape
 
 # Enable debug logs
 logging.basicConfig()
@@ -68,8 +68,7 @@ vertices = load_txt("../vertices.in", "float32")
 faces = load_txt("../faces.in", "int32")
 n_verts = vertices.shape[0]
 n_faces = faces.shape[0]
-h = 64
-w = 64
+_, h, w = tensor_shape("../d_y.in")
 y = np.zeros((n_faces, 3, 3), dtype="float32")
 output_shape = (n_faces, 3, 3)
 
@@ -21,7 +21,8 @@ import argparse
 import logging
 
 sys.path.append('../..')
-from common.numpy.io import load_txt, store_txt
+from common.numpy.io import load_txt, store_txt, tensor_shape
+from common.benchmark import record_samples
 
 logging.basicConfig()
 logging.getLogger().setLevel(logging.DEBUG)
@@ -62,8 +63,7 @@ faces = load_txt("../faces.in", "int32")
 v = load_txt("v.tmp", "float32")
 n_verts = vertices.shape[0]
 n_faces = faces.shape[0]
-h = 64
-w = 64
+_, h, w = tensor_shape("../d_y.in")
 y = np.zeros((n_faces, h, w), dtype="float32")
 
 if target_name.startswith('llvm'):
@@ -382,15 +382,23 @@ for func, inputs in zip(funcs, inputs_funcs):
     evaluator(*inputs)
 if cmd_args.profile_gpu:
     profile_start()
+# One sample per iteration, so the end-to-end latencies can be recorded
+samples = np.zeros((cmd_args.test_num, ))
 for func, inputs in zip(funcs, inputs_funcs):
     evaluator = func.time_evaluator(func.entry_name,
                                     dev,
-                                    number=cmd_args.test_num)
-    time_ms = np.median(evaluator(*inputs).results) * 1000
+                                    number=1,
+                                    repeat=cmd_args.test_num)
+    results = np.array(evaluator(*inputs).results)
+    time_ms = np.median(results) * 1000
     time_log.append(time_ms)
+    samples += results
 if cmd_args.profile_gpu:
     profile_stop()
 print(
     f"{cmd_args.warmup_num} warmup, {cmd_args.test_num} repeats for evalution")
 print('Time breakdown (ms):', time_log)
 print("Average e2e time: %.3f ms" % (sum(time_log)))
+# Profiled runs are slowed down and not recorded
+if not cmd_args.profile_gpu:
+    record_samples("Inference", samples * 1e9, cmd_args.target)
@@ -1,70 +1,197 @@
 import sys
-import itertools
+import argparse
 import numpy as np
 
 sys.path.append('..')
-from common.numpy.io import store_txt
+from common.numpy.io import store, store_txt
+from common.numpy.generate import save_random
+from common.numpy.obj import load_obj
 
 
-def load_faces(path: str):
+def face_adjacency(faces: np.array):
     """
-    Load a 3D object and returns the adjacency array of the faces
+    Compute the adjacency array of triangle faces
+
+    Each directed edge is encoded as one integer key. Keys are sorted once and
+    looked up with `searchsorted`, so the cost is O(E log E) in NumPy. If a
+    directed edge appears more than once (non-manifold meshes), the last face
+    holding it wins, as in a dict
 
 
     Parameters
     ----------
-    path: str
-        Path to a 3D object file, where a `f <i> <j> <k>` line means there is a face among point i, j and k
+    faces: np.array
+        An n*3-shaped array, where faces[i] = vertex IDs of the i-th face
+
+
+    Returns
+    -------
+    (np.array, np.array)
+        ret[0] is an n*3-shaped int32 array. array[i][j] = ID of the face sharing the edge (faces[i][j],
+        faces[i][(j + 1) % 3]) with the i-th face, or -1 if there is no such face
+        ret[1] is a k*2-shaped array of (face, j) pairs whose edge is a boundary edge
+    """
+
+    faces = np.asarray(faces, dtype=np.int64)
+    n_faces = faces.shape[0]
+    if n_faces == 0:
+        return np.zeros((0, 3), dtype=np.int32), np.zeros((0, 2),
+                                                          dtype=np.int64)
+    n_verts = int(faces.max()) + 1
+    rotated = faces[:, [1, 2, 0]]
+
+    # Directed edge (faces[i][j], faces[i][(j + 1) % 3]) belongs to face i
+    keys = (faces * n_verts + rotated).ravel()
+    order = np.argsort(keys, kind='stable')
+    sorted_keys = keys[order]
+
+    # The adjacent face holds the same edge in the reversed direction
+    query = (rotated * n_verts + faces).ravel()
+    pos = np.searchsorted(sorted_keys, query, side='right') - 1
+    found = (pos >= 0) & (sorted_keys[np.maximum(pos, 0)] == query)
+    adj = np.where(found, order[pos] // 3, -1).astype(np.int32)
+
+    boundary = np.stack(np.divmod(np.flatnonzero(~found), 3), axis=-1)
+    return adj.reshape(n_faces, 3), boundary
+
+
+def coarsen(adj: np.array):
+    """
+    Adjacency of the faces one subdivision level up
+
+    Faces are assumed to be in subdivision order, i.e. faces 4j, ..., 4j + 3 are
+    the children of coarse face j (the last group may be smaller). The neighbors
+    of a coarse face are the parents of its children's neighbors, most frequent
+    first. Faces with less than 3 distinct neighbors are padded with themselves
+
+
+    Parameters
+    ----------
+    adj: np.array
+        An n*3-shaped adjacency array without boundary edges
 
 
     Returns
     -------
     np.array
-        An n*3-shaped numpy array, where n is the number of faces. array[i][j] = ID of the j-th adjacent face of the i-th face
+        A ceil(n / 4)*3-shaped int32 adjacency array
     """
 
-    faces = []
-    for line in open(path):
-        if line.startswith('f'):
-            faces.append(tuple(map(int, line.split()[1:])))
+    n_faces = adj.shape[0]
+    n_coarse = (n_faces + 3) // 4
+    parent = np.arange(n_faces, dtype=np.int64) // 4
+    src = np.repeat(parent, 3)
+    dst = parent[adj.ravel()]
+    keep = src != dst
+    pairs, counts = np.unique(src[keep] * n_coarse + dst[keep],
+                              return_counts=True)
+    src, dst = np.divmod(pairs, n_coarse)
+    # Within each coarse face, by decreasing count
+    order = np.lexsort((-counts, src))
+    src, dst = src[order], dst[order]
+    rank = np.arange(src.shape[0]) - np.searchsorted(src, src)
+    ret = np.repeat(np.arange(n_coarse, dtype=np.int64)[:, None], 3, axis=1)
+    sel = rank < 3
+    ret[src[sel], rank[sel]] = dst[sel]
+    return ret.astype(np.int32)
+
+
+def face_centroids(vertices: np.array, faces: np.array):
+    return vertices[faces].mean(axis=1)
 
-    edgeToFaces = {}
-    for face, i in zip(faces, itertools.count()):
-        edgeToFaces[(face[0], face[1])] = i
-        edgeToFaces[(face[1], face[2])] = i
-        edgeToFaces[(face[2], face[0])] = i
 
-    ret = []
-    for face, i in zip(faces, itertools.count()):
-        ret.append(
-            (edgeToFaces[(face[1], face[0])], edgeToFaces[(face[2], face[1])],
-             edgeToFaces[(face[0], face[2])]))
+def load_faces(path: str):
+    """
+    Load a 3D object and returns the adjacency array of the faces
 
-    return np.array(ret, dtype=np.int32)
+
+    Parameters
+    ----------
+    path: str
+        Path to a 3D object file, where a `f <i> <j> <k>` line means there is a face among point i, j and k
+
+
+    Returns
+    -------
+    (np.array, np.array)
+        ret[0] is an n*3-shaped numpy array, where n is the number of faces. array[i][j] = ID of the j-th adjacent
+        face of the i-th face, or -1 for a boundary edge, which is reported to stderr
+        ret[1] is an n*3-shaped float32 array of the face centroids
+    """
+
+    vertices, faces = load_obj(path)
+    adj, boundary = face_adjacency(faces)
+    if boundary.shape[0] > 0:
+        print(f"{path}: {boundary.shape[0]} boundary edges, e.g. " + ", ".join(
+            f"({faces[i, j]}, {faces[i, (j + 1) % 3]}) of face {i}"
+            for i, j in boundary[:5]),
+              file=sys.stderr)
+    return adj, face_centroids(vertices, faces)
 
 
 if __name__ == '__main__':
-    if len(sys.argv) != 2:
-        print(f"Usage: {sys.argv[0]} <obj-file>")
+    parser = argparse.ArgumentParser()
+    parser.add_argument('obj_file', metavar='obj-file')
+    parser.add_argument('--binary',
+                        action='store_true',
+                        dest='binary',
+                        help='Store inputs in the binary format. Julia '
+                        'implementations cannot read it')
+    parser.add_argument('--seed',
+                        type=int,
+                        default=None,
+                        help='Seed of the random inputs. Defaults to '
+                        '$DATA_SEED, or 0')
+    parser.add_argument('--synthesize',
+                        action='store_true',
+                        help='Only write specs of the random inputs, from '
+                        'which Python implementations synthesize them in '
+                        'memory. Julia implementations cannot read them')
+    parser.add_argument('--in-feats', type=int, default=13, dest='in_feats')
+    parser.add_argument('--out-feats', type=int, default=64, dest='out_feats')
+    parser.add_argument('--copies',
+                        type=int,
+                        default=1,
+                        help='Repeat the mesh as this many disconnected '
+                        'copies, to scale the number of faces')
+    parser.add_argument('--levels',
+                        type=int,
+                        default=3,
+                        help='Number of subdivision levels. The adjacency of '
+                        'level l > 0 is stored as adj<l>.in, for the network '
+                        'benchmarks')
+    cmd_args = parser.parse_args()
+    obj_file = cmd_args.obj_file
+
+    adj, centroids = load_faces(obj_file)
+    if np.any(adj < 0):
+        print("Meshes with boundaries are not supported")
         exit(-1)
-    obj_file = sys.argv[1]
-
-    adj = load_faces(obj_file)
+    adj = np.concatenate(
+        [adj + i * adj.shape[0] for i in range(cmd_args.copies)])
+    # Copies are placed side by side along x
+    extent = centroids[:, 0].max() - centroids[:, 0].min() if \
+            centroids.shape[0] > 0 else 0
+    centroids = np.concatenate([
+        centroids + np.array([1.1 * extent * i, 0, 0], dtype=np.float32)
+        for i in range(cmd_args.copies)
+    ])
     n_faces = adj.shape[0]
-    in_feats = 13
-    out_feats = 64
-
-    x = np.random.uniform(size=(n_faces, in_feats)).astype("float32")
-    w0 = np.random.uniform(size=(in_feats, out_feats)).astype("float32")
-    w1 = np.random.uniform(size=(in_feats, out_feats)).astype("float32")
-    w2 = np.random.uniform(size=(in_feats, out_feats)).astype("float32")
-    w3 = np.random.uniform(size=(in_feats, out_feats)).astype("float32")
-    d_y = np.random.uniform(size=(n_faces, out_feats)).astype('float32')
-
-    store_txt("adj.in", adj)
-    store_txt("x.in", x)
-    store_txt("w0.in", w0)
-    store_txt("w1.in", w1)
-    store_txt("w2.in", w2)
-    store_txt("w3.in", w3)
-    store_txt("d_y.in", d_y)
+    in_feats = cmd_args.in_feats
+    out_feats = cmd_args.out_feats
+
+    save = store if cmd_args.binary else store_txt
+    save_rand = None if cmd_args.synthesize else save
+    seed = cmd_args.seed
+    save("adj.in", adj)
+    save("centroids.in", centroids)
+    coarse = adj
+    for level in range(1, cmd_args.levels):
+        coarse = coarsen(coarse)
+        save(f"adj{level}.in", coarse)
+    save_random(save_rand, "x.in", (n_faces, in_feats), seed=seed)
+    save_random(save_rand, "w0.in", (in_feats, out_feats), seed=seed)
+    save_random(save_rand, "w1.in", (in_feats, out_feats), seed=seed)
+    save_random(save_rand, "w2.in", (in_feats, out_feats), seed=seed)
+    save_random(save_rand, "w3.in", (in_feats, out_feats), seed=seed)
+    save_random(save_rand, "d_y.in", (n_faces, out_feats), seed=seed)
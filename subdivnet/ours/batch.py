@@ -0,0 +1,192 @@
+'''
+Batched SubdivNet inference over many meshes
+
+Meshes are packed into one set of arrays: their `adj` and `x` are concatenated,
+`adj` is rebased to global face IDs, and `offsets[m]` is the first face of the
+m-th mesh. Since no edge crosses meshes after rebasing, the batch is one big
+disconnected mesh, and one kernel launch covers all its faces. The kernel is
+compiled once for a maximum number of faces and meshes, and the actual number of
+faces is read from `offsets` at run time, so any batch within the bounds reuses
+it
+
+Usage: batch.py <cpu/gpu> [--meshes N] [--max-faces N] [benchmark options]
+
+Every mesh has the topology of `../adj.in` with features drawn from its own
+random stream, and the weights are `../w*.in`. The batched kernel is timed
+against launching the single-mesh kernel of main.py once per mesh
+'''
+
+import sys
+import time
+import argparse
+import numpy as np
+import freetensor as ft
+
+sys.path.append('../..')
+from common.numpy.io import load_txt
+from common.numpy.generate import generate
+from common.freetensor.cache import optimize
+from common.benchmark import (add_benchmark_args, parse_benchmark_args,
+                              Benchmark)
+
+from main import face_conv, make_inference
+
+
+def pack(meshes, max_faces: int = None, max_meshes: int = None):
+    '''
+    Pack meshes into padded arrays
+
+
+    Parameters
+    ----------
+    meshes: list of (np.array, np.array)
+        (adj, x) of each mesh, where adj holds face IDs local to the mesh
+    max_faces: int, optional
+        Number of rows of the packed arrays. Defaults to the total number of
+        faces
+    max_meshes: int, optional
+        Maximum number of meshes. Defaults to the number of meshes
+
+
+    Returns
+    -------
+    (np.array, np.array, np.array)
+        offsets, a (max_meshes + 1)-shaped int32 array where the faces of the
+        m-th mesh are [offsets[m], offsets[m + 1]), padded with the total number
+        of faces; adj with global face IDs; and x. Rows past the last face are 0
+    '''
+
+    sizes = [adj.shape[0] for adj, _ in meshes]
+    total = sum(sizes)
+    max_faces = total if max_faces is None else max_faces
+    max_meshes = len(meshes) if max_meshes is None else max_meshes
+    if total > max_faces or len(meshes) > max_meshes:
+        raise ValueError(f"{len(meshes)} meshes with {total} faces exceed the "
+                         f"bounds of {max_meshes} meshes and {max_faces} faces")
+    in_feats = meshes[0][1].shape[1]
+
+    offsets = np.full((max_meshes + 1,), total, dtype=np.int32)
+    offsets[:len(meshes)] = np.cumsum([0] + sizes[:-1])
+    adj_packed = np.zeros((max_faces, 3), dtype=np.int32)
+    x_packed = np.zeros((max_faces, in_feats), dtype=np.float32)
+    for (adj, x), start in zip(meshes, offsets):
+        adj_packed[start:start + adj.shape[0]] = adj + start
+        x_packed[start:start + adj.shape[0]] = x
+    return offsets, adj_packed, x_packed
+
+
+def unpack(offsets: np.array, y: np.array, n_meshes: int):
+    '''
+    Split the packed output into one array per mesh
+    '''
+
+    return [y[offsets[m]:offsets[m + 1]] for m in range(n_meshes)]
+
+
+def compile_batched(max_faces, max_meshes, in_feats, out_feats, device):
+
+    @ft.transform
+    def inference(offsets, adj, x, w0, w1, w2, w3, y):
+        offsets: ft.Var[(max_meshes + 1, ), "int32", "input"]
+        adj: ft.Var[(max_faces, 3), "int32", "input"]
+        x: ft.Var[(max_faces, in_feats), "float32", "input"]
+        w0: ft.Var[(in_feats, out_feats), "float32", "input"]
+        w1: ft.Var[(in_feats, out_feats), "float32", "input"]
+        w2: ft.Var[(in_feats, out_feats), "float32", "input"]
+        w3: ft.Var[(in_feats, out_feats), "float32", "input"]
+        y: ft.Var[(max_faces, out_feats), "float32", "output"]
+
+        # All faces of all meshes in one parallel loop, so small meshes do not
+        # limit the parallelism
+        face_conv(offsets[max_meshes], in_feats, adj, x, w0, w1, w2, w3, y)
+
+    print("# Batched inference:")
+    print(inference)
+    t0 = time.time()
+    inference_exe = optimize(inference, device, verbose=1)
+    t1 = time.time()
+    print(f"Batched inference compiling time: {t1 - t0}s")
+    return inference_exe
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('target', nargs='?')
+    parser.add_argument('--meshes',
+                        type=int,
+                        default=64,
+                        help='Number of meshes in the batch')
+    parser.add_argument('--max-faces',
+                        type=int,
+                        default=None,
+                        dest='max_faces',
+                        help='Number of faces the batched kernel is compiled '
+                        'for. Defaults to the faces of the batch')
+    add_benchmark_args(parser)
+    cmd_args = parse_benchmark_args(parser)
+
+    device = cmd_args.target
+
+    adj = load_txt("../adj.in", "int32")
+    n_faces = adj.shape[0]
+    w0 = load_txt("../w0.in", "float32")
+    in_feats, out_feats = w0.shape
+    w1 = load_txt("../w1.in", "float32")
+    w2 = load_txt("../w2.in", "float32")
+    w3 = load_txt("../w3.in", "float32")
+    n_meshes = cmd_args.meshes
+    meshes = [(adj, generate(f"batch_x{m}", (n_faces, in_feats)))
+              for m in range(n_meshes)]
+    offsets, adj_packed, x_packed = pack(meshes, cmd_args.max_faces)
+    max_faces = adj_packed.shape[0]
+
+    if device == 'gpu':
+        ir_dev = ft.Device(ft.GPU())
+    else:
+        assert device == 'cpu'
+        ir_dev = ft.Device(ft.CPU())
+
+    w0 = ft.Array(w0)
+    w1 = ft.Array(w1)
+    w2 = ft.Array(w2)
+    w3 = ft.Array(w3)
+    per_mesh = [(ft.Array(a), ft.Array(x),
+                 ft.Array(np.zeros((n_faces, out_feats), dtype="float32")))
+                for a, x in meshes]
+    offsets_arr = ft.Array(offsets)
+    adj_arr = ft.Array(adj_packed)
+    x_arr = ft.Array(x_packed)
+    y_arr = ft.Array(np.zeros((max_faces, out_feats), dtype="float32"))
+
+    with ir_dev:
+        single = optimize(make_inference(n_faces, in_feats, out_feats), ir_dev,
+                          verbose=1)
+        batched = compile_batched(max_faces, n_meshes, in_feats, out_feats,
+                                  ir_dev)
+
+    bench = Benchmark(cmd_args, lambda _: ir_dev.sync())
+    bench.memory.track(offsets_arr, adj_arr, x_arr, y_arr, w0, w1, w2, w3)
+
+    def run_per_mesh():
+        for a, x, y in per_mesh:
+            single(a, x, w0, w1, w2, w3, y)
+
+    def check(_):
+        ys = unpack(offsets, y_arr.numpy().reshape((max_faces, out_feats)),
+                    n_meshes)
+        for m, (_, _, y) in enumerate(per_mesh):
+            ref = y.numpy().reshape((n_faces, out_feats))
+            assert np.all(np.isclose(ys[m], ref, 1e-4, 1e-4)), \
+                    f"Mesh {m} differs"
+        print("Batched output matches")
+
+    per_mesh_stats = bench.run("Per-mesh", run_per_mesh)
+    batched_stats = bench.run(
+        "Batched",
+        lambda: batched(offsets_arr, adj_arr, x_arr, w0, w1, w2, w3, y_arr),
+        check)
+
+    for name, stats in [("Per-mesh", per_mesh_stats),
+                        ("Batched", batched_stats)]:
+        print(f"{name} throughput = {n_meshes / stats['mean'] * 1e3:.1f} "
+              f"meshes/s")
@@ -0,0 +1,3 @@
+#!/usr/bin/env bash
+
+PYTHONPATH=../../FreeTensor/python:../../FreeTensor/build:$PYTHONPATH python3 batch.py $@
@@ -0,0 +1,122 @@
+'''
+Compare the per-face and edge-indexed (edge.py) SubdivNet formulations over
+mesh sizes
+
+For each number of copies, regenerates the inputs with `gen_data.py <obj-file>
+--copies N [--gen-args ...]`, runs main.py with each formulation, and prints the
+latency of each phase and the cheaper formulation. The existing inputs in
+subdivnet/ are moved aside during the runs and restored afterwards
+
+Usage: bench_edge.py <obj-file> [--copies 1,4,16] [--target cpu/gpu]
+                     [--gen-args "--binary --in-feats 32 ..."]
+                     [main.py options]
+'''
+
+import os
+import sys
+import glob
+import shutil
+import argparse
+import tempfile
+import contextlib
+import subprocess
+
+sys.path.append('../..')
+from common import results
+
+from bench_reorder import ratio
+
+FORMULATIONS = ['face', 'edge']
+
+
+@contextlib.contextmanager
+def kept_inputs(directory: str = '..'):
+    '''
+    Move the `*.in` inputs of `directory` aside, and put them back on exit,
+    removing any inputs written in between
+    '''
+
+    saved = tempfile.mkdtemp(prefix='inputs.', dir=directory)
+    try:
+        names = [
+            os.path.basename(f)
+            for f in glob.glob(os.path.join(directory, '*.in'))
+        ]
+        for name in names:
+            os.replace(os.path.join(directory, name),
+                       os.path.join(saved, name))
+        yield
+    finally:
+        for f in glob.glob(os.path.join(directory, '*.in')):
+            os.remove(f)
+        for name in os.listdir(saved):
+            os.replace(os.path.join(saved, name),
+                       os.path.join(directory, name))
+        shutil.rmtree(saved)
+
+
+def gen_data(obj_file: str, copies: int, gen_args):
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(
+        [os.path.abspath('../..'), env.get('PYTHONPATH', '')])
+    subprocess.run(['python3', 'gen_data.py', obj_file, '--copies',
+                    str(copies)] + gen_args,
+                   cwd='..',
+                   env=env,
+                   check=True,
+                   stdout=subprocess.DEVNULL)
+
+
+def run_formulation(formulation: str, target: str, args):
+    '''
+    Run main.py with one formulation, returning its records
+    '''
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'results.jsonl')
+        subprocess.run(['./main.sh', target, '--formulation', formulation,
+                        '--results', path] + args,
+                       check=True)
+        return results.load(path)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('obj_file', metavar='obj-file')
+    parser.add_argument('--copies',
+                        default='1,4,16',
+                        help='Comma-separated numbers of mesh copies')
+    parser.add_argument('--target', choices=['cpu', 'gpu'], default='cpu')
+    parser.add_argument('--gen-args',
+                        default='',
+                        dest='gen_args',
+                        help='Options of gen_data.py, e.g. "--binary --seed 1"')
+    cmd_args, rest = parser.parse_known_args()
+    obj_file = os.path.abspath(cmd_args.obj_file)
+
+    rows = {}
+    sizes = {}
+    with kept_inputs():
+        for copies in map(int, cmd_args.copies.split(',')):
+            gen_data(obj_file, copies, cmd_args.gen_args.split())
+            for formulation in FORMULATIONS:
+                for rec in run_formulation(formulation, cmd_args.target, rest):
+                    sizes[copies] = rec['shapes']['adj.in'][0]
+                    rows[(copies, formulation, rec['phase'])] = rec
+
+    phases = sorted({phase for _, _, phase in rows},
+                    key=['inference', 'forward', 'backward'].index)
+    print()
+    print(f"{'copies':<8}{'faces':>10}{'phase':>10}{'face (ms)':>12}"
+          f"{'edge (ms)':>12}{'speedup':>9}{'cheaper':>9}")
+    for copies in sorted(sizes):
+        for phase in phases:
+            face = rows.get((copies, 'face', phase))
+            edge = rows.get((copies, 'edge', phase))
+            if face is None or edge is None:
+                continue
+            t_face = face['stats']['mean']
+            t_edge = edge['stats']['mean']
+            cheaper = 'edge' if t_edge < t_face else 'face'
+            print(f"{copies:<8}{sizes[copies]:>10}{phase:>10}{t_face:>12.4f}"
+                  f"{t_edge:>12.4f}{ratio(t_face, t_edge):>9}{cheaper:>9}")
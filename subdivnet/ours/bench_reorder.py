@@ -0,0 +1,95 @@
+'''
+Compare face orders of the SubdivNet benchmark on CPU
+
+Runs main.py once per order with `--reorder <order> --profile-cpu`, and prints
+the latency and last-level cache misses per iteration of each phase, relative
+to the original order. Use a large mesh (e.g. `gen_data.py --copies 16`) so the
+features do not fit in the cache
+
+Usage: bench_reorder.py [--orders none,bfs,rcm,morton] [main.py options]
+'''
+
+import os
+import sys
+import argparse
+import tempfile
+import subprocess
+
+sys.path.append('../..')
+from common import results
+from common.numpy.io import load_txt
+from common.numpy.reorder import (ORDERS, face_order, permute_adj,
+                                  gather_distance)
+
+
+def run_order(order: str, args):
+    '''
+    Run main.py with one order, returning its records
+    '''
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'results.jsonl')
+        subprocess.run(['./main.sh', 'cpu', '--reorder', order,
+                        '--profile-cpu', '--results', path] + args,
+                       check=True)
+        return results.load(path)
+
+
+def per_iter(rec, key: str):
+    perf = rec['stats'].get('perf') or {}
+    if perf.get(key) is None or not perf.get('iterations'):
+        return None
+    return perf[key] / perf['iterations']
+
+
+def ratio(x, base):
+    return f"{x / base:.2f}x" if x is not None and base else '-'
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--orders',
+                        default=None,
+                        help='Comma-separated orders. Defaults to all, except '
+                        'morton if there is no ../centroids.in')
+    cmd_args, rest = parser.parse_known_args()
+
+    if cmd_args.orders is not None:
+        orders = cmd_args.orders.split(',')
+    else:
+        orders = [o for o in ORDERS
+                  if o != 'morton' or os.path.exists('../centroids.in')]
+
+    adj = load_txt("../adj.in", "int32")
+    centroids = load_txt("../centroids.in", "float32") \
+            if 'morton' in orders else None
+    distance = {
+        order: gather_distance(permute_adj(adj, face_order(order, adj,
+                                                           centroids)))
+        for order in orders
+    }
+
+    rows = {}
+    for order in orders:
+        for rec in run_order(order, rest):
+            rows[(order, rec['phase'])] = rec
+
+    phases = sorted({phase for _, phase in rows},
+                    key=['inference', 'forward', 'backward'].index)
+    print()
+    print(f"{'order':<8}{'distance':>10}{'phase':>11}{'time (ms)':>12}"
+          f"{'speedup':>9}{'LLC miss/it':>13}{'ratio':>8}")
+    for phase in phases:
+        base = rows.get((orders[0], phase))
+        for order in orders:
+            rec = rows.get((order, phase))
+            if rec is None:
+                continue
+            t = rec['stats']['mean']
+            misses = per_iter(rec, 'llc_misses')
+            base_misses = per_iter(base, 'llc_misses') if base else None
+            speedup = ratio(base['stats']['mean'], t) if base else '-'
+            misses_str = f"{misses:.6g}" if misses is not None else '-'
+            print(f"{order:<8}{distance[order]:>10.1f}{phase:>11}{t:>12.4f}"
+                  f"{speedup:>9}{misses_str:>13}"
+                  f"{ratio(misses, base_misses):>8}")
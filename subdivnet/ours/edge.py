@@ -0,0 +1,85 @@
+'''
+An edge-indexed formulation of the SubdivNet convolution
+
+In the per-face formulation of main.py, sum3 of face i adds |x[j] - x[i]| for
+each neighbor j, so the difference of every pair of adjacent faces is computed
+twice, once from each side. Here the unique pairs of adjacent faces (the edges
+of the dual graph, about 1.5 per face) are listed once by `dual_edges`, their
+feature differences are computed in one pass into a per-edge table, and each
+face gathers its 3 entries of the table. Gathering instead of scattering needs
+no atomics, and each face also loads its 3 neighbor rows once, for sum1 and
+sum2 together
+
+Select it with `main.py --formulation edge`. `bench_edge.py` compares both
+formulations over mesh sizes
+'''
+
+import numpy as np
+import freetensor as ft
+from freetensor.libop import *
+
+
+def dual_edges(adj: np.array):
+    '''
+    Unique pairs of adjacent faces
+
+
+    Parameters
+    ----------
+    adj: np.array
+        An n*3-shaped adjacency array without boundary edges
+
+
+    Returns
+    -------
+    (np.array, np.array)
+        ret[0] is an m*2-shaped int32 array of (i, j) pairs with i <= j. ret[1]
+        is an n*3-shaped int32 array, where ret[1][i][p] = the pair of face i
+        and adj[i][p]
+    '''
+
+    n_faces = adj.shape[0]
+    i = np.repeat(np.arange(n_faces, dtype=np.int64), 3)
+    j = adj.ravel().astype(np.int64)
+    keys = np.minimum(i, j) * n_faces + np.maximum(i, j)
+    uniq, inv = np.unique(keys, return_inverse=True)
+    edges = np.stack(np.divmod(uniq, n_faces), axis=-1).astype(np.int32)
+    return edges, inv.reshape(n_faces, 3).astype(np.int32)
+
+
+def make_edge_inference(n_faces, n_edges, in_feats, out_feats):
+
+    @ft.transform
+    def inference(adj, edges, face_edges, x, w0, w1, w2, w3, y):
+        adj: ft.Var[(n_faces, 3), "int32", "input"]
+        edges: ft.Var[(n_edges, 2), "int32", "input"]
+        face_edges: ft.Var[(n_faces, 3), "int32", "input"]
+        x: ft.Var[(n_faces, in_feats), "float32", "input"]
+        w0: ft.Var[(in_feats, out_feats), "float32", "input"]
+        w1: ft.Var[(in_feats, out_feats), "float32", "input"]
+        w2: ft.Var[(in_feats, out_feats), "float32", "input"]
+        w3: ft.Var[(in_feats, out_feats), "float32", "input"]
+        y: ft.Var[(n_faces, out_feats), "float32", "output"]
+
+        diff = ft.empty((n_edges, in_feats), "float32")
+        for e in range(n_edges):
+            diff[e] = abs(x[edges[e, 0]] - x[edges[e, 1]])
+
+        for i in range(n_faces):
+            nbr = ft.empty((3, in_feats), "float32")
+            for p in range(3):
+                nbr[p] = x[adj[i, p]]
+            sum1 = zeros((in_feats, ), "float32")
+            sum2 = zeros((in_feats, ), "float32")
+            sum3 = zeros((in_feats, ), "float32")
+            for p in range(3):
+                sum1[:] += nbr[p]
+                sum2[:] += abs(nbr[p] - nbr[(p + 1) % 3])
+                sum3[:] += diff[face_edges[i, p]]
+            y0 = matmul(x[i], w0)
+            y1 = matmul(sum1, w1)
+            y2 = matmul(sum2, w2)
+            y3 = matmul(sum3, w3)
+            y[i] = y0 + y1 + y2 + y3
+
+    return inference
@@ -9,9 +9,38 @@ from freetensor import debug
 
 sys.path.append('../..')
 from common.numpy.io import load_txt, store_txt
-
-
-def compile_all(n_faces, in_feats, out_feats, device, ad_save_all):
+from common.numpy.reorder import (ORDERS, face_order, permute_adj, inverse,
+                                  gather_distance)
+from common.freetensor.cache import optimize
+from common.benchmark import (add_benchmark_args, parse_benchmark_args,
+                              Benchmark)
+
+from edge import dual_edges, make_edge_inference
+
+
+@ft.inline
+def face_conv(n_faces, in_feats, adj, x, w0, w1, w2, w3, y):
+    '''
+    The convolution of faces 0, ..., n_faces - 1. `n_faces` may be read from a
+    tensor at run time
+    '''
+
+    for i in range(n_faces):
+        sum1 = zeros((in_feats, ), "float32")
+        sum2 = zeros((in_feats, ), "float32")
+        sum3 = zeros((in_feats, ), "float32")
+        for p in range(3):
+            sum1[:] += x[adj[i, p]]
+            sum2[:] += abs(x[adj[i, p]] - x[adj[i, (p + 1) % 3]])
+            sum3[:] += abs(x[adj[i, p]] - x[i])
+        y0 = matmul(x[i], w0)
+        y1 = matmul(sum1, w1)
+        y2 = matmul(sum2, w2)
+        y3 = matmul(sum3, w3)
+        y[i] = y0 + y1 + y2 + y3
+
+
+def make_inference(n_faces, in_feats, out_feats):
 
     @ft.transform
     def inference(adj, x, w0, w1, w2, w3, y):
@@ -23,27 +52,16 @@ def compile_all(n_faces, in_feats, out_feats, device, ad_save_all):
         w3: ft.Var[(in_feats, out_feats), "float32", "input"]
         y: ft.Var[(n_faces, out_feats), "float32", "output"]
 
-        for i in range(n_faces):
-            sum1 = zeros((in_feats, ), "float32")
-            sum2 = zeros((in_feats, ), "float32")
-            sum3 = zeros((in_feats, ), "float32")
-            for p in range(3):
-                sum1[:] += x[adj[i, p]]
-                sum2[:] += abs(x[adj[i, p]] - x[adj[i, (p + 1) % 3]])
-                sum3[:] += abs(x[adj[i, p]] - x[i])
-            y0 = matmul(x[i], w0)
-            y1 = matmul(sum1, w1)
-            y2 = matmul(sum2, w2)
-            y3 = matmul(sum3, w3)
-            y[i] = y0 + y1 + y2 + y3
+        face_conv(n_faces, in_feats, adj, x, w0, w1, w2, w3, y)
+
+    return inference
 
+
+def compile_all(inference, device, ad_save_all):
     print("# Inference:")
     print(inference)
     t0 = time.time()
-    inference_exe = ft.optimize(
-        inference,
-        schedule_callback=lambda s: s.auto_schedule(device.target()),
-        verbose=1)
+    inference_exe = optimize(inference, device, verbose=1)
     t1 = time.time()
     print(f"Inference compiling time: {t1 - t0}s")
 
@@ -53,20 +71,15 @@ def compile_all(n_faces, in_feats, out_feats, device, ad_save_all):
 
     print("# Forward:")
     print(forward)
-    forward_exe = ft.optimize(
-        forward,
-        schedule_callback=lambda s: s.auto_schedule(device.target()),
-        verbose=1)
+    forward_exe = optimize(forward, device, verbose=1)
 
     print("# Backward:")
     print(backward)
-    backward_exe = ft.optimize(
-        backward,
-        schedule_callback=lambda s: s.auto_schedule(device.target()),
-        verbose=1)
+    backward_exe = optimize(backward, device, verbose=1)
 
-    def run_backward(adj, x, w0, w1, w2, w3, y, d_y, d_x, d_w0, d_w1, d_w2,
-                     d_w3):
+    def run_backward(*args):
+        # The arguments of inference, followed by the gradients
+        d_y, d_x, d_w0, d_w1, d_w2, d_w3 = args[-6:]
         kvs = {}
         kvs[privdes['y']] = d_y
         kvs[requires['x']] = d_x
@@ -82,33 +95,30 @@ def compile_all(n_faces, in_feats, out_feats, device, ad_save_all):
 if __name__ == '__main__':
     parser = argparse.ArgumentParser()
     parser.add_argument('target', nargs='?')
-    parser.add_argument('--warmup-repeat',
-                        type=int,
-                        default=10,
-                        dest='warmup_num')
-    parser.add_argument('--timing-repeat',
-                        type=int,
-                        default=100,
-                        dest='test_num')
-    parser.add_argument('--profile-gpu',
-                        action='store_true',
-                        dest='profile_gpu')
     parser.add_argument('--ad-save-all',
                         action='store_true',
                         dest='ad_save_all')
-    cmd_args = parser.parse_args()
-
-    if cmd_args.profile_gpu:
-        from common.gpu import profile_start, profile_stop
+    parser.add_argument('--reorder',
+                        choices=ORDERS,
+                        default='none',
+                        help='Renumber the faces for locality of the neighbor '
+                        'gathers (see common/numpy/reorder.py). Outputs are '
+                        'stored in the original order')
+    parser.add_argument('--formulation',
+                        choices=['face', 'edge'],
+                        default='face',
+                        help='"edge" computes the difference of each pair of '
+                        'adjacent faces once (see edge.py)')
+    add_benchmark_args(parser)
+    cmd_args = parse_benchmark_args(parser)
 
     device = cmd_args.target
 
     adj = load_txt("../adj.in", "int32")
     n_faces = adj.shape[0]
-    in_feats = 13
-    out_feats = 64
     x = load_txt("../x.in", "float32")
     w0 = load_txt("../w0.in", "float32")
+    in_feats, out_feats = w0.shape
     w1 = load_txt("../w1.in", "float32")
     w2 = load_txt("../w2.in", "float32")
     w3 = load_txt("../w3.in", "float32")
@@ -120,13 +130,39 @@ if __name__ == '__main__':
     d_w3 = np.zeros(w3.shape, dtype='float32')
     d_y = load_txt("../d_y.in", "float32")
 
+    # New face k is face perm[k] of the input
+    perm = None
+    if cmd_args.reorder != 'none':
+        centroids = load_txt("../centroids.in", "float32") \
+                if cmd_args.reorder == 'morton' else None
+        t0 = time.time()
+        perm = face_order(cmd_args.reorder, adj, centroids)
+        before = gather_distance(adj)
+        adj = permute_adj(adj, perm)
+        x = x[perm]
+        d_y = d_y[perm]
+        print(f"Reordering ({cmd_args.reorder}) time: {time.time() - t0}s, "
+              f"mean gather distance {before:.1f} -> "
+              f"{gather_distance(adj):.1f}")
+
+    def original_order(data):
+        return data if perm is None else data[inverse(perm)]
+
     if device == 'gpu':
         ir_dev = ft.Device(ft.GPU())
     else:
         assert device == 'cpu'
         ir_dev = ft.Device(ft.CPU())
 
-    adj = ft.Array(adj)
+    if cmd_args.formulation == 'edge':
+        edges, face_edges = dual_edges(adj)
+        func = make_edge_inference(n_faces, edges.shape[0], in_feats,
+                                   out_feats)
+        graph = (ft.Array(adj), ft.Array(edges), ft.Array(face_edges))
+    else:
+        func = make_inference(n_faces, in_feats, out_feats)
+        graph = (ft.Array(adj), )
+
     x = ft.Array(x)
     w0 = ft.Array(w0)
     w1 = ft.Array(w1)
@@ -141,60 +177,31 @@ if __name__ == '__main__':
     d_y = ft.Array(d_y)
 
     with ir_dev:
-        inference, forward, backward = compile_all(n_faces, in_feats,
-                                                   out_feats, ir_dev,
+        inference, forward, backward = compile_all(func, ir_dev,
                                                    cmd_args.ad_save_all)
 
-    print(
-        f"{cmd_args.warmup_num} warmup, {cmd_args.test_num} repeats for evalution"
-    )
-    warmup_num = cmd_args.warmup_num
-    test_num = cmd_args.test_num
-
-    for i in range(warmup_num):
-        inference(adj, x, w0, w1, w2, w3, y)
-        if i == 0:
-            store_txt("y.out", y.numpy().reshape((n_faces, out_feats)))
-    ir_dev.sync()
-    if cmd_args.profile_gpu:
-        profile_start()
-    t0 = time.time()
-    for i in range(test_num):
-        inference(adj, x, w0, w1, w2, w3, y)
-    ir_dev.sync()
-    t1 = time.time()
-    if cmd_args.profile_gpu:
-        profile_stop()
+    bench = Benchmark(cmd_args, lambda _: ir_dev.sync())
+    bench.memory.track(*graph, x, w0, w1, w2, w3, y, d_x, d_w0, d_w1, d_w2,
+                       d_w3, d_y)
 
-    print(f"Inference Time = {(t1 - t0) / test_num * 1000} ms")
+    bench.run(
+        "Inference", lambda: inference(*graph, x, w0, w1, w2, w3, y),
+        lambda _: store_txt(
+            "y.out", original_order(y.numpy().reshape((n_faces, out_feats)))))
 
     if cmd_args.profile_gpu:
         exit(0)
 
-    for i in range(warmup_num):
-        forward(adj, x, w0, w1, w2, w3, y)
-    ir_dev.sync()
-    t0 = time.time()
-    for i in range(test_num):
-        forward(adj, x, w0, w1, w2, w3, y)
-    ir_dev.sync()
-    t1 = time.time()
+    bench.run("Forward", lambda: forward(*graph, x, w0, w1, w2, w3, y))
 
-    print(f"Forward Time = {(t1 - t0) / test_num * 1000} ms")
-
-    for i in range(warmup_num):
-        backward(adj, x, w0, w1, w2, w3, y, d_y, d_x, d_w0, d_w1, d_w2, d_w3)
-        if i == 0:
-            store_txt("d_x.out", d_x.numpy().reshape((n_faces, in_feats)))
-            store_txt("d_w0.out", d_w0.numpy().reshape((in_feats, out_feats)))
-            store_txt("d_w1.out", d_w1.numpy().reshape((in_feats, out_feats)))
-            store_txt("d_w2.out", d_w2.numpy().reshape((in_feats, out_feats)))
-            store_txt("d_w3.out", d_w3.numpy().reshape((in_feats, out_feats)))
-    ir_dev.sync()
-    t0 = time.time()
-    for i in range(test_num):
-        backward(adj, x, w0, w1, w2, w3, y, d_y, d_x, d_w0, d_w1, d_w2, d_w3)
-    ir_dev.sync()
-    t1 = time.time()
+    def store_grads(_):
+        store_txt("d_x.out",
+                  original_order(d_x.numpy().reshape((n_faces, in_feats))))
+        store_txt("d_w0.out", d_w0.numpy().reshape((in_feats, out_feats)))
+        store_txt("d_w1.out", d_w1.numpy().reshape((in_feats, out_feats)))
+        store_txt("d_w2.out", d_w2.numpy().reshape((in_feats, out_feats)))
+        store_txt("d_w3.out", d_w3.numpy().reshape((in_feats, out_feats)))
 
-    print(f"Backward Time = {(t1 - t0) / test_num * 1000} ms")
+    bench.run(
+        "Backward", lambda: backward(*graph, x, w0, w1, w2, w3, y, d_y, d_x,
+                                     d_w0, d_w1, d_w2, d_w3), store_grads)
@@ -0,0 +1,233 @@
+'''
+A multi-layer SubdivNet network
+
+Three mesh convolution layers over three subdivision levels:
+
+    h0 = conv(x; adj0)           (n0, hidden)
+    p0 = pool(relu(h0))          (n1, hidden)
+    h1 = conv(p0; adj1)          (n1, hidden)
+    p1 = pool(relu(h1))          (n2, hidden)
+    y = conv(p1; adj2)           (n2, out_feats)
+
+where `pool` averages the 4 children of each coarse face (faces 4j, ..., 4j + 3
+of a level are the children of face j one level up), and `adj<l>` is written by
+`gen_data.py --levels 3`. The activation is fused into the pooling loop, so no
+layer boundary writes an extra tensor. All intermediates (h0, p0, h1, p1) live
+in one preallocated `arena` of n0 + 2 * n1 + n2 rows (`arena_offsets`), which
+is an output of the program, so forward and backward reuse the same memory every
+call instead of allocating a tensor per layer
+
+Usage: network.py <cpu/gpu> [--ad-save-all] [benchmark options]
+
+The weights are drawn from the streams "net_w<layer>", and compared against
+subdivnet/pytorch_impl1/network.py with
+
+    python3 -m common.numpy.compare subdivnet/pytorch_impl1/net_y.out subdivnet/ours/net_y.out
+'''
+
+import sys
+import time
+import argparse
+import numpy as np
+import freetensor as ft
+from freetensor.libop import *
+
+sys.path.append('../..')
+from common.numpy.io import load_txt, store_txt
+from common.numpy.generate import generate
+from common.freetensor.cache import optimize
+from common.benchmark import (add_benchmark_args, parse_benchmark_args,
+                              Benchmark)
+
+from main import face_conv
+
+LAYERS = 3
+
+
+@ft.inline
+def mesh_conv(n_faces, in_feats, adj, x, w, y):
+    face_conv(n_faces, in_feats, adj, x, w[0], w[1], w[2], w[3], y)
+
+
+@ft.inline
+def pool_relu(n_coarse, n_fine, feats, h, out):
+    for j in range(n_coarse):
+        for k in range(feats):
+            out[j, k] = 0
+            for c in range(4):
+                if 4 * j + c < n_fine:
+                    out[j, k] += ft.max(h[4 * j + c, k], 0)
+            out[j, k] = out[j, k] / ft.min(4, n_fine - 4 * j)
+
+
+def level_sizes(n_faces):
+    sizes = [n_faces]
+    for _ in range(LAYERS - 1):
+        sizes.append((sizes[-1] + 3) // 4)
+    return sizes
+
+
+def arena_offsets(n_faces):
+    '''
+    Offsets of h0, p0, h1 and p1 in the arena, and its total number of rows
+    '''
+
+    n0, n1, n2 = level_sizes(n_faces)
+    offsets = [0]
+    for rows in [n0, n1, n1, n2]:
+        offsets.append(offsets[-1] + rows)
+    return offsets[:-1], offsets[-1]
+
+
+def compile_all(n_faces, in_feats, hidden_feats, out_feats, device,
+                ad_save_all):
+    n0, n1, n2 = level_sizes(n_faces)
+    (o_h0, o_p0, o_h1, o_p1), arena_rows = arena_offsets(n_faces)
+
+    @ft.transform
+    def inference(adj0, adj1, adj2, x, w_0, w_1, w_2, arena, y):
+        adj0: ft.Var[(n0, 3), "int32", "input"]
+        adj1: ft.Var[(n1, 3), "int32", "input"]
+        adj2: ft.Var[(n2, 3), "int32", "input"]
+        x: ft.Var[(n0, in_feats), "float32", "input"]
+        w_0: ft.Var[(4, in_feats, hidden_feats), "float32", "input"]
+        w_1: ft.Var[(4, hidden_feats, hidden_feats), "float32", "input"]
+        w_2: ft.Var[(4, hidden_feats, out_feats), "float32", "input"]
+        arena: ft.Var[(arena_rows, hidden_feats), "float32", "output"]
+        y: ft.Var[(n2, out_feats), "float32", "output"]
+
+        h0 = arena[o_h0:o_h0 + n0]
+        p0 = arena[o_p0:o_p0 + n1]
+        h1 = arena[o_h1:o_h1 + n1]
+        p1 = arena[o_p1:o_p1 + n2]
+        mesh_conv(n0, in_feats, adj0, x, w_0, h0)
+        pool_relu(n1, n0, hidden_feats, h0, p0)
+        mesh_conv(n1, hidden_feats, adj1, p0, w_1, h1)
+        pool_relu(n2, n1, hidden_feats, h1, p1)
+        mesh_conv(n2, hidden_feats, adj2, p1, w_2, y)
+
+    print("# Inference:")
+    print(inference)
+    t0 = time.time()
+    inference_exe = optimize(inference, device, verbose=1)
+    t1 = time.time()
+    print(f"Inference compiling time: {t1 - t0}s")
+
+    forward, backward, requires, privdes = ft.grad_(
+        inference, set(["x", "w_0", "w_1", "w_2"]), set(["y"]),
+        ft.GradTapeMode.All if ad_save_all else ft.GradTapeMode.NoReuseOnly)
+
+    print("# Forward:")
+    print(forward)
+    forward_exe = optimize(forward, device, verbose=1)
+
+    print("# Backward:")
+    print(backward)
+    backward_exe = optimize(backward, device, verbose=1)
+
+    def run_backward(adj0, adj1, adj2, x, w_0, w_1, w_2, arena, y, d_y, d_x,
+                     d_w_0, d_w_1, d_w_2):
+        kvs = {}
+        kvs[privdes['y']] = d_y
+        kvs[requires['x']] = d_x
+        kvs[requires['w_0']] = d_w_0
+        kvs[requires['w_1']] = d_w_1
+        kvs[requires['w_2']] = d_w_2
+        backward_exe(**kvs)
+
+    return inference_exe, forward_exe, run_backward
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('target', nargs='?')
+    parser.add_argument('--ad-save-all',
+                        action='store_true',
+                        dest='ad_save_all')
+    parser.add_argument('--hidden-feats',
+                        type=int,
+                        default=64,
+                        dest='hidden_feats')
+    add_benchmark_args(parser)
+    cmd_args = parse_benchmark_args(parser)
+
+    device = cmd_args.target
+
+    adj0 = load_txt("../adj.in", "int32")
+    adj1 = load_txt("../adj1.in", "int32")
+    adj2 = load_txt("../adj2.in", "int32")
+    n_faces = adj0.shape[0]
+    n0, n1, n2 = level_sizes(n_faces)
+    assert adj1.shape[0] == n1 and adj2.shape[0] == n2, \
+            "Run gen_data.py with --levels 3"
+    x = load_txt("../x.in", "float32")
+    in_feats = x.shape[1]
+    hidden_feats = cmd_args.hidden_feats
+    w0 = load_txt("../w0.in", "float32")
+    out_feats = w0.shape[1]
+    # Scaled so activations keep their magnitude through the layers
+    w_0 = generate("net_w0", (4, in_feats, hidden_feats), low=-1,
+                   high=1) / in_feats
+    w_1 = generate("net_w1", (4, hidden_feats, hidden_feats), low=-1,
+                   high=1) / hidden_feats
+    w_2 = generate("net_w2", (4, hidden_feats, out_feats), low=-1,
+                   high=1) / hidden_feats
+    d_y = generate("net_d_y", (n2, out_feats))
+
+    if device == 'gpu':
+        ir_dev = ft.Device(ft.GPU())
+    else:
+        assert device == 'cpu'
+        ir_dev = ft.Device(ft.CPU())
+
+    adj0 = ft.Array(adj0)
+    adj1 = ft.Array(adj1)
+    adj2 = ft.Array(adj2)
+    x = ft.Array(x)
+    w_0 = ft.Array(w_0)
+    w_1 = ft.Array(w_1)
+    w_2 = ft.Array(w_2)
+    _, arena_rows = arena_offsets(n_faces)
+    arena = ft.Array(np.zeros((arena_rows, hidden_feats), dtype="float32"))
+    y = ft.Array(np.zeros((n2, out_feats), dtype="float32"))
+    d_x = ft.Array(np.zeros((n0, in_feats), dtype="float32"))
+    d_w_0 = ft.Array(np.zeros((4, in_feats, hidden_feats), dtype="float32"))
+    d_w_1 = ft.Array(np.zeros((4, hidden_feats, hidden_feats),
+                              dtype="float32"))
+    d_w_2 = ft.Array(np.zeros((4, hidden_feats, out_feats), dtype="float32"))
+    d_y = ft.Array(d_y)
+
+    with ir_dev:
+        inference, forward, backward = compile_all(n_faces, in_feats,
+                                                   hidden_feats, out_feats,
+                                                   ir_dev, cmd_args.ad_save_all)
+
+    bench = Benchmark(cmd_args, lambda _: ir_dev.sync())
+    bench.memory.track(adj0, adj1, adj2, x, w_0, w_1, w_2, arena, y, d_x, d_w_0,
+                       d_w_1, d_w_2, d_y)
+
+    bench.run(
+        "Network Inference",
+        lambda: inference(adj0, adj1, adj2, x, w_0, w_1, w_2, arena, y),
+        lambda _: store_txt("net_y.out",
+                            y.numpy().reshape((n2, out_feats))))
+
+    if cmd_args.profile_gpu:
+        exit(0)
+
+    bench.run("Network Forward",
+              lambda: forward(adj0, adj1, adj2, x, w_0, w_1, w_2, arena, y))
+
+    def store_grads(_):
+        store_txt("net_d_x.out", d_x.numpy().reshape((n0, in_feats)))
+        store_txt("net_d_w0.out",
+                  d_w_0.numpy().reshape((4, in_feats, hidden_feats)))
+        store_txt("net_d_w1.out",
+                  d_w_1.numpy().reshape((4, hidden_feats, hidden_feats)))
+        store_txt("net_d_w2.out",
+                  d_w_2.numpy().reshape((4, hidden_feats, out_feats)))
+
+    bench.run(
+        "Network Backward",
+        lambda: backward(adj0, adj1, adj2, x, w_0, w_1, w_2, arena, y, d_y, d_x,
+                         d_w_0, d_w_1, d_w_2), store_grads)
@@ -1,11 +1,12 @@
 import sys
-import time
 import argparse
 import numpy as np
 import torch
 
 sys.path.append('../..')
 from common.numpy.io import load_txt, store_txt
+from common.benchmark import (add_benchmark_args, parse_benchmark_args,
+                              Benchmark)
 
 
 def conv_impl1(adj, x, w0, w1, w2, w3):
@@ -39,30 +40,16 @@ def conv_impl1(adj, x, w0, w1, w2, w3):
 if __name__ == '__main__':
     parser = argparse.ArgumentParser()
     parser.add_argument('target', nargs='?')
-    parser.add_argument('--warmup-repeat',
-                        type=int,
-                        default=10,
-                        dest='warmup_num')
-    parser.add_argument('--timing-repeat',
-                        type=int,
-                        default=100,
-                        dest='test_num')
-    parser.add_argument('--profile-gpu',
-                        action='store_true',
-                        dest='profile_gpu')
-    cmd_args = parser.parse_args()
-
-    if cmd_args.profile_gpu:
-        from common.gpu import profile_start, profile_stop
+    add_benchmark_args(parser)
+    cmd_args = parse_benchmark_args(parser)
 
     device = cmd_args.target
 
     adj = torch.tensor(load_txt("../adj.in", "int32"))
     n_faces = adj.shape[0]
-    in_feats = 13
-    out_feats = 64
     x = torch.tensor(load_txt("../x.in", "float32"), dtype=torch.float)
     w0 = torch.tensor(load_txt("../w0.in", "float32"), dtype=torch.float)
+    in_feats, out_feats = w0.shape
     w1 = torch.tensor(load_txt("../w1.in", "float32"), dtype=torch.float)
     w2 = torch.tensor(load_txt("../w2.in", "float32"), dtype=torch.float)
     w3 = torch.tensor(load_txt("../w3.in", "float32"), dtype=torch.float)
@@ -81,28 +68,14 @@ if __name__ == '__main__':
         assert device == 'cpu'
         sync = lambda: None
 
-    print(
-        f"{cmd_args.warmup_num} warmup, {cmd_args.test_num} repeats for evalution"
-    )
-    warmup_num = cmd_args.warmup_num
-    test_num = cmd_args.test_num
-
-    for i in range(warmup_num):
-        y = conv_impl1(adj, x, w0, w1, w2, w3)
-        if i == 0:
-            store_txt("y.out", y.cpu().numpy())
-    sync()
-    if cmd_args.profile_gpu:
-        profile_start()
-    t0 = time.time()
-    for i in range(test_num):
-        y = conv_impl1(adj, x, w0, w1, w2, w3)
-    sync()
-    t1 = time.time()
-    if cmd_args.profile_gpu:
-        profile_stop()
-    assert y.shape == (n_faces, out_feats)
-    print(f"Impl1 Inference Time = {(t1 - t0) / test_num * 1000} ms")
+    bench = Benchmark(cmd_args, lambda _: sync())
+
+    def store_y(y):
+        assert y.shape == (n_faces, out_feats)
+        store_txt("y.out", y.cpu().numpy())
+
+    bench.run("Impl1 Inference", lambda: conv_impl1(adj, x, w0, w1, w2, w3),
+              store_y)
 
     if cmd_args.profile_gpu:
         exit(0)
@@ -113,29 +86,15 @@ if __name__ == '__main__':
     w2.requires_grad = True
     w3.requires_grad = True
 
-    for i in range(warmup_num):
-        y = conv_impl1(adj, x, w0, w1, w2, w3)
-    sync()
-    t0 = time.time()
-    for i in range(test_num):
-        y = conv_impl1(adj, x, w0, w1, w2, w3)
-    sync()
-    t1 = time.time()
-    assert y.shape == (n_faces, out_feats)
-    print(f"Impl1 Forward Time = {(t1 - t0) / test_num * 1000} ms")
-
-    for i in range(warmup_num):
-        y.backward(d_y, retain_graph=True)
-        if i == 0:
-            store_txt("d_x.out", x.grad.cpu().numpy())
-            store_txt("d_w0.out", w0.grad.cpu().numpy())
-            store_txt("d_w1.out", w1.grad.cpu().numpy())
-            store_txt("d_w2.out", w2.grad.cpu().numpy())
-            store_txt("d_w3.out", w3.grad.cpu().numpy())
-    sync()
-    t0 = time.time()
-    for i in range(test_num):
-        y.backward(d_y, retain_graph=True)
-    sync()
-    t1 = time.time()
-    print(f"Impl1 Backward Time = {(t1 - t0) / test_num * 1000} ms")
+    bench.run("Impl1 Forward", lambda: conv_impl1(adj, x, w0, w1, w2, w3))
+
+    def store_grads(_):
+        store_txt("d_x.out", x.grad.cpu().numpy())
+        store_txt("d_w0.out", w0.grad.cpu().numpy())
+        store_txt("d_w1.out", w1.grad.cpu().numpy())
+        store_txt("d_w2.out", w2.grad.cpu().numpy())
+        store_txt("d_w3.out", w3.grad.cpu().numpy())
+
+    y = conv_impl1(adj, x, w0, w1, w2, w3)
+    bench.run("Impl1 Backward", lambda: y.backward(d_y, retain_graph=True),
+              store_grads)
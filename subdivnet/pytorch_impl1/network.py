@@ -0,0 +1,116 @@
+'''
+The multi-layer SubdivNet network of subdivnet/ours/network.py, built from
+`conv_impl1`
+
+Usage: network.py <cpu/gpu> [--hidden-feats N] [benchmark options]
+'''
+
+import sys
+import argparse
+import torch
+
+sys.path.append('../..')
+from common.numpy.io import load_txt, store_txt
+from common.numpy.generate import generate
+from common.benchmark import (add_benchmark_args, parse_benchmark_args,
+                              Benchmark)
+
+from main import conv_impl1
+
+
+def pool_relu(h):
+    '''
+    Average the ReLU of every 4 consecutive faces
+    '''
+
+    n_fine = h.shape[0]
+    n_coarse = (n_fine + 3) // 4
+    h = torch.relu(h)
+    if n_coarse * 4 != n_fine:
+        h = torch.cat([h, h.new_zeros((n_coarse * 4 - n_fine, h.shape[1]))])
+    counts = torch.clamp(n_fine - 4 * torch.arange(n_coarse, device=h.device),
+                         max=4).to(h.dtype)
+    return h.reshape(n_coarse, 4, -1).sum(dim=1) / counts[:, None]
+
+
+def network(adj0, adj1, adj2, x, w_0, w_1, w_2):
+    p0 = pool_relu(conv_impl1(adj0, x, *w_0))
+    p1 = pool_relu(conv_impl1(adj1, p0, *w_1))
+    return conv_impl1(adj2, p1, *w_2)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('target', nargs='?')
+    parser.add_argument('--hidden-feats',
+                        type=int,
+                        default=64,
+                        dest='hidden_feats')
+    add_benchmark_args(parser)
+    cmd_args = parse_benchmark_args(parser)
+
+    device = cmd_args.target
+
+    adj0 = torch.tensor(load_txt("../adj.in", "int32"))
+    adj1 = torch.tensor(load_txt("../adj1.in", "int32"))
+    adj2 = torch.tensor(load_txt("../adj2.in", "int32"))
+    x = torch.tensor(load_txt("../x.in", "float32"), dtype=torch.float)
+    n_faces, in_feats = x.shape
+    hidden_feats = cmd_args.hidden_feats
+    out_feats = load_txt("../w0.in", "float32").shape[1]
+    n2 = adj2.shape[0]
+    # Same weights as subdivnet/ours/network.py
+    w_0 = torch.tensor(
+        generate("net_w0", (4, in_feats, hidden_feats), low=-1, high=1) /
+        in_feats)
+    w_1 = torch.tensor(
+        generate("net_w1", (4, hidden_feats, hidden_feats), low=-1, high=1) /
+        hidden_feats)
+    w_2 = torch.tensor(
+        generate("net_w2", (4, hidden_feats, out_feats), low=-1, high=1) /
+        hidden_feats)
+    d_y = torch.tensor(generate("net_d_y", (n2, out_feats)))
+
+    if device == 'gpu':
+        adj0 = adj0.cuda()
+        adj1 = adj1.cuda()
+        adj2 = adj2.cuda()
+        x = x.cuda()
+        w_0 = w_0.cuda()
+        w_1 = w_1.cuda()
+        w_2 = w_2.cuda()
+        d_y = d_y.cuda()
+        sync = torch.cuda.synchronize
+    else:
+        assert device == 'cpu'
+        sync = lambda: None
+
+    bench = Benchmark(cmd_args, lambda _: sync())
+
+    def store_y(y):
+        assert y.shape == (n2, out_feats)
+        store_txt("net_y.out", y.cpu().numpy())
+
+    bench.run("Network Inference",
+              lambda: network(adj0, adj1, adj2, x, w_0, w_1, w_2), store_y)
+
+    if cmd_args.profile_gpu:
+        exit(0)
+
+    x.requires_grad = True
+    w_0.requires_grad = True
+    w_1.requires_grad = True
+    w_2.requires_grad = True
+
+    bench.run("Network Forward",
+              lambda: network(adj0, adj1, adj2, x, w_0, w_1, w_2))
+
+    def store_grads(_):
+        store_txt("net_d_x.out", x.grad.cpu().numpy())
+        store_txt("net_d_w0.out", w_0.grad.cpu().numpy())
+        store_txt("net_d_w1.out", w_1.grad.cpu().numpy())
+        store_txt("net_d_w2.out", w_2.grad.cpu().numpy())
+
+    y = network(adj0, adj1, adj2, x, w_0, w_1, w_2)
+    bench.run("Network Backward", lambda: y.backward(d_y, retain_graph=True),
+              store_grads)
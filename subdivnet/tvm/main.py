@@ -61,9 +61,10 @@ target = tvm.target.Target(target_name)
 dtype, itype = 'float32', 'int32'
 
 d_adj = load_txt("../adj.in", itype)
-n_faces, in_feats, out_feats = d_adj.shape[0], 13, 64
 d_x = load_txt("../x.in", dtype)
 d_w = [load_txt(f"../w{i}.in", dtype) for i in range(4)]
+n_faces = d_adj.shape[0]
+in_feats, out_feats = d_w[0].shape
 d_y = load_txt("../d_y.in", dtype)
 output_shape = (n_faces, out_feats)
 
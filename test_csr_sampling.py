@@ -0,0 +1,52 @@
+import numpy as np
+
+from common.numpy.csr import sample_neighbors, sample_subgraph
+
+
+def random_graph(num_v, max_deg, seed=0):
+    rng = np.random.default_rng(seed)
+    ptr = np.zeros((num_v + 1, ), dtype=np.int32)
+    np.cumsum(rng.integers(0, max_deg, num_v), out=ptr[1:])
+    idx = rng.integers(0, num_v, ptr[-1]).astype(np.int32)
+    return ptr, idx
+
+
+def test_sample_neighbors_fanout():
+    ptr, idx = random_graph(100, 20)
+    targets = np.arange(0, 100, 3)
+    counts, nbrs = sample_neighbors(ptr, idx, targets, 4,
+                                    np.random.default_rng(1))
+    assert np.all(counts == np.minimum(np.diff(ptr)[targets], 4))
+    begin = 0
+    for t, c in zip(targets, counts):
+        row = list(idx[ptr[t]:ptr[t + 1]])
+        # A subsequence of the row
+        pos = -1
+        for v in nbrs[begin:begin + c]:
+            pos = row.index(v, pos + 1)
+        begin += c
+    assert begin == nbrs.shape[0]
+
+
+def test_sample_subgraph_full():
+    ptr, idx = random_graph(100, 10)
+    targets = np.random.default_rng(2).permutation(100)[:30]
+    vertices, sub_ptr, sub_idx = sample_subgraph(ptr, idx, targets, 0)
+    assert np.all(vertices[:30] == targets)
+    assert vertices.shape[0] == np.unique(vertices).shape[0]
+    for b, t in enumerate(targets):
+        assert np.all(vertices[sub_idx[sub_ptr[b]:sub_ptr[b + 1]]] ==
+                      idx[ptr[t]:ptr[t + 1]])
+
+
+def test_sample_malformed_rows():
+    ptr, idx = random_graph(20, 5)
+    row = int(np.argmax(np.diff(ptr)))
+    idx[ptr[row]] = 20
+    sample_neighbors(ptr, idx, [v for v in range(20) if v != row], 0)
+    try:
+        sample_neighbors(ptr, idx, [row], 0)
+    except ValueError:
+        pass
+    else:
+        assert False, "Out-of-range neighbor not detected"
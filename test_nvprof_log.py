@@ -0,0 +1,80 @@
+from common import nvprof
+
+NVPROF_LOG = '''==1234== Profiling application: python3 main.py gpu --profile-gpu
+==1234== Profiling result:
+==1234== Metric result:
+Invocations                               Metric Name                                    Metric Description         Min         Max         Avg
+Device "Tesla V100-SXM2-32GB (0)"
+    Kernel: kernel0(float const *, float*)
+          2                           dram_read_bytes                Total bytes read from DRAM to L2 cache        4096        4096        4096
+          2                          dram_write_bytes             Total bytes written from L2 cache to DRAM        1024        1024        1024
+          2                      l2_global_load_bytes  Bytes read from L2 for misses in L1 for global loads        8192        8192        8192
+          2                             flop_count_sp  Floating Point Operations(Single Precision)               100         100         100
+          2                         flop_count_sp_fma  Floating Point Operations(Single Precision FMA)            50          50          50
+          2                        achieved_occupancy                                    Achieved Occupancy    0.500000    0.500000    0.500000
+          2                    dram_read_throughput                         Device Memory Read Throughput  1.0000GB/s  2.0000GB/s  1.5000GB/s
+    Kernel: kernel1(float*)
+          1                           dram_read_bytes                Total bytes read from DRAM to L2 cache          64          64          64
+          1                          dram_write_bytes             Total bytes written from L2 cache to DRAM           0           0           0
+          1                             flop_count_sp  Floating Point Operations(Single Precision)             6400        6400        6400
+'''
+
+NCU_LOG = '''==PROF== Connected to process 1234
+"ID","Process ID","Process Name","Host Name","Kernel Name","Context","Stream","Section Name","Metric Name","Metric Unit","Metric Value"
+"0","1234","python3","127.0.0.1","kernel0","1","7","Command line profiler metrics","dram__bytes_read.sum","Kbyte","4.10"
+"0","1234","python3","127.0.0.1","kernel0","1","7","Command line profiler metrics","dram__bytes_write.sum","byte","1,024"
+"0","1234","python3","127.0.0.1","kernel0","1","7","Command line profiler metrics","smsp__sass_thread_inst_executed_op_ffma_pred_on.sum","inst","50"
+"1","1234","python3","127.0.0.1","kernel0","1","7","Command line profiler metrics","dram__bytes_read.sum","Kbyte","4.10"
+'''
+
+
+def write(tmp_path, name, content):
+    path = tmp_path / name
+    path.write_text(content)
+    return str(path)
+
+
+def test_nvprof_per_kernel(tmp_path):
+    kernels = nvprof.parse(write(tmp_path, 'a.log', NVPROF_LOG))
+    k0 = kernels['kernel0(float const *, float*)']
+    assert k0.invocations == 2
+    assert k0.dram_bytes == 2 * (4096 + 1024)
+    assert k0.l2_bytes == 2 * 8192
+    assert k0.flops == 200
+    assert k0.flops_fma == 100
+    k1 = kernels['kernel1(float*)']
+    assert k1.invocations == 1
+    assert k1.intensity == 100
+
+    total = nvprof.totals(kernels)
+    assert total['kernels'] == 3
+    assert total['dram_bytes'] == 2 * (4096 + 1024) + 64
+
+
+def test_ncu_csv(tmp_path):
+    kernels = nvprof.parse(write(tmp_path, 'a.csv', NCU_LOG))
+    k0 = kernels['kernel0']
+    assert k0.invocations == 2
+    assert k0.dram_bytes == 4100 + 1024 + 4100
+    assert k0.flops == 100
+    assert k0.flops_fma == 50
+
+
+def test_merge_and_roofline(tmp_path):
+    log = write(tmp_path, 'a.log', NVPROF_LOG)
+    kernels = nvprof.merge([nvprof.parse(log), nvprof.parse(log)])
+    k0 = kernels['kernel0(float const *, float*)']
+    assert k0.runs == 2
+    assert k0.invocations == 4
+    assert k0.dram_bytes == 4 * (4096 + 1024)
+
+    # Ridge point at 10 FLOP/B
+    rows = nvprof.table(kernels, peak_flops=1e12, peak_bandwidth=1e11)
+    bounds = {row['kernel']: row['bound'] for row in rows}
+    assert bounds['kernel0(float const *, float*)'] == 'memory'
+    assert bounds['kernel1(float*)'] == 'compute'
+    assert rows[0]['kernel'] == 'kernel0(float const *, float*)'
+
+    nvprof.write_csv(rows, str(tmp_path / 'out.csv'))
+    nvprof.write_json(rows, str(tmp_path / 'out.json'))
+    assert (tmp_path / 'out.csv').read_text().startswith('kernel,invocations')